@@ -0,0 +1,95 @@
+"""
+bench_flash.py
+
+Compares FlashDetector throughput (frames/sec) of the per-frame
+``process_frame`` loop against the NumPy ``process_frames`` batch over a
+long luminance series, and checks that both report the same counts. The
+whole dynamic phase (``scan_dynamic`` with the mock renderer) is timed the
+same way: one ``render_frame`` call per frame against chunked
+``render_frames``.
+
+Usage::
+
+    python -m benchmarks.bench_flash [--repeat N] [--minutes N] [--fps N]
+"""
+
+import time
+import argparse
+from unittest.mock import patch
+
+import numpy as np
+
+from vizscan import dynamic
+from vizscan.dynamic import FlashDetector
+
+
+def make_series(frames, fps):
+    """Calm drift with a one-second 15Hz strobe burst every 20 seconds."""
+    t = np.arange(frames) / fps
+    lums = 0.5 + 0.1 * np.sin(t)
+    burst = (t % 20.0) < 1.0
+    strobe = (np.arange(frames) % 4) < 2
+    lums[burst] = strobe[burst].astype(np.float64)
+    return lums
+
+
+def streaming(lums, fps):
+    detector = FlashDetector(fps=fps)
+    counts = []
+    for i, lum in enumerate(lums.tolist()):
+        detector.process_frame(i, lum)
+        counts.append(len(detector.flash_timestamps))
+    return counts
+
+
+def batch(lums, fps):
+    return FlashDetector(fps=fps).process_frames(lums).counts.tolist()
+
+
+def scan_per_frame(minutes, fps):
+    with patch.object(dynamic, "np", None):
+        return dynamic.scan_dynamic("dynamic_fail.milk", minutes * 60, fps)
+
+
+def scan_chunked(minutes, fps):
+    return dynamic.scan_dynamic("dynamic_fail.milk", minutes * 60, fps)
+
+
+def bench(fn, data, fps, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data, fps)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FlashDetector throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+
+    lums = make_series(args.minutes * 60 * args.fps, args.fps)
+    assert streaming(lums, args.fps) == batch(lums, args.fps)
+
+    t_old = bench(streaming, lums, args.fps, args.repeat)
+    t_new = bench(batch, lums, args.fps, args.repeat)
+
+    n = len(lums)
+    print(f"Luminance series: {n} frames ({args.minutes} min at {args.fps}fps)")
+    print(f"  process_frame : {n / t_old:>14,.0f} frames/sec ({t_old * 1000:.1f} ms)")
+    print(f"  process_frames: {n / t_new:>14,.0f} frames/sec ({t_new * 1000:.1f} ms)")
+    print(f"  speedup: {t_old / t_new:.1f}x")
+
+    t_old = bench(scan_per_frame, args.minutes, args.fps, args.repeat)
+    t_new = bench(scan_chunked, args.minutes, args.fps, args.repeat)
+    print("scan_dynamic (mock renderer):")
+    print(f"  render_frame  : {n / t_old:>14,.0f} frames/sec ({t_old * 1000:.1f} ms)")
+    print(f"  render_frames : {n / t_new:>14,.0f} frames/sec ({t_new * 1000:.1f} ms)")
+    print(f"  speedup: {t_old / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+bench_lexer.py
+
+Compares MilkLexer throughput (tokens/sec) against the previous
+per-position tokenizer, which recompiled and tried every TOKEN_TYPES
+pattern in turn at each character. Both the Token list API and the
+columnar TokenStream used by the scanner are measured.
+
+Usage::
+
+    python -m benchmarks.bench_lexer [--repeat N] [--lines N]
+"""
+
+import re
+import time
+import argparse
+
+from vizscan.static import TOKEN_TYPES, MilkLexer, Token
+
+SHADER_LINES = [
+    "shader_body {",
+    "    float2 uv_c = uv - 0.5; // centre",
+    "    float3 col = texture2D(sampler_main, uv).xyz * 0.98;",
+    "    float pulse = sin(time * 2.0 + rad * 4.0) * 0.5 + 0.5;",
+    "    /* modulate the wobble */ col.rgb = col.rgb * pulse + q1 * 0.01;",
+    "    ret = vec3(col.x, col.y * 0.9, col.z + fract(time * 0.25));",
+    "}",
+]
+
+
+def legacy_tokenize(code):
+    """The original MilkLexer.tokenize loop, kept as the baseline."""
+    tokens = []
+    line_num = 1
+    pos = 0
+    while pos < len(code):
+        match = None
+        for token_type, regex in TOKEN_TYPES:
+            pattern = re.compile(regex)
+            match = pattern.match(code, pos)
+            if match:
+                text = match.group(0)
+                if token_type == "NEWLINE":
+                    line_num += 1
+                elif token_type != "SKIP" and token_type != "COMMENT":
+                    tokens.append(Token(token_type, text, line_num))
+                pos = match.end()
+                break
+        if not match:
+            pos += 1
+    return tokens
+
+
+def make_shader(lines):
+    body = [SHADER_LINES[i % len(SHADER_LINES)] for i in range(lines)]
+    return "\n".join(body) + "\n"
+
+
+def bench(fn, code, repeat):
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn(code))
+        best = min(best, time.perf_counter() - start)
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MilkLexer throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=2000)
+    args = parser.parse_args()
+
+    code = make_shader(args.lines)
+    assert legacy_tokenize(code) == MilkLexer(code).tokenize()
+
+    n_old, t_old = bench(legacy_tokenize, code, args.repeat)
+    n_new, t_new = bench(lambda c: MilkLexer(c).tokenize(), code, args.repeat)
+    n_str, t_str = bench(lambda c: MilkLexer(c).tokenize_stream(), code, args.repeat)
+
+    print(f"Shader body: {len(code)} chars, {n_new} tokens")
+    print(f"  legacy : {n_old / t_old:>12,.0f} tokens/sec ({t_old * 1000:.1f} ms)")
+    print(f"  master : {n_new / t_new:>12,.0f} tokens/sec ({t_new * 1000:.1f} ms)")
+    print(f"  stream : {n_str / t_str:>12,.0f} tokens/sec ({t_str * 1000:.1f} ms)")
+    print(
+        f"  speedup: {t_old / t_new:.1f}x (Token list), {t_old / t_str:.1f}x (stream)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_mesh.py
+
+Cost of MeshProgram on a typical per-pixel section (radial zoom pulse,
+angular rotation, a swirl in dx/dy driven by q variables). Times the
+vectorized pass, which runs the compiled per-pixel code once per frame over
+the whole mesh, against a reference loop that runs it once per vertex on
+scalars, for a few frames; the motion variables of both must be identical.
+Then reports the cost of full displacement fields per frame at several mesh
+sizes.
+
+Usage::
+
+    python -m benchmarks.bench_mesh [--seconds N] [--fps N]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from vizscan.nsel import MESH_VARIABLES, MeshProgram
+from vizscan.preset import load_preset
+
+PRESET = """[preset00]
+fWarpAnimSpeed=1.2
+per_frame_1=q1 = 0.5 + 0.5*sin(time*0.7); q2 = 0.02*cos(time*1.3);
+per_pixel_1=zoom = 1 + 0.05*q1*(1 - rad) + 0.01*sin(rad*12 - time*2);
+per_pixel_2=rot = q2 * sin(ang*3 + time);
+per_pixel_3=dx = 0.005*sin(y*10 + time)*q1; dy = 0.005*cos(x*10 - time)*q1;
+per_pixel_4=warp = if(above(rad, 0.6), 2, 0.5);
+"""
+
+
+def vertex_loop(mesh, frame_env):
+    """Per-pixel outputs computed one vertex at a time (the reference)."""
+    base = mesh.pixel_env(frame_env)
+    out = {name: np.empty(mesh.shape) for name in MESH_VARIABLES}
+    for index in np.ndindex(mesh.shape):
+        env = dict(base)
+        env.update((k, float(v[index])) for k, v in mesh.vertex.items())
+        mesh.per_pixel.run(env)
+        for name in MESH_VARIABLES:
+            out[name][index] = env[name]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-pixel mesh benchmark")
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+    preset = load_preset(PRESET)
+    frames = np.arange(args.seconds * args.fps, dtype=np.float64)
+
+    mesh = MeshProgram(preset, fps=args.fps)
+    env = mesh.frames.run(frames[:5])
+    t_vector = t_loop = 0.0
+    mismatches = 0
+    for i in range(5):
+        frame_env = {k: v[i] if np.ndim(v) else v for k, v in env.items()}
+        start = time.perf_counter()
+        vectorized = mesh.pixel_env(frame_env)
+        mesh.per_pixel.run(vectorized)
+        t_vector += time.perf_counter() - start
+        start = time.perf_counter()
+        reference = vertex_loop(mesh, frame_env)
+        t_loop += time.perf_counter() - start
+        mismatches += sum(
+            not np.array_equal(
+                np.broadcast_to(vectorized[name], mesh.shape), reference[name]
+            )
+            for name in MESH_VARIABLES
+        )
+    print(f"Per-pixel code on a {mesh.shape[1]}x{mesh.shape[0]} vertex mesh:")
+    print(f"  per-vertex loop  : {t_loop / 5 * 1000:>8.2f} ms/frame")
+    print(
+        f"  vectorized       : {t_vector / 5 * 1000:>8.3f} ms/frame"
+        f"  {t_loop / t_vector:.0f}x"
+    )
+    print(f"  mismatched values: {mismatches}")
+
+    print(f"\nDisplacement fields, {len(frames)} frames:")
+    for meshx, meshy in ((32, 24), (48, 36), (96, 72), (192, 144)):
+        mesh = MeshProgram(preset, fps=args.fps, meshx=meshx, meshy=meshy)
+        out = np.empty((256,) + mesh.shape + (2,), dtype=np.float32)
+        start = time.perf_counter()
+        for chunk in range(0, len(frames), len(out)):
+            batch = frames[chunk : chunk + len(out)]
+            mesh.fields(batch, out[: len(batch)])
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {meshx:>3}x{meshy:<3} : {elapsed * 1000:>8.1f} ms"
+            f" ({elapsed / len(frames) * 1e6:.0f} us/frame)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+bench_nsel.py
+
+Tree-walking Evaluator against code compiled by ``compile_code`` on a
+typical per-frame section: wave colours driven by time and audio, beat
+detection with ``above``/``if`` and a few constant subexpressions. Both are
+run once per frame on scalars (how stateful presets execute) and once over
+the whole duration as NumPy arrays; every output variable must be identical.
+
+Usage::
+
+    python -m benchmarks.bench_nsel [--seconds N] [--fps N]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from vizscan.nsel import Evaluator, compile_code, parse_code
+
+PER_FRAME = """
+wave_r = 0.5 + 0.4*sin(time*1.13 + 3.1415/3);
+wave_g = 0.5 + 0.4*sin(time*1.23 + 2*3.1415/3);
+wave_b = 0.5 + 0.4*sin(time*1.33);
+beat = above(bass, 1.3) * above(bass_att, 1.1);
+zoom = 1 + 0.02*sin(time*0.6) + if(beat, 0.05, 0);
+rot = 0.01*cos(time*0.37) * (1 - beat);
+decay = 0.98 - 0.01*below(treb, 0.7);
+ob_size = 0.01 + 0.005*sqr(sin(frame/30));
+ob_a = min(max(vol - 0.5, 0), 1) * 0.75;
+echo_alpha = if(above(mid, 1.0), 0.5, 0.25) + 1/60;
+"""
+
+INPUTS = ("bass", "mid", "treb", "bass_att", "mid_att", "treb_att", "vol")
+
+
+def frame_env(frame, fps):
+    env = {name: 1.0 for name in INPUTS}
+    env["frame"] = frame
+    env["time"] = frame / fps
+    return env
+
+
+def per_frame(run, frames, fps):
+    out = []
+    for frame in frames.tolist():
+        env = frame_env(frame, fps)
+        run(env)
+        out.append(env)
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NSEL compiler benchmark")
+    parser.add_argument("--seconds", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+    frames = np.arange(args.seconds * args.fps, dtype=np.float64)
+    program = parse_code(PER_FRAME)
+    compiled, t_compile = timed(compile_code, PER_FRAME)
+
+    def walk(env):
+        Evaluator(env).run(program)
+        return env
+
+    def fast(env):
+        compiled.run(env)
+        return env
+
+    walked, t_walk = timed(per_frame, walk, frames, args.fps)
+    fast_frames, t_fast = timed(per_frame, fast, frames, args.fps)
+    names = [s.target for s in program.statements]
+    mismatches = sum(
+        a[name] != b[name] for a, b in zip(walked, fast_frames) for name in names
+    )
+
+    walked_vec, t_walk_vec = timed(walk, frame_env(frames, args.fps))
+    fast_vec, t_fast_vec = timed(fast, frame_env(frames, args.fps))
+    mismatches += sum(
+        not np.array_equal(walked_vec[name], fast_vec[name]) for name in names
+    )
+
+    n = len(frames)
+    print(f"Frames: {n} ({args.seconds}s at {args.fps}fps), {len(names)} statements")
+    print(f"  compile          : {t_compile * 1000:>8.2f} ms")
+    print(
+        f"  per frame, walk  : {t_walk * 1000:>8.1f} ms"
+        f" ({t_walk / n * 1e6:.1f} us/frame)"
+    )
+    print(
+        f"  per frame, comp. : {t_fast * 1000:>8.1f} ms"
+        f" ({t_fast / n * 1e6:.1f} us/frame)"
+        f"  {t_walk / t_fast:.1f}x"
+    )
+    print(f"  vectorized, walk : {t_walk_vec * 1000:>8.2f} ms")
+    print(
+        f"  vectorized, comp.: {t_fast_vec * 1000:>8.2f} ms"
+        f"  {t_walk_vec / t_fast_vec:.1f}x"
+    )
+    print(f"  mismatched values: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+bench_pattern.py
+
+Cost of PatternDetector in the spatial render pass. Renders the
+MockProjectM concentric rings as RGB framebuffers, runs SpatialFlashDetector
+on every frame and PatternDetector on its sub-sampled schedule, and reports
+the time spent in each as a share of the whole pass, along with the cost of
+one FFT analysis.
+
+Usage::
+
+    python -m benchmarks.bench_pattern [--seconds N] [--fps N] [--framebuffer WxH]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from vizscan.dynamic import MockProjectM, PatternDetector, SpatialFlashDetector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pattern detection benchmark")
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--framebuffer", default="64x48")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.framebuffer.split("x"))
+    total = args.seconds * args.fps
+
+    renderer = MockProjectM()
+    renderer.load_preset("dynamic_rings.milk")
+    spatial = SpatialFlashDetector(fps=args.fps)
+    pattern = PatternDetector(fps=args.fps)
+    frame = np.zeros((height, width, 3), dtype=np.float32)
+
+    t_render = t_spatial = t_pattern = 0.0
+    events = 0
+    for i in range(total):
+        t0 = time.perf_counter()
+        renderer.render_rgb(frame)
+        t1 = time.perf_counter()
+        spatial.process_frame(i, frame)
+        t2 = time.perf_counter()
+        events += pattern.process_frame(i, spatial.last_lum) is not None
+        t3 = time.perf_counter()
+        t_render += t1 - t0
+        t_spatial += t2 - t1
+        t_pattern += t3 - t2
+
+    t_total = t_render + t_spatial + t_pattern
+    n = pattern.frames_analyzed
+    print(f"Frames: {total} at {width}x{height}, {n} analyzed for patterns")
+    print(f"  render_rgb       : {t_render * 1000:>8.1f} ms ({t_render / t_total:.0%})")
+    print(
+        f"  spatial flashes  : {t_spatial * 1000:>8.1f} ms ({t_spatial / t_total:.0%})"
+    )
+    print(
+        f"  patterns         : {t_pattern * 1000:>8.1f} ms ({t_pattern / t_total:.0%})"
+    )
+    print(f"  per FFT analysis : {t_pattern / max(n, 1) * 1e6:>8.1f} us")
+    print(f"  pattern events   : {events}")
+
+
+if __name__ == "__main__":
+    main()
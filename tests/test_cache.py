@@ -0,0 +1,114 @@
+from vizscan.cache import (
+    ScanCache,
+    file_parameters,
+    hash_file,
+    scan_parameters,
+    report_to_dict,
+    report_from_dict,
+)
+from vizscan.dynamic import run_hybrid_scan
+from vizscan.reports import HybridReport
+from vizscan.static import RiskEvent, RiskLevel, QualityReport
+
+
+class MockArgs:
+    def __init__(self, enable_dynamic=False, duration=5, fps=60):
+        self.enable_dynamic = enable_dynamic
+        self.duration = duration
+        self.fps = fps
+
+
+def test_report_roundtrip():
+    report = HybridReport(
+        filepath="a.milk",
+        static_events=[RiskEvent("InverterStrobe", RiskLevel.BAN, 150, "c", 3, ["x"])],
+        final_disposition="FAIL",
+        render_stats={"avg_lum": 0.5},
+        quality_report=QualityReport(background_type="Dark", attributes=["Dark"]),
+        certified=True,
+        max_lum_change=0.01,
+    )
+    restored = report_from_dict("b.milk", report_to_dict(report))
+    assert restored.filepath == "b.milk"
+    assert restored.static_events == report.static_events
+    assert restored.static_events[0].risk_level is RiskLevel.BAN
+    assert restored.render_stats == {"avg_lum": 0.5}
+    assert restored.quality_report == report.quality_report
+    assert (restored.certified, restored.max_lum_change) == (True, 0.01)
+
+
+def test_cache_hit_and_miss(tmp_path):
+    p = tmp_path / "strobe.milk"
+    p.write_text("ob_r = 1 - ob_r;")
+    args = MockArgs()
+    cache = ScanCache(str(tmp_path / "cache"))
+    key = cache.make_key(hash_file(str(p)), scan_parameters(args))
+
+    assert cache.get(key, str(p)) is None
+    cache.put(key, run_hybrid_scan(str(p), args))
+
+    cached = cache.get(key, str(p))
+    assert cached is not None
+    assert cached.final_disposition == "FAIL"
+    assert cached.static_events[0].rule_id == "InverterStrobe"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_key_depends_on_params():
+    cache = ScanCache("unused")
+    static_key = cache.make_key("abc", scan_parameters(MockArgs()))
+    # fps/duration only matter once the render phase runs
+    assert static_key == cache.make_key("abc", scan_parameters(MockArgs(fps=30)))
+    dyn_60 = cache.make_key("abc", scan_parameters(MockArgs(True, fps=60)))
+    dyn_30 = cache.make_key("abc", scan_parameters(MockArgs(True, fps=30)))
+    assert len({static_key, dyn_60, dyn_30}) == 3
+    fail_fast = MockArgs(True, fps=60)
+    fail_fast.dynamic_mode = "fail-fast"
+    assert cache.make_key("abc", scan_parameters(fail_fast)) != dyn_60
+    spatial = MockArgs(True, fps=60)
+    spatial.flash_analysis = "spatial"
+    assert cache.make_key("abc", scan_parameters(spatial)) != dyn_60
+    software = MockArgs(True, fps=60)
+    software.renderer = "software"
+    assert cache.make_key("abc", scan_parameters(software)) != dyn_60
+
+
+def test_cache_key_depends_on_name_for_mock_renderer():
+    cache = ScanCache("unused")
+
+    def key(args, path):
+        return cache.make_key("abc", file_parameters(scan_parameters(args), path))
+
+    # Same content: the static result does not depend on the name
+    assert key(MockArgs(), "a/safe.milk") == key(MockArgs(), "b/copy.milk")
+    # The mock renders from the file name, so a renamed copy is a new entry
+    mock = MockArgs(True)
+    assert key(mock, "a/safe.milk") != key(mock, "a/dynamic_fail.milk")
+    assert key(mock, "a/safe.milk") == key(mock, "b/safe.milk")
+    software = MockArgs(True)
+    software.renderer = "software"
+    assert key(software, "a/safe.milk") == key(software, "a/dynamic_fail.milk")
+
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = ScanCache(str(tmp_path))
+    key = "ab" + "0" * 62
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / f"{key}.json").write_text("{not json")
+    assert cache.get(key, "x.milk") is None
+
+
+def test_cache_eviction(tmp_path):
+    cache = ScanCache(str(tmp_path), max_bytes=1000)
+    report = HybridReport(filepath="x.milk", render_stats={"pad": "x" * 200})
+    keys = [f"{i:02x}" + "0" * 62 for i in range(10)]
+    for key in keys:
+        cache.put(key, report)
+    assert cache.total_size() <= 1000
+    # The most recently written entry survives eviction
+    assert cache.get(keys[-1], "x.milk") is not None
+    assert cache.get(keys[0], "x.milk") is None
+
+
+def test_hash_file_missing():
+    assert hash_file("nonexistent.milk") is None
@@ -2,10 +2,13 @@
 test_cli.py
 """
 import sys
+import json
+import argparse
 from unittest.mock import patch
 
 import pytest
-from vizscan.cli import main
+from vizscan.cli import main, iter_scans, framebuffer_size
+from vizscan.dynamic import run_hybrid_scan
 
 
 def test_hybrid_cli_help(capsys):
@@ -24,12 +27,23 @@ def test_hybrid_cli_no_args(capsys):
     assert "usage:" in captured.out
 
 
+def test_hybrid_cli_adaptive_needs_random_access(tmp_path, capsys):
+    argv = [str(tmp_path), "--enable-dynamic", "--sampling", "adaptive"]
+    with patch.object(sys, "argv", ["vizscan/cli.py", *argv, "--renderer", "software"]):
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+    assert exit_info.value.code == 2
+    assert "random-access renderer" in capsys.readouterr().err
+
+
 def test_hybrid_cli_scoring(capsys):
     with patch.object(sys, "argv", ["vizscan/cli.py", "--help-scoring"]):
         with pytest.raises(SystemExit):
             main()
     captured = capsys.readouterr()
     assert "pes:InverterStrobe" in captured.out
+    assert "pes:DynamicRedFlash" in captured.out
+    assert "pes:DynamicPattern" in captured.out
 
 
 def test_hybrid_cli_file(tmp_path, capsys):
@@ -62,6 +76,24 @@ def test_hybrid_cli_dir_flat(tmp_path, capsys):
     assert "Scanning 1 files..." in captured.out
 
 
+def test_hybrid_cli_taint_memo_stat(tmp_path, capsys):
+    p = tmp_path / "test.milk"
+    p.write_text("a = sin(time * 2);\nb = sin(time * 2);")
+    with patch.object(sys, "argv", ["vizscan/cli.py", str(p), "--no-cache"]):
+        main()
+    captured = capsys.readouterr()
+    assert "Taint memo:" in captured.out
+
+
+def test_hybrid_cli_prefilter_stat(tmp_path, capsys):
+    p = tmp_path / "test.milk"
+    p.write_text("x = 1;")
+    with patch.object(sys, "argv", ["vizscan/cli.py", str(p), "--no-cache"]):
+        main()
+    captured = capsys.readouterr()
+    assert "Prefilter: skipped" in captured.out
+
+
 def test_hybrid_cli_score_quality(tmp_path, capsys):
     p = tmp_path / "test.milk"
     p.write_text("ob_r = 0.5;")
@@ -106,3 +138,139 @@ def test_hybrid_cli_fail_exit(tmp_path, capsys):
         with pytest.raises(SystemExit) as e:
             main()
         assert e.value.code == 1
+
+
+def test_hybrid_cli_cache(tmp_path, capsys):
+    p = tmp_path / "test.milk"
+    p.write_text("ob_r = 1 - ob_r;")
+    cache_dir = tmp_path / "cache"
+    argv = ["vizscan/cli.py", str(p), "--cache-dir", str(cache_dir)]
+    for expected in ("0 hits, 1 misses", "1 hits, 0 misses"):
+        with patch.object(sys, "argv", argv):
+            with pytest.raises(SystemExit):
+                main()
+        captured = capsys.readouterr()
+        assert "[FAIL] test.milk" in captured.out
+        assert f"Cache: {expected}" in captured.out
+
+
+def test_hybrid_cli_no_cache(tmp_path, capsys):
+    p = tmp_path / "test.milk"
+    p.write_text("ob_r = 0.5;")
+    cache_dir = tmp_path / "cache"
+    argv = ["vizscan/cli.py", str(p), "--no-cache", "--cache-dir", str(cache_dir)]
+    with patch.object(sys, "argv", argv):
+        main()
+    captured = capsys.readouterr()
+    assert "Cache:" not in captured.out
+    assert not cache_dir.exists()
+
+
+def test_hybrid_cli_jobs(tmp_path, capsys):
+    names = [f"p{i:02d}.milk" for i in range(8)]
+    for i, name in enumerate(names):
+        code = "ob_r = 1 - ob_r;" if i == 5 else "ob_r = 0.5;"
+        (tmp_path / name).write_text(code)
+    out = tmp_path / "report.jsonld"
+    argv = [str(tmp_path), "--jobs", "3", "--no-cache", "-o", str(out)]
+    with patch.object(sys, "argv", ["vizscan/cli.py", *argv]):
+        with pytest.raises(SystemExit) as e:
+            main()
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    lines = [line for line in captured.out.splitlines() if line.startswith("[")]
+    assert len(lines) == 8
+    assert lines[5] == "[FAIL] p05.milk"
+
+
+def test_iter_scans_isolates_failures(tmp_path):
+    files = []
+    for name in ("a.milk", "b.milk"):
+        p = tmp_path / name
+        p.write_text("ob_r = 0.5;")
+        files.append(str(p))
+
+    # No enable_dynamic attribute -> every scan raises. A Namespace pickles
+    # under every start method, so the args reach spawned workers too.
+    results = list(iter_scans(files, argparse.Namespace(), jobs=2))
+    assert [r[0] for r in results] == files
+    assert all(rep is None and "enable_dynamic" in err for _, rep, err in results)
+
+
+def test_hybrid_cli_dedupe(tmp_path, capsys):
+    (tmp_path / "a.milk").write_text("ob_r = 1 - ob_r;")
+    (tmp_path / "b.milk").write_text("// renamed copy\nob_r=1-ob_r;")
+    (tmp_path / "c.milk").write_text("ob_r = 0.5;")
+    out = tmp_path / "report.jsonld"
+    argv = [str(tmp_path), "--dedupe", "--no-cache", "-o", str(out)]
+    with patch("vizscan.cli.run_hybrid_scan", wraps=run_hybrid_scan) as scan:
+        with patch.object(sys, "argv", ["vizscan/cli.py", *argv]):
+            with pytest.raises(SystemExit):
+                main()
+    assert scan.call_count == 2
+    captured = capsys.readouterr()
+    assert "Deduplicated to 2 unique presets" in captured.out
+    assert "[FAIL] b.milk" in captured.out
+
+    graph = json.loads(out.read_text())["@graph"]
+    by_subject = {a["earl:subject"]["@id"]: a for a in graph[1:]}
+    dup = by_subject[f"file://{tmp_path / 'b.milk'}"]
+    assert dup["pes:duplicateOf"] == {"@id": f"file://{tmp_path / 'a.milk'}"}
+    assert dup["earl:result"]["earl:outcome"] == "earl:failed"
+    assert "pes:duplicateOf" not in by_subject[f"file://{tmp_path / 'a.milk'}"]
+    # Events point at the copy's own lines
+    assert {e["pes:line"] for e in dup["earl:result"]["pes:errors"]} == {2}
+
+
+def test_hybrid_cli_dedupe_keeps_mock_results_apart(tmp_path, capsys):
+    # Both are comment-only, but the mock renderer keys on the file name
+    for name in ("dynamic_fail.milk", "dynamic_edge.milk"):
+        (tmp_path / name).write_text(f"// {name}\n")
+    argv = [
+        str(tmp_path),
+        "--enable-dynamic",
+        "--dedupe",
+        "--no-cache",
+        "-o",
+        str(tmp_path / "report.jsonld"),
+    ]
+    with patch.object(sys, "argv", ["vizscan/cli.py", *argv]):
+        with pytest.raises(SystemExit):
+            main()
+    captured = capsys.readouterr()
+    assert "Deduplicated" not in captured.out
+    assert "[FAIL] dynamic_fail.milk" in captured.out
+
+
+def test_framebuffer_size():
+    assert framebuffer_size("128x96") == (128, 96)
+    for bad in ("128", "axb", "4x4"):
+        with pytest.raises(argparse.ArgumentTypeError) as exc_info:
+            framebuffer_size(bad)
+        # The parse error is the message; the ValueError is not chained
+        assert exc_info.value.__suppress_context__ or bad == "4x4"
+
+
+def test_hybrid_cli_spatial(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    p = tmp_path / "dynamic_antiphase.milk"
+    p.write_text("ob_r = 0.5;")
+    argv = ["vizscan/cli.py", str(p), "--enable-dynamic", "--no-cache"]
+    with patch.object(sys, "argv", argv):
+        main()
+    assert "[PASS] dynamic_antiphase.milk" in capsys.readouterr().out
+    argv += ["--flash-analysis", "spatial", "--framebuffer", "32x24"]
+    with patch.object(sys, "argv", argv):
+        with pytest.raises(SystemExit):
+            main()
+    assert "[FAIL] dynamic_antiphase.milk" in capsys.readouterr().out
+
+
+def test_hybrid_cli_software_renderer(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    p = tmp_path / "dynamic_fail.milk"
+    p.write_text("[preset00]\nper_frame_1=wave_r = 0.5 + 0.1*sin(time);\n")
+    argv = ["vizscan/cli.py", str(p), "--enable-dynamic", "--no-cache"]
+    with patch.object(sys, "argv", argv + ["--renderer", "software"]):
+        main()
+    assert "[PASS] dynamic_fail.milk" in capsys.readouterr().out
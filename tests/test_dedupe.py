@@ -0,0 +1,69 @@
+from vizscan.dedupe import (
+    normalize_preset,
+    fingerprint,
+    find_duplicates,
+    line_mapping,
+)
+
+
+def test_normalize_ignores_comments_and_whitespace():
+    a = "// Preset A\nob_r = 1 - ob_r;\n\nfloat x = sin(time);"
+    b = "ob_r=1-ob_r; /* copy */\n  float   x=sin( time ) ;"
+    assert normalize_preset(a) == normalize_preset(b)
+    assert fingerprint(a) == fingerprint(b)
+
+
+def test_normalize_keeps_word_separation():
+    assert fingerprint("float x = 1;") != fingerprint("floatx = 1;")
+
+
+def test_normalize_keeps_line_breaks():
+    assert fingerprint("a=1\nb=2") != fingerprint("a=1 b=2")
+    assert normalize_preset("a = 1\n\n/* x\ny */\nb=2") == "a=1\nb=2"
+
+
+def test_normalize_ignores_header_only_keys():
+    a = "MILKDROP_PRESET_VERSION=201\n[preset00]\nfRating=5.0\nfDecay=0.98\n"
+    b = "[preset01]\nfRating=1.0\nfDecay=0.98\n"
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint(a) != fingerprint(b.replace("0.98", "0.5"))
+
+
+def test_find_duplicates(tmp_path):
+    paths = []
+    for name, code in [
+        ("a.milk", "ob_r = 0.5;"),
+        ("b.milk", "ob_r = 0.25;"),
+        ("c.milk", "// copy of a\nob_r=0.5;"),
+    ]:
+        p = tmp_path / name
+        p.write_text(code)
+        paths.append(str(p))
+    missing = str(tmp_path / "missing.milk")
+
+    groups = find_duplicates(paths + [missing])
+    assert groups == {
+        paths[0]: paths[0],
+        paths[1]: paths[1],
+        paths[2]: paths[0],
+        missing: missing,
+    }
+
+
+def test_find_duplicates_key(tmp_path):
+    paths = []
+    for name in ("a.milk", "b.milk", "c.milk"):
+        p = tmp_path / name
+        p.write_text("ob_r = 0.5;")
+        paths.append(str(p))
+    groups = find_duplicates(paths, key=lambda f: f.endswith("c.milk"))
+    assert groups == {paths[0]: paths[0], paths[1]: paths[0], paths[2]: paths[2]}
+
+
+def test_line_mapping(tmp_path):
+    a = tmp_path / "a.milk"
+    b = tmp_path / "b.milk"
+    a.write_text("x = 1;\ny = 2;")
+    b.write_text("// copy\n\nx=1;\n/* two\nlines */\ny=2;")
+    assert line_mapping(str(a), str(b)) == {1: 3, 2: 6}
+    assert line_mapping(str(a), str(tmp_path / "missing.milk")) == {}
@@ -1,3 +1,6 @@
+import os
+from contextlib import nullcontext
+
 import pytest
 from unittest.mock import patch, MagicMock
 from vizscan.dynamic import (
@@ -6,8 +9,19 @@ from vizscan.dynamic import (
     MockProjectM,
     IRenderer,
     scan_dynamic,
+    luminance_stats,
+    AdaptiveSampler,
+    SpatialFlashDetector,
+    relative_luminance,
+    block_mean,
+    RedFlashDetector,
+    RED_LINEAR,
+    PatternDetector,
+    SoftwareRenderer,
+    affine_scan,
+    make_renderer,
 )
-from vizscan.static import RiskLevel
+from vizscan.static import REGISTRY, RiskLevel
 
 
 # Mock args class
@@ -63,6 +77,83 @@ def test_safe_file(tmp_path):
     assert len(report.dynamic_events) == 0
 
 
+CALM_PRESET = os.path.join(os.path.dirname(__file__), "presets", "calm_ambient.milk")
+
+
+def test_certified_preset_skips_render():
+    with patch("vizscan.dynamic.scan_dynamic") as mock_sd:
+        report = run_hybrid_scan(CALM_PRESET, MockArgs(enable_dynamic=True))
+    mock_sd.assert_not_called()
+    assert report.certified
+    assert report.max_lum_change == pytest.approx(0.12 / 60 + 0.001)
+    assert report.final_disposition == "PASS"
+
+
+def test_certification_depends_on_fps():
+    with patch("vizscan.dynamic.scan_dynamic") as mock_sd:
+        mock_sd.return_value = ([], {})
+        report = run_hybrid_scan(CALM_PRESET, MockArgs(enable_dynamic=True, fps=1))
+    mock_sd.assert_called_once()
+    assert not report.certified
+    assert report.max_lum_change == pytest.approx(0.121)
+
+
+def test_uncertified_presets_render(tmp_path):
+    p = tmp_path / "audio.milk"
+    p.write_text("[preset00]\nper_frame_1=ob_r = bass;\n")
+    with patch("vizscan.dynamic.scan_dynamic") as mock_sd:
+        mock_sd.return_value = ([], {})
+        report = run_hybrid_scan(str(p), MockArgs(enable_dynamic=True))
+    mock_sd.assert_called_once()
+    assert not report.certified
+    assert report.max_lum_change is None
+
+
+OB_ALPHA_STROBE = (
+    "[preset00]\nfDecay=0.5\nob_r=1\nob_g=1\nob_b=1\nob_size=0.5\n"
+    "per_frame_1=c = c + 1;\nper_frame_2=ob_a = above(c % 4, 1);\n"
+)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        OB_ALPHA_STROBE,
+        # No output assigned at all proves nothing
+        "[preset00]\nob_r=1\nper_frame_1=c = c + 1;\n",
+        "[preset00]\nper_pixel_1=zoom = 1 + 0.5*bass;\n",
+        "[preset00]\nwave_0_per_point1=r = treb;\n",
+    ],
+)
+def test_unbounded_visible_state_is_not_certified(tmp_path, code):
+    p = tmp_path / "strobe.milk"
+    p.write_text(code)
+    with patch("vizscan.dynamic.scan_dynamic") as mock_sd:
+        mock_sd.return_value = ([], {})
+        report = run_hybrid_scan(str(p), MockArgs(enable_dynamic=True))
+    mock_sd.assert_called_once()
+    assert not report.certified
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "[preset00]\nper_frame_1=ob_r = 0.5; zoom = 1 + 0.01*sin(time);\n",
+        "[preset00]\nper_frame_1=ob_r = 0.5; gamma = 2 + 0.05*sin(time);\n",
+    ],
+)
+def test_moving_non_luminance_outputs_are_not_certified(tmp_path, code):
+    # Slow, but a zoom or gamma bound says nothing about luminance
+    p = tmp_path / "moving.milk"
+    p.write_text(code)
+    with patch("vizscan.dynamic.scan_dynamic") as mock_sd:
+        mock_sd.return_value = ([], {})
+        report = run_hybrid_scan(str(p), MockArgs(enable_dynamic=True))
+    mock_sd.assert_called_once()
+    assert not report.certified
+    assert report.max_lum_change == 0
+
+
 def test_static_warn_only(tmp_path):
     # Create a file that triggers a warning but not a ban
     p = tmp_path / "static_warn.milk"
@@ -136,6 +227,10 @@ def test_scan_dynamic_stats():
         instance = MockPM.return_value
         # Mock render_frame to return 0.0 then 1.0
         instance.render_frame.side_effect = [0.0, 1.0] * 30  # 60 frames
+        # Batches go through the default single-frame adapter
+        instance.render_frames.side_effect = lambda n, out, rgb=None: (
+            IRenderer.render_frames(instance, n, out, rgb)
+        )
 
         events, stats = scan_dynamic("dummy.milk", duration_sec=1, fps=60)
 
@@ -152,9 +247,20 @@ def test_scan_dynamic_zero_frames():
     assert stats["dark_ratio"] == 0.0
 
 
+def test_scan_dynamic_zero_frames_spatial():
+    pytest.importorskip("numpy")
+    events, stats = scan_dynamic(
+        "dummy.milk", duration_sec=0, fps=60, analysis="spatial"
+    )
+    assert events == []
+    assert stats == luminance_stats([])
+
+
 def test_scan_dynamic_risk_event():
-    # Mock FlashDetector to return an event
-    with patch("vizscan.dynamic.FlashDetector") as MockFD:
+    # Mock FlashDetector to return an event (streaming path)
+    with patch("vizscan.dynamic.np", None), patch(
+        "vizscan.dynamic.FlashDetector"
+    ) as MockFD:
         instance = MockFD.return_value
         instance.process_frame.return_value = "RiskEvent"
 
@@ -191,3 +297,691 @@ def test_mock_projectm_unknown_mode():
     mp = MockProjectM()
     mp.mode = "unknown"
     assert mp.render_frame() == 0.0
+
+
+# ==========================================
+# BATCH FLASH DETECTION
+# ==========================================
+
+
+def stream(lums, detector=None):
+    """Per-frame reference: window counts and the events of process_frame."""
+    detector = detector or FlashDetector()
+    counts, events = [], []
+    for i, lum in enumerate(lums):
+        events.append(detector.process_frame(i, lum))
+        counts.append(len(detector.flash_timestamps))
+    return counts, events
+
+
+def mock_luminance(name, frames):
+    renderer = MockProjectM()
+    renderer.load_preset(name)
+    return [renderer.render_frame() for _ in range(frames)]
+
+
+SERIES = {
+    "strobe": mock_luminance("dynamic_fail.milk", 300),
+    "edge": mock_luminance("dynamic_edge.milk", 300),
+    "safe": mock_luminance("safe.milk", 300),
+    # Bursts of flashing separated by calm stretches: several violation runs
+    "bursts": ([0.0, 1.0] * 10 + [0.5] * 90) * 3,
+}
+
+
+@pytest.mark.parametrize("name", sorted(SERIES))
+def test_process_frames_matches_process_frame(name):
+    np = pytest.importorskip("numpy")
+    lums = SERIES[name]
+    counts, events = stream(lums)
+    result = FlashDetector().process_frames(np.array(lums))
+
+    assert result.counts.tolist() == counts
+    # Collapse consecutive violating frames into runs
+    runs = []
+    for i in (i for i, e in enumerate(events) if e is not None):
+        if runs and runs[-1][1] == i - 1:
+            runs[-1] = (runs[-1][0], i)
+        else:
+            runs.append((i, i))
+    assert result.violations == runs
+    assert result.events == [events[first] for first, _ in runs]
+
+
+def test_process_frames_carries_state_across_chunks():
+    pytest.importorskip("numpy")
+    lums = SERIES["bursts"]
+    detector = FlashDetector()
+    chunked = []
+    for start in range(0, len(lums), 7):
+        chunked.extend(detector.process_frames(lums[start : start + 7], start).counts)
+    reference = FlashDetector()
+    assert chunked == stream(lums, detector=reference)[0]
+    assert list(detector.flash_timestamps) == list(reference.flash_timestamps)
+    assert detector.last_lum == reference.last_lum
+    # Streaming can pick up where a batch left off
+    assert detector.process_frame(len(lums), 1.0) == reference.process_frame(
+        len(lums), 1.0
+    )
+
+
+def test_process_frames_empty():
+    pytest.importorskip("numpy")
+    result = FlashDetector().process_frames([])
+    assert len(result.counts) == 0
+    assert result.events == []
+
+
+@pytest.mark.parametrize("name", ["dynamic_fail.milk", "dynamic_edge.milk", "a.milk"])
+def test_batch_scan_dynamic_matches_streaming(name):
+    pytest.importorskip("numpy")
+    batch_events, batch_stats = scan_dynamic(name, duration_sec=3, fps=60)
+    with patch("vizscan.dynamic.np", None):
+        events, stats = scan_dynamic(name, duration_sec=3, fps=60)
+    assert batch_events == events
+    # Frames are rendered into a float32 buffer
+    assert batch_stats == pytest.approx(stats, rel=1e-6)
+
+
+def test_luminance_stats_empty():
+    pytest.importorskip("numpy")
+    assert luminance_stats([]) == {
+        "avg_lum": 0.0,
+        "min_lum": 1.0,
+        "max_lum": 0.0,
+        "dark_ratio": 0.0,
+        "light_ratio": 0.0,
+    }
+
+
+# ==========================================
+# BATCH RENDERING
+# ==========================================
+
+
+class OneFrameRenderer(IRenderer):
+    """A renderer with only the single-frame API."""
+
+    def __init__(self):
+        self.frames = 0
+        self.audio = 0
+
+    def update_audio(self):
+        self.audio += 1
+
+    def render_frame(self):
+        self.frames += 1
+        return self.frames / 10
+
+
+def test_render_frames_default_adapter():
+    renderer = OneFrameRenderer()
+    out = [0.0] * 5
+    assert renderer.render_frames(3, out) == 3
+    assert out == [0.1, 0.2, 0.3, 0.0, 0.0]
+    assert renderer.audio == 3
+
+
+@pytest.mark.parametrize("name", ["dynamic_fail.milk", "dynamic_edge.milk", "a.milk"])
+def test_mock_render_frames_matches_render_frame(name):
+    np = pytest.importorskip("numpy")
+    single = MockProjectM()
+    single.load_preset(name)
+    expected = np.array([single.render_frame() for _ in range(250)], np.float32)
+
+    batch = MockProjectM()
+    batch.load_preset(name)
+    out = np.full(100, -1.0, dtype=np.float32)
+    chunks = [out[: batch.render_frames(n, out)].copy() for n in (100, 100, 50)]
+    assert np.array_equal(np.concatenate(chunks), expected)
+    assert batch.frame_count == single.frame_count
+
+
+def test_scan_dynamic_reuses_buffer():
+    np = pytest.importorskip("numpy")
+    buffer = np.zeros(64, dtype=np.float32)
+    with patch.object(
+        MockProjectM,
+        "render_frames",
+        autospec=True,
+        side_effect=MockProjectM.render_frames,
+    ) as render_frames:
+        events, _ = scan_dynamic("dynamic_fail.milk", 2, 60, buffer=buffer)
+    # 120 frames in chunks of 64, each written into the same buffer
+    assert [c.args[1] for c in render_frames.call_args_list] == [64, 56]
+    assert all(c.args[2] is buffer for c in render_frames.call_args_list)
+    assert [e.rule_id for e in events] == ["DynamicStrobe"]
+    assert events[0].timecode == 0.0
+
+
+# ==========================================
+# FAIL-FAST MODE
+# ==========================================
+
+
+def test_can_exceed():
+    detector = FlashDetector(fps=60, limit=6)
+    assert detector.can_exceed(99, 7)
+    assert not detector.can_exceed(99, 6)
+    detector.flash_timestamps.extend([40, 95])
+    # Frame 100 still sees the flash at 95 (and 40 has left the window)
+    assert detector.can_exceed(99, 6)
+    assert not detector.can_exceed(99, 5)
+
+
+@pytest.mark.parametrize("numpy_path", [True, False])
+def test_fail_fast_stops_at_first_violation(numpy_path):
+    if numpy_path:
+        pytest.importorskip("numpy")
+    with nullcontext() if numpy_path else patch("vizscan.dynamic.np", None):
+        full_events, full_stats = scan_dynamic("dynamic_fail.milk", 5, 60)
+        events, stats = scan_dynamic("dynamic_fail.milk", 5, 60, mode="fail-fast")
+    assert events == full_events
+    assert "partial" not in full_stats
+    assert stats["partial"] is True
+    # The first violation is at frame 11; at most one second is rendered
+    assert 11 < stats["frames_rendered"] <= 60
+
+
+@pytest.mark.parametrize("numpy_path", [True, False])
+def test_fail_fast_early_pass(numpy_path):
+    if numpy_path:
+        pytest.importorskip("numpy")
+    with nullcontext() if numpy_path else patch("vizscan.dynamic.np", None):
+        events, stats = scan_dynamic("safe.milk", 5, 60, mode="fail-fast")
+    assert events == []
+    # The last 6 frames cannot add 7 transitions to any window
+    assert stats["frames_rendered"] == 300 - 6
+
+
+def test_hybrid_scan_fail_fast(tmp_path):
+    p = tmp_path / "dynamic_fail.milk"
+    p.write_text("ob_r = 0.5;")
+    args = MockArgs(enable_dynamic=True)
+    args.dynamic_mode = "fail-fast"
+    report = run_hybrid_scan(str(p), args)
+    assert report.final_disposition == "FAIL"
+    assert report.render_stats["partial"] is True
+
+
+# ==========================================
+# ADAPTIVE SAMPLING
+# ==========================================
+
+
+def full_trace(name, frames):
+    np = pytest.importorskip("numpy")
+    renderer = MockProjectM()
+    renderer.load_preset(name)
+    lums = np.empty(frames, dtype=np.float32)
+    renderer.render_frames(frames, lums)
+    return lums
+
+
+def test_render_at_matches_render_frames():
+    np = pytest.importorskip("numpy")
+    lums = full_trace("dynamic_edge.milk", 200)
+    renderer = MockProjectM()
+    renderer.load_preset("dynamic_edge.milk")
+    frames = np.array([0, 3, 17, 199])
+    out = np.empty(4, dtype=np.float32)
+    assert renderer.render_at(frames, out) == 4
+    assert out.tolist() == lums[frames].tolist()
+
+
+def test_render_at_needs_random_access():
+    assert not IRenderer.random_access
+    with pytest.raises(NotImplementedError):
+        IRenderer().render_at([0], [0.0])
+
+
+@pytest.mark.parametrize(
+    "name", ["dynamic_fail.milk", "dynamic_edge.milk", "safe.milk"]
+)
+def test_adaptive_sampling_matches_full_rate(name):
+    full = full_trace(name, 600)
+    renderer = MockProjectM()
+    renderer.load_preset(name)
+    sampler = AdaptiveSampler(60)
+    lums = sampler.sample(renderer, 600)
+    assert (
+        FlashDetector().process_frames(lums).violations
+        == FlashDetector().process_frames(full).violations
+    )
+    if name == "safe.milk":
+        # Smooth trace: coarse samples and probes only
+        assert sampler.frames_rendered < 200
+    else:
+        # Flashing (or 2.9Hz, just under the limit): every frame is rendered
+        assert sampler.frames_rendered == 600
+        assert lums.tolist() == full.tolist()
+
+
+def test_adaptive_sampling_refines_burst_windows():
+    np = pytest.importorskip("numpy")
+
+    class Burst(IRenderer):
+        random_access = True
+
+        def __init__(self):
+            self.calls = []
+
+        def render_at(self, frames, out):
+            frames = np.asarray(frames)
+            self.calls.append(frames)
+            # Flicker every frame during seconds 4-5, mid-grey otherwise
+            out[: len(frames)] = np.where(
+                (frames >= 240) & (frames < 300), frames % 2, 0.5
+            )
+            return len(frames)
+
+    renderer = Burst()
+    sampler = AdaptiveSampler(60)
+    lums = sampler.sample(renderer, 600)
+    rendered = np.unique(np.concatenate(renderer.calls))
+    # Windows 3-5 at full rate, the rest coarse
+    assert set(range(180, 360)) <= set(rendered.tolist())
+    assert sampler.frames_rendered == len(rendered) < 400
+    events = FlashDetector().process_frames(lums).events
+    assert events[0].timecode == 4.0
+
+
+def test_adaptive_sampling_zero_frames():
+    pytest.importorskip("numpy")
+    renderer = MockProjectM()
+    renderer.load_preset("dynamic_fail.milk")
+    sampler = AdaptiveSampler(60)
+    assert len(sampler.sample(renderer, 0)) == 0
+    assert sampler.frames_rendered == 0
+    events, stats = scan_dynamic("dummy.milk", 0, 60, sampling="adaptive")
+    assert events == []
+    assert stats["frames_rendered"] == 0
+
+
+def test_scan_dynamic_adaptive():
+    pytest.importorskip("numpy")
+    events, stats = scan_dynamic("dynamic_fail.milk", 5, 60, sampling="adaptive")
+    assert events == scan_dynamic("dynamic_fail.milk", 5, 60)[0]
+    assert stats["frames_rendered"] == 300
+    _, stats = scan_dynamic("safe.milk", 5, 60, sampling="adaptive")
+    assert stats["frames_rendered"] < 300
+
+
+def test_scan_dynamic_adaptive_fail_fast():
+    pytest.importorskip("numpy")
+    full_events, _ = scan_dynamic("dynamic_fail.milk", 5, 60)
+    events, stats = scan_dynamic(
+        "dynamic_fail.milk", 5, 60, sampling="adaptive", mode="fail-fast"
+    )
+    assert events == full_events
+    assert stats["partial"] is True
+    # The first second, plus the samples that decide whether it is busy
+    assert 60 <= stats["frames_rendered"] < 120
+    events, stats = scan_dynamic(
+        "safe.milk", 5, 60, sampling="adaptive", mode="fail-fast"
+    )
+    assert events == [] and "partial" not in stats
+
+
+def test_adaptive_sampling_stops_when_decided():
+    pytest.importorskip("numpy")
+    renderer = MockProjectM()
+    renderer.load_preset("dynamic_fail.milk")
+    full = AdaptiveSampler(60).sample(renderer, 300)
+    settled = []
+
+    def decided(lums, start, end):
+        settled.append((start, end))
+        return end >= 120
+
+    sampler = AdaptiveSampler(60)
+    lums = sampler.sample(renderer, 300, decided=decided)
+    assert settled == [(0, 60), (60, 120)]
+    assert lums.tolist() == full[:120].tolist()
+    assert sampler.frames_rendered < 300
+
+
+# ==========================================
+# SPATIAL FLASH ANALYSIS
+# ==========================================
+
+
+def test_relative_luminance():
+    np = pytest.importorskip("numpy")
+    rgb = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [1.0, 0.0, 0.0], [0.5] * 3])
+    assert relative_luminance(rgb) == pytest.approx(
+        [0.0, 1.0, 0.2126, 0.2140], abs=1e-4
+    )
+
+
+def test_block_mean():
+    np = pytest.importorskip("numpy")
+    image = np.arange(16, dtype=np.float32).reshape(4, 4)
+    assert block_mean(image, 1) is image
+    assert block_mean(image, 2).tolist() == [[2.5, 4.5], [10.5, 12.5]]
+
+
+def rgb_trace(name, frames, detector, shape=(48, 64)):
+    np = pytest.importorskip("numpy")
+    renderer = MockProjectM()
+    renderer.load_preset(name)
+    frame = np.zeros(shape + (3,), dtype=np.float32)
+    return [
+        detector.process_frame(i, renderer.render_rgb(frame)) for i in range(frames)
+    ]
+
+
+def first(events):
+    return next((e for e in events if e is not None), None)
+
+
+def test_spatial_detector_uniform_frames_match_mean_detector():
+    pytest.importorskip("numpy")
+    # A full-screen strobe is a full-screen flash in every field
+    spatial = first(rgb_trace("dynamic_fail.milk", 120, SpatialFlashDetector()))
+    mean = first(stream(mock_luminance("dynamic_fail.milk", 120))[1])
+    assert spatial.timecode == mean.timecode
+    assert spatial.variables == ["screen_region"]
+    assert first(rgb_trace("dynamic_edge.milk", 300, SpatialFlashDetector())) is None
+
+
+def test_spatial_detector_catches_flashes_that_average_out():
+    pytest.importorskip("numpy")
+    assert first(stream(mock_luminance("dynamic_antiphase.milk", 120))[1]) is None
+    event = first(rgb_trace("dynamic_antiphase.milk", 120, SpatialFlashDetector()))
+    assert event.rule_id == "DynamicStrobe"
+    assert "over >25% of the 10-degree field" in event.context
+
+
+def test_spatial_detector_ignores_scattered_small_flickers():
+    pytest.importorskip("numpy")
+    # 1 pixel in 8 flickers: enough to move the average by more than 10%,
+    # but no field has 25% of its area flashing
+    assert first(stream(mock_luminance("dynamic_sparkle.milk", 120))[1]) is not None
+    assert first(rgb_trace("dynamic_sparkle.milk", 120, SpatialFlashDetector())) is None
+
+
+def test_spatial_detector_area_rule():
+    np = pytest.importorskip("numpy")
+    detector = SpatialFlashDetector(grid=6)
+    frame = np.zeros((48, 64, 3), dtype=np.float32)
+    # One field is 2x2 tiles = 16x21 pixels (the grid crops 64 to 63)
+    events = []
+    for i in range(60):
+        frame[...] = 0.0
+        frame[:8, :11] = float(i % 2)  # A little over 25% of the top-left field
+        events.append(detector.process_frame(i, frame))
+    assert first(events) is not None
+    assert detector.counts[0, 0] == 59  # Every frame after the first
+
+    detector = SpatialFlashDetector(grid=6)
+    for i in range(60):
+        frame[...] = 0.0
+        frame[:8, :10] = float(i % 2)  # Under 25%
+        assert detector.process_frame(i, frame) is None
+
+
+def test_spatial_detector_memory_is_constant():
+    pytest.importorskip("numpy")
+    detector = SpatialFlashDetector(fps=60)
+    rgb_trace("dynamic_fail.milk", 500, detector)
+    assert detector.ring.shape == (61, 5, 5)
+    # Window counts equal the flags still in the ring
+    assert detector.counts.tolist() == detector.ring.sum(axis=0).tolist()
+
+
+def test_spatial_detector_downsample():
+    pytest.importorskip("numpy")
+    detector = SpatialFlashDetector(downsample=4)
+    event = first(rgb_trace("dynamic_antiphase.milk", 60, detector, shape=(96, 128)))
+    assert event is not None
+    assert detector.last_lum.shape == (24, 32)
+
+
+def test_spatial_analysis_needs_numpy():
+    with patch("vizscan.dynamic.np", None):
+        with pytest.raises(ImportError, match="NumPy"):
+            scan_dynamic("dynamic_antiphase.milk", 1, 60, analysis="spatial")
+        with pytest.raises(ImportError, match="NumPy"):
+            SpatialFlashDetector()
+
+
+def test_default_render_rgb_adapter():
+    np = pytest.importorskip("numpy")
+    renderer = OneFrameRenderer()
+    frame = np.zeros((6, 6, 3), dtype=np.float32)
+    assert renderer.render_rgb(frame) is frame
+    assert np.allclose(frame, 0.1)
+    assert renderer.audio == 1
+
+
+def test_scan_dynamic_spatial():
+    pytest.importorskip("numpy")
+    events, stats = scan_dynamic("dynamic_antiphase.milk", 2, 60, analysis="spatial")
+    assert [e.rule_id for e in events] == ["DynamicStrobe"]
+    assert stats["avg_lum"] == pytest.approx(0.5)
+    assert "partial" not in stats
+    events, stats = scan_dynamic(
+        "dynamic_antiphase.milk", 2, 60, analysis="spatial", mode="fail-fast"
+    )
+    assert stats["partial"] is True
+    assert stats["frames_rendered"] < 20
+    events, _ = scan_dynamic(
+        "dynamic_sparkle.milk", 2, 60, analysis="spatial", framebuffer=(32, 24)
+    )
+    assert events == []
+
+
+# ==========================================
+# RED FLASH DETECTION
+# ==========================================
+
+
+def red_series(frames=120, level=RED_LINEAR, period=4):
+    """Mean linear RGB of a saturated red strobe, ``period`` frames per cycle."""
+    np = pytest.importorskip("numpy")
+    rgb = np.zeros((frames, 3))
+    rgb[:, 0] = level * ((np.arange(frames) % period) < period // 2)
+    return rgb
+
+
+def test_red_flash_rule_registered():
+    rule = REGISTRY.rules["DynamicRedFlash"]
+    assert rule.level == RiskLevel.CRITICAL
+    assert rule.matcher is None  # Raised by the dynamic phase only
+
+
+def test_red_detector_batch_matches_streaming():
+    np = pytest.importorskip("numpy")
+    rgb = red_series(300)
+    rgb[150:] = [[0.3, 0.3, 0.3], [0.6, 0.1, 0.05]] * 75  # Grey-to-red steps
+    streaming = RedFlashDetector()
+    events = [streaming.process_frame(i, c) for i, c in enumerate(rgb.tolist())]
+    batch = RedFlashDetector()
+    analysis = batch.process_frames(rgb[:100])
+    analysis2 = batch.process_frames(rgb[100:], 100)
+    assert np.concatenate((analysis.transitions, analysis2.transitions)).any()
+    assert batch.flash_timestamps == streaming.flash_timestamps
+    assert analysis.events[0] == next(e for e in events if e)
+    assert analysis.events[0].rule_id == "DynamicRedFlash"
+
+
+def test_red_detector_thresholds():
+    # Red that is not saturated enough, or too dim, never transitions
+    detector = RedFlashDetector()
+    assert not detector.process_frames(red_series(level=0.05)).events
+    desaturated = red_series()
+    desaturated[:, 1:] = desaturated[:, :1] * 0.15  # R / (R+G+B) under 0.8
+    assert not RedFlashDetector().process_frames(desaturated).events
+    assert RedFlashDetector().process_frames(red_series()).events
+    # Under 3 cycles/sec (22 frames per cycle)
+    assert not RedFlashDetector().process_frames(red_series(period=22)).events
+
+
+def test_scan_dynamic_red_flash():
+    pytest.importorskip("numpy")
+    # The dark red strobe is under the general luminance threshold
+    for kwargs in ({}, {"analysis": "spatial"}, {"sampling": "adaptive"}):
+        events, _ = scan_dynamic("dynamic_red.milk", 2, 60, **kwargs)
+        assert [e.rule_id for e in events] == ["DynamicRedFlash"], kwargs
+        assert events[0].variables == ["screen_red"]
+        events, _ = scan_dynamic("dynamic_fail.milk", 2, 60, **kwargs)
+        assert [e.rule_id for e in events] == ["DynamicStrobe"], kwargs
+    events, stats = scan_dynamic("dynamic_red.milk", 10, 60, mode="fail-fast")
+    assert [e.rule_id for e in events] == ["DynamicRedFlash"]
+    assert stats["frames_rendered"] == 60
+
+
+def test_default_render_frames_rgb_is_grey():
+    np = pytest.importorskip("numpy")
+    renderer = OneFrameRenderer()
+    out = np.zeros(2, dtype=np.float32)
+    rgb = np.zeros((2, 3), dtype=np.float32)
+    renderer.render_frames(2, out, rgb)
+    assert rgb.tolist() == [[v] * 3 for v in out.tolist()]
+
+
+# ==========================================
+# SPATIAL PATTERN ANALYSIS
+# ==========================================
+
+
+def stripes(pairs, shape=(48, 64), phase=0.0, vertical=True, contrast=1.0):
+    """Square-wave stripes with ``pairs`` light-dark pairs per screen height."""
+    np = pytest.importorskip("numpy")
+    height, width = shape
+    y, x = np.indices(shape)
+    # Vertical stripes repeat along x; pairs are counted per screen height
+    pos = x / height if vertical else y / height
+    on = np.floor(2 * (pos * pairs + phase)) % 2
+    return 0.5 + contrast * (on - 0.5)
+
+
+def test_pattern_measure_counts_pairs():
+    for pairs, vertical in ((3, True), (7, True), (10, False)):
+        m = PatternDetector().measure(stripes(pairs, vertical=vertical))
+        assert m.pairs == pairs
+        assert m.share > 0.5
+        assert m.contrast == pytest.approx(1.0, abs=0.15)
+        assert not m.moving
+
+
+def test_pattern_stationary_and_moving_limits():
+    detector = PatternDetector(interval=1)
+    # 7 pairs: allowed while stationary
+    assert detector.process_frame(0, stripes(7)) is None
+    assert detector.process_frame(1, stripes(7)) is None
+    # ...but not when the stripes drift
+    event = detector.process_frame(2, stripes(7, phase=0.25))
+    assert event.rule_id == "DynamicPattern"
+    assert event.variables == ["screen_pattern"]
+    assert "Moving pattern of 7" in event.context
+    # 10 stationary pairs are over the stationary limit
+    detector = PatternDetector(interval=1)
+    assert "Stationary" in detector.process_frame(0, stripes(10)).context
+
+
+def test_pattern_ignores_low_contrast_and_fine_detail():
+    np = pytest.importorskip("numpy")
+    detector = PatternDetector(interval=1)
+    assert detector.process_frame(0, stripes(10, contrast=0.08)) is None
+    # Bright stripes: the dark stripes are over 0.80
+    assert detector.process_frame(0, stripes(10, contrast=0.2) + 0.4) is None
+    # Noise has no dominant band
+    rng = np.random.default_rng(0)
+    assert detector.process_frame(0, rng.random((48, 64))) is None
+    # Stripes under 4 pixels per pair are beyond the framebuffer
+    assert PatternDetector(interval=1).process_frame(0, stripes(16)) is None
+
+
+def test_pattern_detector_schedule():
+    detector = PatternDetector(fps=60)
+    assert detector.interval == 10
+    for i in range(60):
+        detector.process_frame(i, stripes(3))
+    assert detector.frames_analyzed == 6
+
+
+def test_scan_dynamic_pattern():
+    pytest.importorskip("numpy")
+    events, _ = scan_dynamic("dynamic_rings.milk", 2, 60, analysis="spatial")
+    assert [e.rule_id for e in events] == ["DynamicPattern"]
+    # Reversing twice a second: not a flash; seen at the first reversal
+    assert events[0].timecode == pytest.approx(20 / 60)
+    events, _ = scan_dynamic("dynamic_rings.milk", 2, 60)
+    assert events == []  # Frame averages carry no spatial structure
+
+
+# ==========================================
+# SOFTWARE RENDERER
+# ==========================================
+
+STROBE_PRESET = """[preset00]
+fDecay=0.5
+ob_size=0.5
+ob_a=1
+per_frame_1=ob_r = below(frame % 4, 2);
+per_frame_2=ob_g = ob_r; ob_b = ob_r;
+"""
+
+
+def test_affine_scan_matches_loop():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(1)
+    a = rng.random((50, 3))
+    a[10] = 0.0  # A reset
+    b = rng.random((50, 3))
+    x = np.full(3, 0.3)
+    expected = []
+    for t in range(50):
+        x = a[t] * x + b[t]
+        expected.append(x)
+    assert affine_scan(a, b, np.full(3, 0.3)) == pytest.approx(np.array(expected))
+
+
+def test_software_renderer_chunks(tmp_path):
+    np = pytest.importorskip("numpy")
+    p = tmp_path / "preset.milk"
+    p.write_text(STROBE_PRESET.replace("frame % 4", "frame % 12"))
+    whole, parts = np.empty(100, dtype=np.float32), np.empty(100, dtype=np.float32)
+    renderer = SoftwareRenderer()
+    renderer.load_preset(str(p))
+    renderer.render_frames(100, whole)
+    renderer.load_preset(str(p))
+    renderer.render_frames(30, parts)
+    renderer.render_frames(70, parts[30:])
+    assert parts.tolist() == pytest.approx(whole.tolist())
+    # An opaque border over the whole screen, white for 2 frames in 12
+    assert whole[:3].tolist() == pytest.approx([1.0, 1.0, 0.0])
+    assert renderer.random_access is False
+
+
+def test_scan_dynamic_software_renderer(tmp_path):
+    pytest.importorskip("numpy")
+    strobe = tmp_path / "calm.milk"
+    strobe.write_text(STROBE_PRESET)
+    events, stats = scan_dynamic(str(strobe), 2, 60, renderer="software")
+    assert [e.rule_id for e in events] == ["DynamicStrobe"]
+    assert stats["max_lum"] == pytest.approx(1.0)
+    # The file name no longer decides: a real calm preset passes
+    calm = tmp_path / "dynamic_fail.milk"
+    calm.write_text(
+        "[preset00]\nob_size=0.5\nob_a=1\n"
+        "per_frame_1=ob_r = 0.5 + 0.2*sin(time); ob_g = ob_r;\n"
+    )
+    events, stats = scan_dynamic(str(calm), 2, 60, renderer="software")
+    assert events == []
+    events, _ = scan_dynamic(str(calm), 2, 60, renderer="mock")
+    assert events
+    # The border alpha strobe that static bounds must not certify
+    alpha = tmp_path / "alpha.milk"
+    alpha.write_text(OB_ALPHA_STROBE)
+    events, _ = scan_dynamic(str(alpha), 2, 60, renderer="software")
+    assert [e.rule_id for e in events] == ["DynamicStrobe"]
+
+
+def test_software_renderer_needs_numpy():
+    with patch("vizscan.dynamic.np", None):
+        with pytest.raises(ImportError):
+            make_renderer("software", 60)
+    assert isinstance(make_renderer("mock", 60), MockProjectM)
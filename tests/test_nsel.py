@@ -0,0 +1,184 @@
+import pytest
+
+from vizscan.preset import load_preset
+
+np = pytest.importorskip("numpy")
+nsel = pytest.importorskip("vizscan.nsel")
+
+
+def evaluate(code, **env):
+    evaluator = nsel.Evaluator(dict(env))
+    evaluator.run(nsel.parse_code(code))
+    return evaluator.env
+
+
+def program(code):
+    return nsel.FrameProgram(load_preset(code))
+
+
+def test_nsel_semantics():
+    env = evaluate(
+        "a = 1 / 0; b = 7 % 3; c = 7.9 % 0; d = above(2, 1); e = if(0, 5, 6);"
+        "f = bnot(3); g = x^2; h = sqrt(-4); i = unset;",
+        x=3.0,
+    )
+    assert (env["a"], env["b"], env["c"]) == (0.0, 1.0, 0.0)
+    assert (env["d"], env["e"], env["f"]) == (1.0, 6.0, 0.0)
+    assert env["g"] == 9.0
+    assert env["h"] == 2.0
+    assert env["i"] == 0.0
+
+
+def test_nsel_vectorized():
+    frames = np.arange(8.0)
+    env = evaluate("x = below(frame % 4, 2); y = x * time;", frame=frames, time=frames)
+    assert env["x"].tolist() == [1, 1, 0, 0, 1, 1, 0, 0]
+    assert env["y"].tolist() == [0, 1, 0, 0, 4, 5, 0, 0]
+
+
+def test_nsel_rand_is_per_frame():
+    frames = np.arange(100.0)
+    batch = evaluate("r = rand(10);", frame=frames)["r"]
+    single = [evaluate("r = rand(10);", frame=f)["r"] for f in frames]
+    assert batch.tolist() == [float(v) for v in single]
+    assert 0 <= batch.min() and batch.max() <= 9 and len(set(batch)) > 5
+
+
+def test_nsel_errors():
+    with pytest.raises(nsel.NSELError):
+        evaluate("x = megabuf(1);")
+    with pytest.raises(nsel.NSELError):
+        evaluate("x = sin(1, 2);")
+    with pytest.raises(nsel.NSELError):
+        evaluate("float x = 1;")  # Statement-level GLSL is not NSEL
+
+
+def test_split_supported_drops_shader_code():
+    kept, skipped = nsel.split_supported(
+        nsel.parse_code("ob_r = 0.5;\nret = texture2D(sampler_main, uv);\nx = step(1);")
+    )
+    assert [s.target for s in kept.statements] == ["ob_r"]
+    assert skipped == [(2, "function 'texture2D'"), (3, "1 arguments to 'step'")]
+
+
+def test_carried_variables():
+    code = "t = t + 1; ob_r = ob_r + 0.1; q1 = q1 + 1; u = 2; v = u + w;"
+    # ob_r and q1 are restored every frame; w is never assigned
+    assert nsel.carried_variables(nsel.parse_code(code)) == ["t"]
+
+
+def test_frame_program_header_and_init():
+    p = program(
+        "[preset00]\nfDecay=0.5\nob_r=0.25\n"
+        "per_frame_init_1=q1 = 3; k = 2;\n"
+        "per_frame_1=ob_g = ob_r * k; q1 = q1 + 1; wave_r = q1;\n"
+    )
+    env = p.run(np.arange(3))
+    assert env["decay"] == 0.5
+    assert env["ob_g"] == 0.5
+    # q1 restarts from its init value every frame
+    assert env["wave_r"] == 4.0
+    assert not p.carried
+
+
+def test_frame_program_stepwise_matches_vectorized():
+    code = "[preset00]\nper_frame_1=ob_r = 0.5 + 0.5*sin(time*3) + 0*n; n = n + 1;\n"
+    stepwise = program(code)
+    assert stepwise.carried == ["n"]
+    first = stepwise.run(np.arange(5))
+    rest = stepwise.run(np.arange(5, 10))
+    assert rest["n"].tolist() == list(range(6, 11))
+    vectorized = program(code.replace("+ 0*n; n = n + 1;", ";")).run(np.arange(10))
+    assert np.concatenate((first["ob_r"], rest["ob_r"])).tolist() == pytest.approx(
+        vectorized["ob_r"].tolist()
+    )
+
+
+COMPILED_CODE = (
+    "a = 1 / 0 + x; b = 7.5 % x; c = x^2; d = if(above(x, 2), sigmoid(x, 1), x);"
+    "e = rand(10) + frame + rand(3); g = rand(10);"
+    "t = t + 1; f = min(t, 4) * 2 + sin(3);"
+)
+
+
+def compiled_env(code, **env):
+    env = dict(env)
+    with np.errstate(all="ignore"):
+        nsel.compile_code(code).run(env)
+    return env
+
+
+@pytest.mark.parametrize("x", [0.0, 3.0, np.arange(-3.0, 5.0)])
+def test_compiled_matches_evaluator(x):
+    frame = np.arange(8.0) if isinstance(x, np.ndarray) else 4.0
+    with np.errstate(all="ignore"):
+        expected = evaluate(COMPILED_CODE, x=x, frame=frame)
+    actual = compiled_env(COMPILED_CODE, x=x, frame=frame)
+    for name in "abcdefgt":
+        np.testing.assert_array_equal(actual[name], expected[name])
+
+
+def test_compiled_folds_constants():
+    compiled = nsel.compile_code("a = 2 * 3 + sin(0); b = a * x + rand(4);")
+    assert "v0 = 6.0" in compiled.source
+    assert "sin" not in compiled.source
+    # rand depends on the frame and is never folded
+    assert "_rand(4.0" in compiled.source
+
+
+def test_compile_cache_and_skipped():
+    code = "ob_r = 0.5;\nret = texture2D(sampler_main, uv);"
+    compiled = nsel.compile_code(code)
+    assert nsel.compile_code(code) is compiled
+    assert compiled.skipped == [(2, "function 'texture2D'")]
+    assert compiled_env(code) == {"ob_r": 0.5}
+
+
+def mesh(code, **kwargs):
+    return nsel.MeshProgram(load_preset("[preset00]\nwarp=0\n" + code), **kwargs)
+
+
+def test_mesh_vertex_inputs():
+    m = mesh("", meshx=4, meshy=2)
+    assert m.shape == (3, 5)
+    # x runs left to right, y top to bottom; ang is counterclockwise from 3 o'clock
+    assert m.vertex["x"][0].tolist() == [0, 0.25, 0.5, 0.75, 1]
+    assert m.vertex["y"][:, 0].tolist() == [0, 0.5, 1]
+    assert m.vertex["rad"][1, 2] == 0 and m.vertex["rad"][0, 0] == pytest.approx(1)
+    assert m.vertex["ang"][1, 4] == 0
+    assert m.vertex["ang"][0, 2] == pytest.approx(np.pi / 2)
+    # Without motion the mesh samples every vertex from itself
+    assert not mesh("").fields(np.arange(4)).any()
+
+
+def test_mesh_per_pixel_zoom_and_q_vars():
+    m = mesh("per_frame_1=q1 = 0.01;\nper_pixel_1=zoom = 1 + 0.1*rad; dx = q1;\n")
+    fields = m.fields(np.arange(3))
+    assert fields.shape == (3, 37, 49, 2)
+    # Corners zoom by 1.1 toward the center, the center only moves by dx
+    assert fields[0, 0, 0].tolist() == pytest.approx(
+        [0.5 - 0.5 / 1.1 - 0.01, 0.5 - 0.5 / 1.1], abs=1e-6
+    )
+    assert fields[2, 18, 24].tolist() == pytest.approx([-0.01, 0], abs=1e-6)
+
+
+def test_mesh_per_frame_motion_and_rotation():
+    m = mesh("per_frame_1=rot = 0.1 * frame;\nper_pixel_1=rot = rot * above(x, 0.5);\n")
+    fields = m.fields(np.arange(2))
+    assert not fields[0].any()
+    # Rotation about the center only applies on the right half
+    assert not fields[1, :, :24].any()
+    corner = np.array([1.0, 0.0]) - 0.5
+    c, s = np.cos(0.1), np.sin(0.1)
+    rotated = np.array([corner[0] * c - corner[1] * s, corner[0] * s + corner[1] * c])
+    assert fields[1, 0, 48].tolist() == pytest.approx(
+        (rotated - corner).tolist(), abs=1e-6
+    )
+
+
+def test_mesh_warp_and_skipped():
+    m = nsel.MeshProgram(load_preset("[preset00]\nper_pixel_1=ret = tex2D(a, b);\n"))
+    assert m.skipped == [(2, "function 'tex2D'")]
+    # The default warp ripple moves vertices by at most 2 * WARP_AMPLITUDE
+    fields = m.fields(np.arange(2))
+    assert 0 < np.abs(fields).max() <= 0.007
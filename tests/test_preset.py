@@ -0,0 +1,95 @@
+import os
+
+from vizscan.preset import parse_ini, extract_shader_sections
+from vizscan.static import load_preset, scan_file_full, extract_shaders, MilkLexer
+
+PRESETS_DIR = os.path.join(os.path.dirname(__file__), "presets")
+INI_PRESET = os.path.join(PRESETS_DIR, "milkdrop2_sections.milk")
+
+
+def read_ini_preset():
+    with open(INI_PRESET) as f:
+        return f.read()
+
+
+def test_parse_ini_not_ini():
+    assert parse_ini("ob_r = 1 - ob_r;") is None
+
+
+def test_parse_ini_sections_and_params():
+    preset = parse_ini(read_ini_preset())
+    assert preset is not None and preset.is_ini
+    assert [s.label for s in preset.sections] == [
+        "CPU:per_frame_init",
+        "CPU:per_frame",
+        "CPU:per_pixel",
+        "CPU:wave_0_per_point",
+    ]
+    assert preset.params["fDecay"] == 0.98
+    assert preset.params["nVideoEchoOrientation"] == 0
+    assert "wavecode_0_r" in preset.params
+    assert not any("Expect" in k for k in preset.params)
+
+
+def test_load_preset_ini_shaders():
+    preset = load_preset(read_ini_preset())
+    assert [s.label for s in preset.sections][-2:] == ["GPU:warp", "GPU:comp"]
+    warp = preset.section("warp")
+    assert warp.code.splitlines()[0] == "shader_body {"
+    assert warp.line_map == [27, 28, 29]
+    assert warp.source_line(2) == 28
+
+
+def test_parse_ini_orders_by_index():
+    preset = parse_ini("[preset00]\nper_frame_2=b = 2;\nper_frame_1=a = 1;\n")
+    section = preset.section("per_frame")
+    assert section.code == "a = 1;\nb = 2;"
+    assert section.line_map == [3, 2]
+
+
+def test_load_preset_legacy_fallback():
+    preset = load_preset('x = 1;\nwarp_shader = "ret = 1;";')
+    assert not preset.is_ini
+    assert [s.label for s in preset.sections] == ["CPU", "GPU:warp"]
+
+
+def test_scan_ini_reports_file_lines():
+    events, _, quality = scan_file_full(INI_PRESET)
+    by_rule = {e.rule_id: e for e in events}
+    assert by_rule["HighFreqOsc"].line == 23
+    assert by_rule["HighFreqOsc"].source_type == "CPU:per_frame"
+    assert by_rule["StepFunction"].line == 31
+    assert by_rule["StepFunction"].source_type == "GPU:comp"
+    assert quality.background_type == "Dynamic"
+
+
+def test_ini_sections_lex_fewer_tokens():
+    code = read_ini_preset()
+    section_tokens = sum(
+        len(MilkLexer(s.code).tokenize()) for s in load_preset(code).sections
+    )
+    assert section_tokens * 2 < len(MilkLexer(code).tokenize())
+
+
+def test_extract_numbered_shader_lines():
+    code = (
+        "[preset00]\nwarp_2=`  ret = 1;\nfDecay=0.9\nwarp_1=`shader_body {\nwarp_3=`}\n"
+    )
+    (warp,) = extract_shader_sections(code)
+    assert warp.code == "shader_body {\n  ret = 1;\n}"
+    assert warp.line_map == [4, 2, 5]
+
+
+def test_extract_quoted_shader_line_map():
+    code = 'x = 1;\nwarp_shader = "a;\nb;\\nc;";\ncomp_shader = "d;";'
+    warp, comp = extract_shader_sections(code)
+    assert warp.code == "a;\nb;\nc;"
+    assert warp.line_map == [2, 3, 3]
+    assert comp.code == "d;"
+    assert comp.line_map == [4]
+    assert extract_shaders(code) == {"warp": "a;\nb;\nc;", "comp": "d;"}
+
+
+def test_extract_future_shader_types():
+    code = 'blur_1=`ret = 0;\nq_1=0.5\nnoise_shader = "n;";'
+    assert [s.name for s in extract_shader_sections(code)] == ["blur", "noise"]
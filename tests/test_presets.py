@@ -53,5 +53,13 @@ def test_static_warn_step():
     verify_preset("static_warn_step.milk")
 
 
+def test_milkdrop2_sections():
+    verify_preset("milkdrop2_sections.milk")
+
+
+def test_static_warn_glsl_helper():
+    verify_preset("static_warn_glsl_helper.milk")
+
+
 def test_safe():
     verify_preset("safe.milk")
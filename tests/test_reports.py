@@ -17,3 +17,18 @@ def test_generate_earl_fail():
 
     assert earl["@graph"][1]["earl:result"]["earl:outcome"] == "earl:failed"
     assert earl["@graph"][1]["earl:result"]["pes:staticErrors"] == 1
+
+
+def test_generate_earl_duplicate_of():
+    report = HybridReport(filepath="copy.milk", duplicate_of="orig.milk")
+    earl = generate_earl([report])
+    assert earl["@graph"][1]["pes:duplicateOf"] == {"@id": "file://orig.milk"}
+
+
+def test_generate_earl_certified():
+    report = HybridReport(filepath="calm.milk", certified=True, max_lum_change=0.003)
+    result = generate_earl([report])["@graph"][1]["earl:result"]
+    assert result["pes:staticallyCertified"] is True
+    assert result["pes:maxLuminanceChange"] == 0.003
+    plain = generate_earl([HybridReport(filepath="x.milk")])["@graph"][1]
+    assert "pes:staticallyCertified" not in plain["earl:result"]
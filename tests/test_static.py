@@ -1,11 +1,17 @@
+import os
 import sys
 from unittest.mock import patch
+
+import pytest
+
+from vizscan.preset import load_preset
 from vizscan.static import (
     MilkLexer,
     MilkParser,
     SafetyAnalyzer,
     extract_shaders,
     Token,
+    TokenStream,
     Assignment,
     FunctionCall,
     Block,
@@ -20,6 +26,21 @@ from vizscan.static import (
     BinaryOp,
     QualityAnalyzer,
     MemberAccess,
+    NodeInterner,
+    TaintMemo,
+    REGISTRY,
+    RuleMatcher,
+    TriggerPrefilter,
+    TaintState,
+    LuminanceBoundAnalyzer,
+    ValueBound,
+    scan_file_static,
+    FunctionDef,
+    Return,
+    AnalysisPipeline,
+    UNTAINTED,
+    FrameLoop,
+    LoopBehavior,
 )
 
 # ==========================================
@@ -117,6 +138,49 @@ def test_lexer_mismatch2():
     assert tokens[-1].type == "MISMATCH"
 
 
+def test_lexer_line_tracking():
+    code = "a = 1;\n// note\nb = 2.5;\n\nc = a;"
+    tokens = MilkLexer(code).tokenize()
+    assert [(t.type, t.value, t.line) for t in tokens if t.type == "ID"] == [
+        ("ID", "a", 1),
+        ("ID", "b", 3),
+        ("ID", "c", 5),
+        ("ID", "a", 5),
+    ]
+    assert tokens[6] == Token("NUMBER", "2.5", 3)
+
+
+def test_lexer_block_comment_does_not_advance_line():
+    # Newlines inside /* */ are consumed by the COMMENT token, not NEWLINE.
+    code = "/* one\ntwo */ x = 1;\ny = 2;"
+    tokens = MilkLexer(code).tokenize()
+    assert tokens[0] == Token("ID", "x", 1)
+    assert tokens[-2] == Token("NUMBER", "2", 2)
+
+
+def test_token_stream_columns():
+    stream = MilkLexer("x = sin(t);\ny = 2.5;").tokenize_stream()
+    assert len(stream) == 11
+    assert stream.types.typecode == "b"
+    assert stream.starts.typecode == "i"
+    assert stream.text(2) == "sin"
+    assert stream[7] == Token("ID", "y", 2)
+    assert list(stream) == MilkLexer("x = sin(t);\ny = 2.5;").tokenize()
+
+
+def test_token_stream_from_tokens():
+    tokens = MilkLexer("float x = 1.0;").tokenize()
+    stream = TokenStream.from_tokens(tokens)
+    assert list(stream) == tokens
+
+
+def test_parser_accepts_stream_and_token_list():
+    code = "float x = sin(time * 2); y = x.r;"
+    from_stream = MilkParser(MilkLexer(code).tokenize_stream()).parse()
+    from_list = MilkParser(MilkLexer(code).tokenize()).parse()
+    assert from_stream == from_list
+
+
 # ==========================================
 # 2. PARSER TESTS
 # ==========================================
@@ -141,6 +205,7 @@ def test_parser_block_invalid_stmt():
     assert isinstance(block, Block)
     assert len(block.statements) == 0
 
+
 def test_parser_block():
     code = "{ x = 1.0; }"
     parser = MilkParser(MilkLexer(code).tokenize())
@@ -149,6 +214,7 @@ def test_parser_block():
     block = program.statements[0]
     assert isinstance(block, Block)
 
+
 def test_parser_parens():
     code = "x = (1 + 2);"
     lexer = MilkLexer(code)
@@ -158,6 +224,7 @@ def test_parser_parens():
     assert isinstance(stmt.expr, BinaryOp)
     assert stmt.expr.op == "+"
 
+
 def test_taint_member_access():
     code = "x = y.z;"
     lexer = MilkLexer(code)
@@ -187,6 +254,7 @@ def test_parser_consume_eof():
     parser = MilkParser([])
     assert parser.consume() is None
 
+
 def test_parser_consume_mismatch():
     tokens = MilkLexer("x = 1;").tokenize()
     parser = MilkParser(tokens)
@@ -431,3 +499,648 @@ def test_scanner_main_invalid_file(capsys):
     captured = capsys.readouterr()
     # Should print nothing or error? Code checks os.path.isfile
     assert captured.out == ""
+
+
+# ==========================================
+# HASH-CONSING & TAINT MEMO
+# ==========================================
+
+
+def parse(code, interner=None):
+    return MilkParser(MilkLexer(code).tokenize(), interner).parse()
+
+
+def test_interner_shares_identical_subtrees():
+    interner = NodeInterner()
+    a = parse("x = sin(time * 20);", interner).statements[0]
+    b = parse("\n\ny = sin(time * 20);", interner).statements[0]
+    assert a.expr is b.expr
+    assert b.line == 3
+    # Shared subtrees belong to no single line; statements keep theirs
+    assert a.expr.line == 0
+    assert interner.free_vars[id(a.expr)] == ("time",)
+    c = parse("z = sin(time * 21);", interner).statements[0]
+    assert c.expr is not a.expr
+
+
+def test_interner_bounded():
+    interner = NodeInterner(maxsize=4)
+    parse("a = b + c * d + e;", interner)
+    assert len(interner.table) == 4
+    assert len(interner.free_vars) == 4
+
+
+def test_memo_replays_events_at_each_occurrence():
+    memo = TaintMemo()
+    code = "a = sin(time * 20);\nb = 1;\nc = sin(time * 20);"
+    ana = SafetyAnalyzer("CPU", memo=memo)
+    ana.analyze(parse(code))
+    assert [e.line for e in ana.events] == [1, 3]
+    assert memo.hits >= 1
+
+    # Shared across analyzers (files) too
+    other = SafetyAnalyzer("GPU:comp", memo=memo)
+    other.analyze(parse("\n\n\n\nret = sin(time * 20);"))
+    assert [(e.line, e.source_type) for e in other.events] == [(5, "GPU:comp")]
+    assert memo.stats()["hit_rate"] > 0
+
+
+def test_memo_reports_nested_subtree_at_its_statement():
+    # A fresh interner stands in for a fresh process: nothing is cached yet
+    interner = NodeInterner()
+    code = "a = sin(time * 30);\n\n\nx = b + sin(time * 30);"
+    ana = SafetyAnalyzer(memo=TaintMemo())
+    ana.analyze(parse(code, interner))
+    assert [(e.rule_id, e.line) for e in ana.events] == [
+        ("HighFreqOsc", 1),
+        ("HighFreqOsc", 4),
+    ]
+
+    # The subtree seen first inside a larger expression on another line
+    other = SafetyAnalyzer(memo=TaintMemo())
+    other.analyze(parse("\nx = b + sin(time * 30);\ny = sin(time * 30);", interner))
+    assert [e.line for e in other.events] == [2, 3]
+
+
+def test_memo_keyed_on_input_taints():
+    memo = TaintMemo()
+    ana = SafetyAnalyzer(memo=memo)
+    ana.analyze(parse("x = 1;\ny = sin(x * 20);\nx = time;\nz = sin(x * 20);"))
+    assert [e.line for e in ana.events] == [4]
+
+
+def test_memo_cleared_on_registry_change():
+    memo = TaintMemo()
+    SafetyAnalyzer(memo=memo).analyze(parse("a = fract(time);"))
+    assert memo.stats()["size"] > 0
+    rule = REGISTRY.rules["StepFunction"]
+    REGISTRY.register(
+        rule.id,
+        rule.name,
+        rule.description,
+        rule.base_score,
+        rule.level,
+        rule.reasons,
+        rule.matcher,
+    )
+    assert memo.get(("missing",)) is None
+    assert memo.stats()["size"] == 0
+
+
+def test_memo_lru_bound():
+    memo = TaintMemo(maxsize=2)
+    for i in range(5):
+        memo.put(i, (None, None, ()))
+    assert list(memo.entries) == [3, 4]
+
+
+# ==========================================
+# ANALYSIS PIPELINE
+# ==========================================
+
+
+def test_pipeline_single_traversal_multiple_analyzers():
+    class Recorder:
+        def __init__(self):
+            self.targets = []
+
+        def visit_Assignment(self, node):
+            self.targets.append(node.target)
+
+    safety = SafetyAnalyzer()
+    quality = QualityAnalyzer()
+    recorder = Recorder()
+    prog = parse("ob_r = 0; { ob_g = 0; } ob_b = 1 - ob_b;")
+    AnalysisPipeline(safety, quality, recorder).run(prog)
+
+    assert recorder.targets == ["ob_r", "ob_g", "ob_b"]
+    assert quality.bg_color == {"r": 0.0, "g": 0.0, "b": None}
+    assert [e.rule_id for e in safety.events] == ["InverterStrobe"]
+
+
+def test_pipeline_ignores_analyzers_without_handlers():
+    pipeline = AnalysisPipeline(object())
+    assert pipeline.handlers == {}
+    pipeline.run(parse("x = 1;"))
+
+
+def test_untainted_singleton():
+    ana = SafetyAnalyzer()
+    assert ana.visit(Literal(1, 2.0)) is ana.visit(Literal(2, 2.0))
+    assert ana.get_taint("undefined") is UNTAINTED
+    assert ana.visit(BinaryOp(1, Literal(1, 1.0), "+", Identifier(1, "k"))) is UNTAINTED
+
+
+# ==========================================
+# RULE INDEX
+# ==========================================
+
+
+def test_rule_index_only_returns_relevant_rules():
+    index = REGISTRY.index()
+    assert [r.id for r in index.call_rules("sin")] == ["HighFreqOsc"]
+    assert [r.id for r in index.call_rules("fract")] == ["StepFunction"]
+    assert list(index.call_rules("abs")) == []
+    assert [r.id for r in index.assignment_rules("ob_r", "-")] == [
+        "InverterStrobe",
+        "TanColor",
+    ]
+    assert [r.id for r in index.assignment_rules("zoom", None)] == ["TanMotion"]
+    assert list(index.assignment_rules("my_var", "+")) == []
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("f = frame % 2;", ["Modulo 2.0"]),
+        # '%' binds tighter than '+', so the modulo is not the root node
+        ("ob_r = 0.5 + frame % 2;", ["Modulo 2.0"]),
+        ("k = equal(frame % 3, 0);", ["Modulo 3.0"]),
+        ("f = frame % 8;", []),
+        ("f = time % 2;", ["Modulo 2.0"]),
+        # Only frame- or time-driven operands flicker
+        ("a = b % 2;", []),
+        ("k = 5;\nob_r = 0.5 + k % 2;", []),
+    ],
+)
+def test_frame_modulo_anywhere_in_expression(code, expected):
+    ana = SafetyAnalyzer()
+    ana.analyze(parse(code))
+    assert [e.context for e in ana.events if e.rule_id == "FrameModulo"] == expected
+    assert [r.id for r in REGISTRY.index().binop_rules("%")] == ["FrameModulo"]
+
+
+def test_rule_index_rebuilt_on_register():
+    registry = SafetyRegistry()
+    index = registry.index()
+    assert registry.index() is index
+    registry.register(
+        "AbsCall",
+        "Abs",
+        "desc",
+        1,
+        RiskLevel.INFO,
+        matcher=RuleMatcher("FunctionCall", lambda a, n, s: "abs", {"abs"}),
+    )
+    assert registry.index() is not index
+    assert [r.id for r in registry.index().call_rules("abs")] == ["AbsCall"]
+
+
+def test_custom_matcher_rule_fires():
+    def check(analyzer, node, state):
+        return "Division by time" if state.is_time_dep else None
+
+    REGISTRY.register(
+        "TimeDivide",
+        "Time Divide",
+        "desc",
+        5,
+        RiskLevel.INFO,
+        matcher=RuleMatcher("BinaryOp", check, ops={"/"}),
+    )
+    try:
+        ana = SafetyAnalyzer()
+        ana.analyze(parse("a = 1 / 2;\nb = 1 / time;"))
+    finally:
+        REGISTRY.unregister("TimeDivide")
+    assert [(e.rule_id, e.line, e.context) for e in ana.events] == [
+        ("TimeDivide", 2, "Division by time")
+    ]
+    assert "TimeDivide" not in REGISTRY.index().order
+
+
+# ==========================================
+# TRIGGER PREFILTER
+# ==========================================
+
+PRESET_DIR = os.path.join(os.path.dirname(__file__), "presets")
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(PRESET_DIR)))
+def test_prefilter_no_false_negatives_on_corpus(name):
+    path = os.path.join(PRESET_DIR, name)
+    events, _, quality = scan_file_full(path)
+    expected_events, _, expected_quality = scan_file_full(path, prefilter=False)
+    assert events == expected_events
+    assert quality == expected_quality
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        # Toggles with no non-monotone operator: a swap and a 3-rotation
+        "[preset00]\na=1\nper_frame_1=t = a; a = b; b = t; wave_r = a;\n",
+        "[preset00]\nper_frame_init_1=a = 1;\n"
+        "per_frame_1=t = a; a = b; b = c; c = t; wave_r = a;\n",
+        "[preset00]\nper_frame_init_1=a = 1;\nper_frame_1=t = a; a = b; b = t;\n"
+        "per_frame_2=wave_r = a;\n",
+    ],
+)
+def test_prefilter_no_false_negatives_on_loops(tmp_path, code):
+    p = tmp_path / "loop.milk"
+    p.write_text(code)
+    events, _, quality = scan_file_full(str(p))
+    expected_events, _, expected_quality = scan_file_full(str(p), prefilter=False)
+    assert [e.rule_id for e in expected_events] == ["FrameToggle"]
+    assert events == expected_events
+    assert quality == expected_quality
+
+
+def test_prefilter_may_carry():
+    assert TriggerPrefilter.may_carry("t = a; a = b;")
+    assert TriggerPrefilter.may_carry("n = n + 1;")
+    assert not TriggerPrefilter.may_carry("x = 1; y = x * 2; z = equal(y, 2);")
+    assert not TriggerPrefilter.may_carry("z = below(q1, 2);")
+
+
+def test_prefilter_skips_clean_sections():
+    prefilter = TriggerPrefilter(REGISTRY)
+    path = os.path.join(PRESET_DIR, "milkdrop2_sections.milk")
+    with open(path) as f:
+        code = f.read()
+    preset = load_preset(code)
+    needed = prefilter.select(code, preset.sections)
+    assert {s.name for s, n in zip(preset.sections, needed) if not n} == {"warp"}
+    assert prefilter.stats() == {
+        "files": 1,
+        "files_skipped": 0,
+        "sections": 6,
+        "sections_skipped": 1,
+    }
+
+    prefilter.select("// nothing to see\nx = 1;", load_preset("x = 1;").sections)
+    assert prefilter.stats()["files_skipped"] == 1
+
+
+def test_prefilter_keeps_cpu_state_prefix(tmp_path):
+    p = tmp_path / "chain.milk"
+    p.write_text(
+        "[preset00]\n"
+        "per_frame_init_1=x = time * 30;\n"
+        "per_frame_1=y = sin(x);\n"
+        "per_frame_2=z = tan(time);\n"
+        "per_pixel_1=zoom = z;\n"
+    )
+    events, _, _ = scan_file_full(str(p))
+    assert [e.rule_id for e in events] == ["HighFreqOsc", "TanMotion"]
+
+
+def test_prefilter_disabled_by_unrestricted_matcher():
+    registry = SafetyRegistry()
+    prefilter = TriggerPrefilter(registry)
+    assert prefilter.compile() is not None
+    registry.register(
+        "AnyCall",
+        "Any",
+        "desc",
+        1,
+        RiskLevel.INFO,
+        matcher=RuleMatcher("FunctionCall", lambda a, n, s: None),
+    )
+    assert prefilter.compile() is None
+    sections = load_preset("x = 1;").sections
+    assert prefilter.select("x = 1;", sections) == [True]
+
+
+# ==========================================
+# CONSTANT FOLDING / FREQUENCY PROPAGATION
+# ==========================================
+
+
+def freq_events(code):
+    ana = SafetyAnalyzer()
+    ana.analyze(parse(code))
+    return [e.context for e in ana.events if e.rule_id == "HighFreqOsc"]
+
+
+@pytest.mark.parametrize(
+    "code, context",
+    [
+        ("a = sin(time*2*10);", "sin(freq=20.0)"),
+        ("a = sin(2*10*time);", "sin(freq=20.0)"),
+        ("t = time*8;\na = sin(t*3);", "sin(freq=24.0)"),
+        ("k = 25;\na = sin(time*k);", "sin(freq=25.0)"),
+        ("k = 5*5;\na = cos(k*time);", "cos(freq=25.0)"),
+        ("a = sin(time/0.05);", "sin(freq=20.0)"),
+        ("a = sin(time*-1*30);", "sin(freq=30.0)"),
+        ("a = sin(abs(time*30));", "sin(freq=30.0)"),
+        ("k = max(10, 40);\na = sin(time*k);", "sin(freq=40.0)"),
+    ],
+)
+def test_frequency_decided_statically(code, context):
+    assert freq_events(code) == [context]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "a = sin(time*2 + 3*8);",
+        "a = sin(time/4*10);",
+        "k = 0;\nk = k + 30;\na = sin(time*k);",
+        "a = sin(time*(1/0));",
+    ],
+)
+def test_frequency_not_overestimated(code):
+    assert freq_events(code) == []
+
+
+def test_constant_folding_operator_precedence():
+    prog = parse("a = 2 + 3 * 4 ^ 2 / 8;")
+    ana = SafetyAnalyzer()
+    ana.analyze(prog)
+    assert ana.symbols["a"].value == 8.0
+    assert ana.visit(parse("x = 1 - 2 - 3;").statements[0].expr).value == -4.0
+
+
+def test_parser_unary_sign():
+    neg_lit, neg_id, pos_id = (
+        stmt.expr for stmt in parse("a = -2;\nb = -y;\nc = +y;").statements
+    )
+    assert neg_lit == Literal(0, -2.0)
+    assert (neg_id.left.value, neg_id.op, neg_id.right.name) == (-1.0, "*", "y")
+    assert pos_id.name == "y"
+    ana = SafetyAnalyzer()
+    ana.analyze(parse("x = -x;"))
+    assert ana.events == []
+
+
+def test_constant_call_is_not_time_dependent():
+    ana = SafetyAnalyzer()
+    ana.analyze(parse("x = sin(1);\ny = fract(x);"))
+    assert ana.symbols["x"].value == pytest.approx(0.8414709848)
+    assert ana.events == []
+
+
+def test_q_channel_feeds_shaders(tmp_path):
+    p = tmp_path / "q.milk"
+    p.write_text(
+        "[preset00]\n"
+        "per_frame_1=q1 = 30;\n"
+        "per_frame_2=q5 = time*40;\n"
+        "per_pixel_1=q1 = 1;\n"
+        "warp_1=`shader_body {\n"
+        "warp_2=`ret = sin(time*q1);\n"
+        "warp_3=`}\n"
+        "comp_1=`shader_body {\n"
+        "comp_2=`ret = cos(_qb.x);\n"
+        "comp_3=`}\n"
+    )
+    events, _, _ = scan_file_full(str(p))
+    assert [(e.source_type, e.line, e.context) for e in events] == [
+        ("GPU:warp", 6, "sin(freq=30.0)"),
+        ("GPU:comp", 9, "cos(freq=40.0)"),
+    ]
+    assert events == scan_file_full(str(p), prefilter=False)[0]
+
+
+def test_shader_inputs_vector_join():
+    ana = SafetyAnalyzer()
+    ana.analyze(parse("q1 = time*10;\nq2 = time*20;\nq3 = tan(time);"))
+    inputs = ana.shader_inputs()
+    assert set(inputs) == {"q1", "q2", "q3", "_qa"}
+    assert inputs["_qa"] == TaintState(is_time_dep=True, freq=20.0, hard_edge=True)
+
+
+# ==========================================
+# LUMINANCE BOUNDS
+# ==========================================
+
+
+def bounds(code, params=None):
+    ana = LuminanceBoundAnalyzer(params)
+    AnalysisPipeline(ana).run(parse(code))
+    return ana
+
+
+@pytest.mark.parametrize(
+    "code, rate, step",
+    [
+        ("ob_r = 0.5;", 0.0, 0.0),
+        ("ob_r = 0.5 + 0.4*sin(time*0.3);", 0.12, 0.0),
+        ("ob_r = 0.1*cos(frame*0.01);", 0.0, 0.001),
+        ("k = time/10;\nret = k*0.5;", 0.05, 0.0),
+        ("ob_r = sqr(sin(time));", 2.0, 0.0),
+        ("ob_r = min(sin(time*2), abs(cos(time)));", 2.0, 0.0),
+        ("ob_r = 0.5/(2 + sin(time));", 0.5, 0.0),
+    ],
+)
+def test_luminance_bounds(code, rate, step):
+    out = bounds(code).outputs
+    target = next(iter(out))
+    assert out[target].rate == pytest.approx(rate)
+    assert out[target].step == pytest.approx(step)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "ob_r = fract(time);",
+        "ob_r = frame % 2;",
+        "ob_r = bass;",
+        "ob_r = 1/sin(time);",
+        "ob_r = time*time;",
+        "ob_r = ob_r + 0.1;",
+        "ret = texture2D(sampler_main, uv).xyz;",
+    ],
+)
+def test_luminance_unbounded(code):
+    (bound,) = bounds(code).outputs.values()
+    assert bound.max_change(60) == float("inf")
+
+
+def test_luminance_header_params_are_constant():
+    (bound,) = bounds("ob_g = ob_r + 0.1;", {"ob_r": 0.2}).outputs.values()
+    assert bound == ValueBound(0.30000000000000004, 0.30000000000000004, 0.0, 0.0)
+
+
+def test_luminance_section_reset_keeps_q_vars():
+    ana = LuminanceBoundAnalyzer()
+    AnalysisPipeline(ana).run(parse("q1 = 0.5;\nk = 0.5;"))
+    ana.enter_section("per_frame")
+    AnalysisPipeline(ana).run(parse("ob_r = q1;\nob_g = k;"))
+    assert ana.outputs["ob_r"].constant == 0.5
+    assert ana.outputs["ob_g"].max_change(60) == float("inf")
+
+
+def test_scan_file_static_luminance():
+    calm = os.path.join(PRESET_DIR, "calm_ambient.milk")
+    assert scan_file_static(calm).luminance is None
+    bound = scan_file_static(calm, bounds=True).luminance
+    assert bound.max_change(60) == pytest.approx(0.003)
+    # Legacy snippets lack the header state, so they are never modeled
+    safe = os.path.join(PRESET_DIR, "safe.milk")
+    assert scan_file_static(safe, bounds=True).luminance is None
+
+
+def test_scan_file_static_separates_motion(tmp_path):
+    p = tmp_path / "moving.milk"
+    p.write_text("[preset00]\nper_frame_1=ob_r = 0.5; rot = 0.1*time;\n")
+    result = scan_file_static(str(p), bounds=True)
+    assert result.luminance.constant == 0.5
+    assert result.motion.max_change(60) == pytest.approx(0.1 / 60)
+    # per_pixel zoom varies over the mesh but not over time
+    calm = scan_file_static(os.path.join(PRESET_DIR, "calm_ambient.milk"), bounds=True)
+    assert calm.motion.max_change(60) == 0
+
+
+# ==========================================
+# GLSL FUNCTION SUMMARIES
+# ==========================================
+
+HELPER_SHADER = """float osc(float t) {
+    return sin(t * 30.0);
+}
+float3 flip(inout float3 c, float k);
+float3 flip(inout float3 c, float k) { c = 1 - c; return c * k; }
+shader_body {
+    float a = osc(time);
+    float b = osc(time) + osc(time);
+    float c = osc(0.5);
+    ret = flip(ret, a);
+}"""
+
+
+def test_parse_function_definition():
+    prog = parse(HELPER_SHADER)
+    osc, prototype, flip = prog.statements[:3]
+    assert isinstance(osc, FunctionDef)
+    assert (osc.name, osc.params) == ("osc", ["t"])
+    assert isinstance(osc.body.statements[0], Return)
+    assert prototype == Block(4, [])
+    assert (flip.name, flip.params) == ("flip", ["c", "k"])
+    assert parse("return;").statements == [Return(1, None)]
+
+
+def test_function_summary_reports_body_events_once():
+    ana = SafetyAnalyzer("GPU:comp")
+    ana.analyze(parse(HELPER_SHADER))
+    assert [(e.rule_id, e.line, e.variables) for e in ana.events] == [
+        ("HighFreqOsc", 2, ["sin"]),
+        ("InverterStrobe", 5, ["c"]),
+    ]
+    # osc(time) x3 and osc(0.5) share two summaries; flip(ret, a) one
+    assert len(ana.summaries) == 3
+    assert ana.symbols["a"].freq == 30.0
+    assert ana.get_taint("t") is UNTAINTED  # parameters stay local
+
+
+def test_function_summary_not_shared_between_shaders():
+    SafetyAnalyzer().analyze(parse("float f(float t) { return t; }\nx = f(time*30);"))
+    ana = SafetyAnalyzer()
+    ana.analyze(parse("float f(float t) { return sin(t); }\nx = f(time*30);"))
+    assert [e.rule_id for e in ana.events] == ["HighFreqOsc"]
+
+
+def test_function_sees_globals_declared_before_it():
+    ana = SafetyAnalyzer()
+    ana.analyze(
+        parse("float k = 40;\nfloat g() { return sin(time*k); }\nk = 1;\nx = g();")
+    )
+    assert [e.context for e in ana.events] == ["sin(freq=40.0)"]
+
+
+# ==========================================
+# CROSS-FRAME LOOP ANALYSIS
+# ==========================================
+
+
+def loop(code, **params):
+    return FrameLoop(parse(code), SafetyAnalyzer().symbols, params).run()
+
+
+def per_frame_events(tmp_path, *lines, header=""):
+    p = tmp_path / "loop.milk"
+    body = "".join(f"per_frame_{i}={line}\n" for i, line in enumerate(lines, 1))
+    p.write_text("[preset00]\n" + header + body)
+    events, _, _ = scan_file_full(str(p))
+    return [(e.rule_id, e.line, e.variables) for e in events]
+
+
+def test_loop_behavior_rate():
+    assert LoopBehavior(2, 2, (0.0, 1.0)).transitions_per_sec == 60
+    assert LoopBehavior(40, 2, (0.0,) * 40).transitions_per_sec == 3
+
+
+def test_loop_finds_carried_variables():
+    lp = FrameLoop(parse("y = x;\nx = 1 - x;\nz = 2;"), {})
+    assert lp.carried == ["x"]
+    assert not lp.reads_frame
+    assert FrameLoop(parse("z = frame % 2;"), {}).reads_frame
+
+
+def test_loop_period_two_toggle():
+    lp = loop("t = bnot(t);")
+    assert lp.behaviors["t"] == LoopBehavior(2, 2, (1.0, 0.0))
+    assert lp.entry["t"].hard_edge
+    # Initial values come from the header parameters
+    assert loop("x = 1 - x;", x=0.25).behaviors["x"].values == (0.75, 0.25)
+
+
+def test_loop_period_n_counter():
+    lp = loop("c = c + 1;\nf = above(c % 4, 1);")
+    assert lp.behaviors["f"] == LoopBehavior(4, 2, (0.0, 1.0, 1.0, 0.0))
+    assert "c" not in lp.behaviors
+    assert lp.entry["c"].freq == 60
+    assert lp.entry["c"].is_time_dep
+
+
+def test_loop_frame_counter():
+    lp = loop("k = equal(frame % 3, 0);")
+    assert lp.behaviors["k"].period == 3
+    assert lp.entry == {}
+
+
+def test_loop_without_state_is_skipped():
+    lp = loop("ob_r = 0.5 + 0.1*sin(time);")
+    assert lp.behaviors == {} and lp.entry == {}
+
+
+def test_frame_toggle_reports_visible_output(tmp_path):
+    events = per_frame_events(
+        tmp_path, "t = a;", "a = b;", "b = t;", "ob_r = a;", header="b=1\n"
+    )
+    assert events == [("FrameToggle", 6, ["ob_r"])]
+    assert per_frame_events(tmp_path, "c = c + 1;", "wave_g = above(c % 4, 1);") == [
+        ("FrameToggle", 3, ["wave_g"])
+    ]
+
+
+def test_frame_toggle_on_state_without_output(tmp_path):
+    assert per_frame_events(tmp_path, "s = if(s, 0, 1);") == [("FrameToggle", 2, ["s"])]
+
+
+def test_frame_toggle_not_duplicated(tmp_path):
+    # The lexical InverterStrobe already covers this cycle
+    assert per_frame_events(tmp_path, "x = 1 - x;", "ob_r = x;") == [
+        ("InverterStrobe", 2, ["x"])
+    ]
+
+
+def test_header_variables_do_not_carry(tmp_path):
+    # MilkDrop restores wave_r from the header before every frame
+    assert loop("wave_r = 1 - wave_r*1;", wave_r=1.0).carried == []
+    assert per_frame_events(tmp_path, "wave_r = 1 - wave_r*1;") == []
+    assert loop("q1 = 1 - q1*1; t = 1 - t*1;").carried == ["t"]
+
+
+def test_q_variables_do_not_carry(tmp_path):
+    # q1 is restored every frame, so ob_r is a constant 1
+    assert per_frame_events(tmp_path, "q1 = bnot(q1);", "ob_r = q1;") == []
+    assert not TriggerPrefilter.may_carry("q1 = bnot(q1);")
+
+
+def test_frame_toggle_one_event_per_cycle(tmp_path):
+    events = per_frame_events(tmp_path, "t = bnot(t);", "ob_r = t;", "ob_g = t;")
+    assert events == [("FrameToggle", 4, ["ob_g"])]
+
+
+def test_slow_cycle_is_not_flagged(tmp_path):
+    # 2 changes every 40 frames = 3 per second
+    assert per_frame_events(tmp_path, "c = c + 1;", "ob_g = above(c % 40, 19);") == []
+
+
+def test_widened_counter_reaches_rules(tmp_path):
+    events = per_frame_events(tmp_path, "a = a + 1;", "ob_b = 0.5 + 0.5*sin(a);")
+    assert events == [("HighFreqOsc", 3, ["sin"])]
+    events = per_frame_events(tmp_path, "c = c + 0.5;", "ob_b = fract(c);")
+    assert events == [("StepFunction", 3, ["fract"]), ("FrameToggle", 3, ["ob_b"])]
@@ -0,0 +1,219 @@
+"""
+vizscan.cache
+
+Content-addressed on-disk cache of scan results.
+
+Entries are keyed by the SHA-256 of the preset bytes combined with a
+fingerprint of the rule registry, the analyzer source code and the scan
+parameters, so a cached result is only reused when re-running the scan would
+produce the same report.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .static import REGISTRY, RiskEvent, RiskLevel, QualityReport
+from .reports import HybridReport
+from .dynamic import DEFAULT_FRAMEBUFFER
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "vizscan")
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """Digest of the vizscan sources; any analyzer change invalidates the cache."""
+    pkg_dir = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(pkg_dir)):
+        if name.endswith(".py"):
+            h.update(name.encode("utf-8"))
+            with open(os.path.join(pkg_dir, name), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def scan_parameters(args) -> Dict:
+    """The subset of CLI arguments that affects a single file's report."""
+    enable_dynamic = bool(getattr(args, "enable_dynamic", False))
+    return {
+        "enable_dynamic": enable_dynamic,
+        "fps": args.fps if enable_dynamic else None,
+        "duration": args.duration if enable_dynamic else None,
+        "dynamic_mode": (
+            getattr(args, "dynamic_mode", "full") if enable_dynamic else None
+        ),
+        "sampling": getattr(args, "sampling", "full") if enable_dynamic else None,
+        "flash_analysis": (
+            getattr(args, "flash_analysis", "mean") if enable_dynamic else None
+        ),
+        "framebuffer": (
+            list(getattr(args, "framebuffer", DEFAULT_FRAMEBUFFER))
+            if enable_dynamic
+            else None
+        ),
+        "renderer": getattr(args, "renderer", "mock") if enable_dynamic else None,
+    }
+
+
+def file_parameters(params: Dict, filepath: str) -> Dict:
+    """
+    ``params`` for one file. The mock renderer picks its luminance curve from
+    the file name, so with it a renamed copy must not share a cache entry.
+    """
+    if params.get("renderer") == "mock":
+        return dict(params, filename=os.path.basename(filepath))
+    return params
+
+
+def hash_file(filepath: str) -> Optional[str]:
+    try:
+        with open(filepath, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _event_from_dict(d: Dict) -> RiskEvent:
+    d = dict(d)
+    d["risk_level"] = RiskLevel(d["risk_level"])
+    return RiskEvent(**d)
+
+
+def report_to_dict(report: HybridReport) -> Dict:
+    return {
+        "static_events": [asdict(e) for e in report.static_events],
+        "dynamic_events": [asdict(e) for e in report.dynamic_events],
+        "final_disposition": report.final_disposition,
+        "render_stats": report.render_stats,
+        "quality_report": (
+            asdict(report.quality_report) if report.quality_report else None
+        ),
+        "certified": report.certified,
+        "max_lum_change": report.max_lum_change,
+    }
+
+
+def report_from_dict(filepath: str, d: Dict) -> HybridReport:
+    quality = d.get("quality_report")
+    return HybridReport(
+        filepath=filepath,
+        static_events=[_event_from_dict(e) for e in d["static_events"]],
+        dynamic_events=[_event_from_dict(e) for e in d["dynamic_events"]],
+        final_disposition=d["final_disposition"],
+        render_stats=d["render_stats"],
+        quality_report=QualityReport(**quality) if quality is not None else None,
+        certified=d.get("certified", False),
+        max_lum_change=d.get("max_lum_change"),
+    )
+
+
+class ScanCache:
+    """
+    Stores one JSON file per entry under ``cache_dir``, sharded by key prefix.
+
+    When the total size exceeds ``max_bytes`` the least recently used entries
+    (by modification time, refreshed on every hit) are evicted until the cache
+    is back under 90% of the bound.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+
+    def make_key(self, content_hash: str, params: Dict) -> str:
+        payload = json.dumps(
+            {
+                "format": CACHE_FORMAT,
+                "content": content_hash,
+                "rules": REGISTRY.fingerprint(),
+                "code": code_version(),
+                "params": params,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key: str, filepath: str) -> Optional[HybridReport]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            report = report_from_dict(filepath, data)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:  # pragma: no cover
+            pass
+        self.hits += 1
+        return report
+
+    def put(self, key: str, report: HybridReport):
+        path = self._path(key)
+        size = self.total_size()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(report_to_dict(report)).encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:  # pragma: no cover
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        self._size = size + len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def total_size(self) -> int:
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def evict(self):
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+                size -= entry_size
+            except OSError:  # pragma: no cover
+                pass
+        self._size = size
@@ -6,12 +6,104 @@ import os
 import sys
 import json
 import argparse
-from typing import List
+import multiprocessing
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # --- IMPORTS ---
-from .static import REGISTRY
-from .dynamic import run_hybrid_scan
+from .static import REGISTRY, TAINT_MEMO, PREFILTER
+from .dynamic import (
+    DEFAULT_FRAMEBUFFER,
+    DYNAMIC_MODES,
+    FLASH_ANALYSES,
+    RENDERERS,
+    SAMPLING_MODES,
+    renderer_class,
+    run_hybrid_scan,
+)
 from .reports import generate_earl, HybridReport
+from .cache import (
+    ScanCache,
+    DEFAULT_MAX_BYTES,
+    file_parameters,
+    hash_file,
+    scan_parameters,
+)
+from .dedupe import find_duplicates, line_mapping
+
+
+ScanResult = Tuple[str, Optional[HybridReport], Optional[str]]
+
+# Set once per pool worker by _init_worker, so the parsed arguments are sent to
+# each process a single time instead of with every file.
+_worker_args = None
+
+
+def scan_one(filepath: str, args) -> ScanResult:
+    """Scans one file, isolating any failure to that file's result."""
+    try:
+        return filepath, run_hybrid_scan(filepath, args), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+
+def fan_out(report: HybridReport, filepath: str) -> HybridReport:
+    """
+    The representative's ``report`` for its duplicate ``filepath``, with event
+    lines moved to the duplicate's lines (0 where no line matches).
+    """
+    lines = line_mapping(report.filepath, filepath)
+
+    def moved(events):
+        return [replace(e, line=lines.get(e.line, 0)) for e in events]
+
+    return replace(
+        report,
+        filepath=filepath,
+        duplicate_of=report.filepath,
+        static_events=moved(report.static_events),
+        dynamic_events=moved(report.dynamic_events),
+    )
+
+
+def framebuffer_size(value: str) -> Tuple[int, int]:
+    """Parses a WIDTHxHEIGHT framebuffer size."""
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected WIDTHxHEIGHT, got {value!r}"
+        ) from None
+    if width < 6 or height < 6:
+        raise argparse.ArgumentTypeError("framebuffer must be at least 6x6")
+    return width, height
+
+
+def _init_worker(args):
+    global _worker_args
+    _worker_args = args
+
+
+def _scan_worker(filepath: str) -> ScanResult:
+    return scan_one(filepath, _worker_args)
+
+
+def iter_scans(files: List[str], args, jobs: int = 1) -> Iterator[ScanResult]:
+    """
+    Yields ``(filepath, report, error)`` for each file, in input order.
+
+    With ``jobs > 1`` the files are fanned out over a pool of long-lived
+    worker processes; results are still yielded in the order of ``files``.
+    """
+    if jobs <= 1 or len(files) <= 1:
+        for f in files:
+            yield scan_one(f, args)
+        return
+
+    jobs = min(jobs, len(files))
+    chunksize = max(1, min(16, len(files) // (jobs * 4)))
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(args,)) as pool:
+        yield from pool.imap(_scan_worker, files, chunksize=chunksize)
 
 
 def main():
@@ -26,6 +118,40 @@ def main():
         "--duration", type=int, default=5, help="Render duration in seconds"
     )
     parser.add_argument("--fps", type=int, default=60, help="Simulation FPS")
+    parser.add_argument(
+        "--dynamic-mode",
+        choices=DYNAMIC_MODES,
+        default="full",
+        help="fail-fast: stop rendering at the first flash violation "
+        "(render stats are then partial)",
+    )
+    parser.add_argument(
+        "--sampling",
+        choices=SAMPLING_MODES,
+        default="full",
+        help="adaptive: render at full rate only where the luminance changes "
+        "near the flash threshold (not with --renderer software)",
+    )
+    parser.add_argument(
+        "--flash-analysis",
+        choices=FLASH_ANALYSES,
+        default="mean",
+        help="spatial: apply the 25%% area rule to downsampled RGB frames "
+        "(needs NumPy)",
+    )
+    parser.add_argument(
+        "--framebuffer",
+        type=framebuffer_size,
+        default=DEFAULT_FRAMEBUFFER,
+        metavar="WxH",
+        help="Frame size for spatial analysis (default: %dx%d)" % DEFAULT_FRAMEBUFFER,
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=RENDERERS,
+        default="mock",
+        help="software: evaluate the preset's per-frame equations (needs NumPy)",
+    )
     parser.add_argument("-o", "--output", default="hybrid_report.jsonld")
     parser.add_argument(
         "--recursive", action="store_true", help="Recursively scan directories"
@@ -36,6 +162,32 @@ def main():
     parser.add_argument(
         "--score-quality", action="store_true", help="Include quality scoring in output"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Analyze duplicate presets (ignoring comments/whitespace) once",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the on-disk result cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Result cache directory (default: $XDG_CACHE_HOME/vizscan)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Maximum result cache size in MiB",
+    )
 
     args = parser.parse_args()
 
@@ -47,40 +199,107 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if (
+        args.enable_dynamic
+        and args.sampling == "adaptive"
+        and not renderer_class(args.renderer).random_access
+    ):
+        parser.error(
+            f"--sampling adaptive needs a random-access renderer; the "
+            f"{args.renderer} renderer renders frames in order"
+        )
+
     # Collect files
     files_to_scan = []
     if os.path.isfile(args.path):
         files_to_scan.append(args.path)
     elif os.path.isdir(args.path):
         if args.recursive:
-            for root, _, files in os.walk(args.path):
-                for f in files:
+            for root, dirs, files in os.walk(args.path):
+                dirs.sort()
+                for f in sorted(files):
                     if f.endswith((".milk", ".json")):  # Basic filter
                         files_to_scan.append(os.path.join(root, f))
         else:
-            for f in os.listdir(args.path):
+            for f in sorted(os.listdir(args.path)):
                 full_p = os.path.join(args.path, f)
                 if os.path.isfile(full_p) and f.endswith((".milk", ".json")):
                     files_to_scan.append(full_p)
 
     print(f"Scanning {len(files_to_scan)} files...")
 
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+
+    cache = None
+    if not args.no_cache:
+        cache = ScanCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    params = scan_parameters(args)
+
+    # Duplicates are not scanned; they reuse their representative's report.
+    representative = {f: f for f in files_to_scan}
+    if args.dedupe:
+        # Copies only share a report when they share the cache's parameters
+        # (with the mock renderer the result depends on the file name)
+        representative = find_duplicates(
+            files_to_scan,
+            key=lambda f: json.dumps(file_parameters(params, f), sort_keys=True),
+        )
+    unique_files = [f for f in files_to_scan if representative[f] == f]
+    if len(unique_files) < len(files_to_scan):
+        print(f"Deduplicated to {len(unique_files)} unique presets")
+
+    # Resolve cache hits up front so only misses are sent to the scanners.
+    keys: Dict[str, Optional[str]] = {}
+    results: Dict[str, Optional[HybridReport]] = {}
+    for f in unique_files:
+        keys[f] = None
+        results[f] = None
+        if cache is not None:
+            content_hash = hash_file(f)
+            if content_hash is not None:
+                keys[f] = cache.make_key(content_hash, file_parameters(params, f))
+                results[f] = cache.get(keys[f], f)
+
+    pending = [f for f in unique_files if results[f] is None]
+    scans = iter_scans(pending, args, args.jobs)
+
     reports: List[HybridReport] = []
+    errors: Dict[str, Optional[str]] = {}
     for f in files_to_scan:
-        try:
-            rep = run_hybrid_scan(f, args)
-            reports.append(rep)
-            print(f"[{rep.final_disposition}] {os.path.basename(f)}")
-            if args.score_quality and rep.quality_report:
-                print(f"  Quality (Static): {rep.quality_report.background_type}")
-        except Exception as e:
-            print(f"  -> ERROR: {e}")
+        rep_file = representative[f]
+        if rep_file == f and results[f] is None:
+            _, results[f], errors[f] = next(scans)
+            if results[f] is not None and keys[f] is not None:
+                cache.put(keys[f], results[f])
+        rep = results[rep_file]
+        if rep is None:
+            print(f"  -> ERROR: {errors[rep_file]}")
+            continue
+        if rep_file != f:
+            rep = fan_out(rep, f)
+        reports.append(rep)
+        print(f"[{rep.final_disposition}] {os.path.basename(f)}")
+        if args.score_quality and rep.quality_report:
+            print(f"  Quality (Static): {rep.quality_report.background_type}")
 
     # Generate Output
     earl_report = generate_earl(reports)
     with open(args.output, "w") as f:
         json.dump(earl_report, f, indent=2)
 
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    memo = TAINT_MEMO.stats()
+    if memo["hits"] + memo["misses"]:
+        # Only populated for in-process scans; pool workers keep their own memo
+        print(f"Taint memo: {memo['hit_rate']:.0%} hit rate ({memo['size']} entries)")
+    skipped = PREFILTER.stats()
+    if skipped["files"]:
+        print(
+            f"Prefilter: skipped {skipped['files_skipped']} of {skipped['files']} "
+            f"files, {skipped['sections_skipped']} of {skipped['sections']} sections"
+        )
     print(f"\nReport written to {args.output}")
 
     # Exit code based on failures
@@ -0,0 +1,99 @@
+"""
+vizscan.dedupe
+
+Groups presets that are copies of each other so each group is analyzed once.
+
+Two presets are duplicates when their text is identical after removing
+comments, collapsing whitespace within each line, and dropping blank lines and
+header keys that never affect rendering (the user's star rating, the file
+format version and the ``[presetNN]`` section name). Line breaks are kept:
+every line of a MilkDrop INI preset is its own key.
+"""
+
+import re
+import hashlib
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+WHITESPACE = re.compile(r"\s+")
+SPACE_AROUND_PUNCT = re.compile(r" ?([^\w ]) ?")
+SECTION_HEADER = re.compile(r"^\[[^\]]+\]$")
+
+HEADER_ONLY_KEYS = {"fRating", "MILKDROP_PRESET_VERSION"}
+
+
+def _blank_comment(match) -> str:
+    # Keep the line breaks of block comments so line numbers stay put
+    return "\n" * match.group().count("\n")
+
+
+def normalized_lines(code: str) -> List[Tuple[int, str]]:
+    """(line number, normalized text) of every line that affects rendering."""
+    lines = []
+    for line_no, raw in enumerate(COMMENT.sub(_blank_comment, code).split("\n"), 1):
+        line = WHITESPACE.sub(" ", raw.strip())
+        if not line or SECTION_HEADER.match(line):
+            continue
+        key = line.split("=", 1)[0].strip()
+        if key in HEADER_ONLY_KEYS:
+            continue
+        # Whitespace only matters between two word characters ('float x')
+        lines.append((line_no, SPACE_AROUND_PUNCT.sub(r"\1", line)))
+    return lines
+
+
+def normalize_preset(code: str) -> str:
+    return "\n".join(line for _, line in normalized_lines(code))
+
+
+def fingerprint(code: str) -> str:
+    return hashlib.sha256(normalize_preset(code).encode("utf-8")).hexdigest()
+
+
+def read_preset(filepath: str) -> Optional[str]:
+    try:
+        with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def fingerprint_file(filepath: str) -> Optional[str]:
+    code = read_preset(filepath)
+    return None if code is None else fingerprint(code)
+
+
+def find_duplicates(
+    files: List[str], key: Optional[Callable[[str], Hashable]] = None
+) -> Dict[str, str]:
+    """
+    Maps every file to the representative of its duplicate group: the first
+    file in ``files`` with the same fingerprint (and the same ``key(file)``,
+    when given). Unique and unreadable files map to themselves.
+    """
+    first_seen: Dict[tuple, str] = {}
+    representative: Dict[str, str] = {}
+    for f in files:
+        fp = fingerprint_file(f)
+        if fp is None:
+            representative[f] = f
+            continue
+        group = (fp, None if key is None else key(f))
+        representative[f] = first_seen.setdefault(group, f)
+    return representative
+
+
+def line_mapping(original: str, duplicate: str) -> Dict[int, int]:
+    """
+    Maps the line numbers of the ``original`` file onto the matching lines of
+    its ``duplicate``. Lines that do not affect rendering are not mapped.
+    """
+    codes = read_preset(original), read_preset(duplicate)
+    if None in codes:
+        return {}
+    return {
+        a: b
+        for (a, _), (b, _) in zip(
+            normalized_lines(codes[0]), normalized_lines(codes[1])
+        )
+    }
@@ -1,9 +1,17 @@
 import math
-from typing import List, Dict, Optional, Deque, Tuple
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional, Deque, Tuple
 from collections import deque
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional 'fast' extra
+    np = None
+
+from .preset import load_preset
 from .static import (
-    scan_file_full,
+    REGISTRY,
+    scan_file_static,
     RiskEvent,
     RiskLevel,
 )
@@ -13,6 +21,9 @@ from .reports import HybridReport
 class IRenderer:
     """Interface for the ProjectM Renderer."""
 
+    # Whether render_at can render frames out of order (see AdaptiveSampler)
+    random_access = False
+
     def load_preset(self, path: str):
         pass
 
@@ -20,16 +31,66 @@ class IRenderer:
         raise NotImplementedError()
         #  return 0.0  # Returns average luminance (0.0 - 1.0)
 
+    def render_frames(self, n: int, out, rgb=None) -> int:
+        """
+        Renders the next ``n`` frames into ``out[:n]``, a caller-provided
+        float32 buffer that can be reused across presets, and returns ``n``.
+        Audio is advanced once per frame. When given, ``rgb[:n]`` (an (n, 3)
+        float32 buffer) receives the mean linear RGB of each frame, for the
+        red flash check.
+
+        This default adapter calls ``update_audio`` and ``render_frame`` for
+        every frame; renderers override it to fill the buffer in bulk. Its
+        frames are grey, so their mean linear RGB is the luminance.
+        """
+        for i in range(n):
+            self.update_audio()
+            out[i] = self.render_frame()
+            if rgb is not None:
+                rgb[i] = out[i]
+        return n
+
+    def render_rgb(self, out):
+        """
+        Renders the next frame into ``out``, a caller-provided (height, width,
+        3) float32 buffer of sRGB values in 0..1 at the (downsampled)
+        resolution the caller chose, and returns it.
+
+        This default adapter fills the buffer with the grey level of
+        ``render_frame``.
+        """
+        self.update_audio()
+        out[...] = self.render_frame()
+        return out
+
+    def render_at(self, frames, out, rgb=None) -> int:
+        """
+        Renders the 0-based frame numbers ``frames`` (ascending) into
+        ``out[:len(frames)]`` (and ``rgb``, as in ``render_frames``). Only
+        renderers whose frames do not depend on the previous ones
+        (``random_access``) can implement this.
+        """
+        raise NotImplementedError()
+
     def update_audio(self):
         pass
 
 
+# Saturated red of the mock's red strobe: sRGB 0.66, linear ~0.39, so a
+# relative luminance (~0.08) under the general flash threshold
+RED_SRGB = 0.66
+RED_LINEAR = ((RED_SRGB + 0.055) / 1.055) ** 2.4
+
+
 class MockProjectM(IRenderer):
     """
     Simulates ProjectM for testing the pipeline without a GPU.
     It generates luminance values based on the filename to test safety logic.
     """
 
+    # Each frame depends only on its number
+    random_access = True
+
     def __init__(self):
         self.frame_count = 0
         self.mode = "safe"
@@ -40,6 +101,18 @@ class MockProjectM(IRenderer):
             self.mode = "strobe"
         elif "dynamic_edge" in path:
             self.mode = "edge"  # 2.9 Hz (Safe but close)
+        elif "dynamic_antiphase" in path:
+            # Screen halves strobing in opposite phase: a steady average
+            self.mode = "antiphase"
+        elif "dynamic_sparkle" in path:
+            # 1 pixel in 8 strobing, spread over the whole screen
+            self.mode = "sparkle"
+        elif "dynamic_red" in path:
+            # Dark red strobe at 15 Hz: only the red flash check fails it
+            self.mode = "red"
+        elif "dynamic_rings" in path:
+            # High-contrast concentric rings reversing twice a second
+            self.mode = "rings"
         else:
             self.mode = "safe"
 
@@ -58,12 +131,211 @@ class MockProjectM(IRenderer):
         elif self.mode == "edge":
             # 2.9 Hz Flash
             return 1.0 if (math.sin(t * 2.9 * 2 * math.pi) > 0) else 0.0
+        elif self.mode in ("antiphase", "rings"):
+            return 0.5
+        elif self.mode == "sparkle":
+            return 0.125 if (self.frame_count % 4) < 2 else 0.0
+        elif self.mode == "red":
+            return 0.2126 * RED_LINEAR if (self.frame_count % 4) < 2 else 0.0
         return 0.0
 
+    def luminance(self, frame_numbers):
+        """Vectorized ``render_frame`` for the given 1-based frame counts."""
+        t = frame_numbers / 60.0
+        if self.mode == "safe":
+            return 0.5 + 0.1 * np.sin(t)
+        elif self.mode == "strobe":
+            return (frame_numbers % 4) < 2
+        elif self.mode == "edge":
+            return np.sin(t * 2.9 * 2 * math.pi) > 0
+        elif self.mode in ("antiphase", "rings"):
+            return np.full(len(frame_numbers), 0.5)
+        elif self.mode == "sparkle":
+            return 0.125 * ((frame_numbers % 4) < 2)
+        elif self.mode == "red":
+            return 0.2126 * RED_LINEAR * ((frame_numbers % 4) < 2)
+        return np.zeros(len(frame_numbers))
+
+    def mean_rgb(self, frame_numbers, lums):
+        """Mean linear RGB of the frames with luminance ``lums``."""
+        if self.mode == "red":
+            rgb = np.zeros((len(frame_numbers), 3))
+            rgb[:, 0] = RED_LINEAR * ((frame_numbers % 4) < 2)
+            return rgb
+        return np.repeat(np.asarray(lums, dtype=np.float64)[:, None], 3, axis=1)
+
+    def render_frames(self, n: int, out, rgb=None) -> int:
+        if np is None:
+            return super().render_frames(n, out, rgb)
+        frames = np.arange(self.frame_count + 1, self.frame_count + n + 1)
+        self.frame_count += n
+        out[:n] = self.luminance(frames)
+        if rgb is not None:
+            rgb[:n] = self.mean_rgb(frames, out[:n])
+        return n
+
+    def render_at(self, frames, out, rgb=None) -> int:
+        frames = np.asarray(frames) + 1
+        out[: len(frames)] = self.luminance(frames)
+        if rgb is not None:
+            rgb[: len(frames)] = self.mean_rgb(frames, out[: len(frames)])
+        return len(frames)
+
+    def render_rgb(self, out):
+        if self.mode not in ("antiphase", "sparkle", "red", "rings"):
+            return super().render_rgb(out)  # Uniform frames
+        self.frame_count += 1
+        on = float((self.frame_count % 4) < 2)
+        height, width = out.shape[:2]
+        if self.mode == "rings":
+            # 7 light-dark pairs per screen height, reversed every 15 frames
+            y, x = np.indices((height, width))
+            radius = np.hypot(x - width / 2, y - height / 2) * 14 / height
+            reverse = (self.frame_count // 15) % 2
+            out[...] = ((radius.astype(int) + reverse) % 2)[..., None]
+        elif self.mode == "red":
+            out[...] = 0.0
+            out[..., 0] = RED_SRGB * on
+        elif self.mode == "antiphase":
+            out[:, : width // 2] = on
+            out[:, width // 2 :] = 1.0 - on
+        else:
+            y, x = np.indices((height, width))
+            out[...] = 0.0
+            out[(x + 3 * y) % 8 == 0] = on
+        return out
+
+
+# Rough share of the screen covered by the waveform and its trails
+WAVE_COVER = 0.1
+
+
+def affine_scan(a, b, x0):
+    """
+    All states of the recurrence ``x[t] = a[t] * x[t-1] + b[t]`` from
+    ``x0``, along the first axis, in log2(n) vectorized steps (a parallel
+    prefix scan over the composed affine maps).
+    """
+    a = np.array(a, dtype=np.float64)
+    b = np.array(b, dtype=np.float64)
+    shift = 1
+    while shift < len(a):
+        b[shift:] += a[shift:] * b[:-shift]
+        a[shift:] *= a[:-shift]
+        shift *= 2
+    return a * x0 + b
+
+
+class SoftwareRenderer(IRenderer):
+    """
+    Renders presets without a GPU by evaluating their per-frame equations
+    (``vizscan.nsel.FrameProgram``) and compositing the mean color of the
+    screen from the outputs they drive.
+
+    Each frame, the canvas left by the previous one fades by ``decay`` (the
+    feedback loop), the waveform is blended over WAVE_COVER of it with
+    ``wave_a`` and ``wave_r/g/b``, and the outer and inner borders over their
+    share of the area (``ob_size``, ``ib_size``) with ``ob_a``/``ib_a`` and
+    their colors. The canvas is a mean sRGB color, so a chunk of frames is
+    one affine recurrence, solved with ``affine_scan``. Per-pixel warps,
+    custom waves and shapes and shaders are not modelled, and audio inputs
+    hold a constant level (``audio``).
+
+    Frames depend on the previous ones through the canvas, so the renderer is
+    not random access.
+    """
+
+    def __init__(self, fps: int = 60, audio: float = 1.0):
+        self.fps = fps
+        self.audio = audio
+        self.program = None
+        self.frame_count = 0
+        self.canvas = np.zeros(3)
+
+    def load_preset(self, path: str):
+        from .nsel import FrameProgram
+
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            code = f.read()
+        self.program = FrameProgram(load_preset(code), fps=self.fps, audio=self.audio)
+        self.frame_count = 0
+        self.canvas = np.zeros(3)
+
+    def composite(self, env, n: int):
+        """Mean sRGB color of ``n`` frames from their output variables."""
+
+        def var(name):
+            value = np.broadcast_to(env.get(name, 0.0), (n,))
+            return np.nan_to_num(value, nan=0.0, posinf=1.0, neginf=0.0)
+
+        def color(prefix):
+            return np.clip(np.stack([var(prefix + c) for c in "rgb"], axis=1), 0, 1)
+
+        decay = np.clip(var("decay"), 0, 1)[:, None]
+        wave = (WAVE_COVER * np.clip(var("wave_a"), 0, 1))[:, None]
+        ob_size = np.clip(var("ob_size"), 0, 0.5)
+        ib_size = np.clip(var("ib_size"), 0, 0.5 - ob_size)
+        inside_ob = (1 - 2 * ob_size) ** 2
+        outer = ((1 - inside_ob) * np.clip(var("ob_a"), 0, 1))[:, None]
+        inner = (
+            (inside_ob - (1 - 2 * (ob_size + ib_size)) ** 2)
+            * np.clip(var("ib_a"), 0, 1)
+        )[:, None]
+
+        # Fade, then blend the wave, outer and inner border in turn
+        a = decay * (1 - wave) * (1 - outer) * (1 - inner)
+        b = (wave * color("wave_") * (1 - outer) + outer * color("ob_")) * (
+            1 - inner
+        ) + inner * color("ib_")
+        frames = np.clip(affine_scan(a, b, self.canvas), 0, 1)
+        self.canvas = frames[-1]
+        return frames
+
+    def render_frames(self, n: int, out, rgb=None) -> int:
+        frames = np.arange(self.frame_count, self.frame_count + n)
+        self.frame_count += n
+        srgb = self.composite(self.program.run(frames), n)
+        out[:n] = relative_luminance(srgb)
+        if rgb is not None:
+            rgb[:n] = srgb_to_linear(srgb)
+        return n
+
+    def render_frame(self) -> float:
+        out = np.empty(1, dtype=np.float32)
+        self.render_frames(1, out)
+        return float(out[0])
+
+    def render_rgb(self, out):
+        # Uniform frames of the mean color
+        frames = np.arange(self.frame_count, self.frame_count + 1)
+        self.frame_count += 1
+        out[...] = self.composite(self.program.run(frames), 1)[0]
+        return out
+
+
+RENDERERS = ("mock", "software")
+
+
+def renderer_class(name: str) -> type:
+    return SoftwareRenderer if name == "software" else MockProjectM
+
+
+def make_renderer(name: str, fps: int) -> IRenderer:
+    if name == "software":
+        if np is None:
+            raise ImportError("The software renderer needs NumPy (vizscan[fast])")
+        return SoftwareRenderer(fps=fps)
+    return MockProjectM()
+
+
+# Luminance change between two frames that counts as a transition
+FLASH_DELTA = 0.10
+
 
 class FlashDetector:
     """
-    Flash detection algorithm (based on ITU-R BT.1702, and W3C WCAG 2.1 General Flash Threshold):
+    Flash detection algorithm (based on ITU-R BT.1702, and W3C WCAG 2.1
+    General Flash Threshold):
     A general flash is defined as a pair of opposing changes in relative luminance.
     The guideline restricts content to no more than 3 flashes per second.
     Since this algorithm counts individual transitions (>10% luminance change),
@@ -80,12 +352,38 @@ class FlashDetector:
             deque()
         )  # Frame numbers where flash occurred
 
-    def process_frame(self, frame_idx: int, lum: float) -> Optional[RiskEvent]:
-        # 1. Detect Transition
+    def make_event(self, rate: int, first_flash_idx: int) -> RiskEvent:
+        first_flash_time = first_flash_idx / self.fps
+        return RiskEvent(
+            rule_id="DynamicStrobe",
+            risk_level=RiskLevel.CRITICAL,
+            score=100,
+            context=(
+                f"Measured {rate} flashes/sec (Limit {self.limit})"
+                f" starting at {first_flash_time:.2f}s"
+            ),
+            line=0,
+            variables=["screen_luminance"],
+            source_type="Dynamic",
+            timecode=first_flash_time,
+        )
+
+    def transition(self, lum: float) -> bool:
+        """Whether ``lum`` makes a transition from the previous frame."""
         delta = abs(lum - self.last_lum)
         self.last_lum = lum
+        return delta > FLASH_DELTA  # 10% luminance jump
 
-        is_flash = delta > 0.10  # 10% luminance jump
+    def transitions(self, lums):
+        """Vectorized ``transition`` over consecutive frames."""
+        lums = np.asarray(lums, dtype=np.float64)
+        previous = np.concatenate(([self.last_lum], lums[:-1]))
+        self.last_lum = float(lums[-1])
+        return np.abs(lums - previous) > FLASH_DELTA
+
+    def process_frame(self, frame_idx: int, lum: float) -> Optional[RiskEvent]:
+        # 1. Detect Transition
+        is_flash = self.transition(lum)
 
         # 2. Update Window
         # Remove flashes older than 1 second (fps frames ago)
@@ -102,31 +400,740 @@ class FlashDetector:
         # Note: ITU-R BT.1702 is 3 flashes (6 transitions) per second.
 
         if current_rate > self.limit:
-            first_flash_time = self.flash_timestamps[0] / self.fps
-            return RiskEvent(
-                rule_id="DynamicStrobe",
-                risk_level=RiskLevel.CRITICAL,
-                score=100,
-                context=f"Measured {current_rate} flashes/sec (Limit {self.limit}) starting at {first_flash_time:.2f}s",
-                line=0,
-                variables=["screen_luminance"],
-                source_type="Dynamic",
-                timecode=first_flash_time,
-            )
+            return self.make_event(current_rate, self.flash_timestamps[0])
         return None
 
+    def can_exceed(self, last_idx: int, remaining: int) -> bool:
+        """
+        Whether ``remaining`` more frames after frame ``last_idx`` could still
+        bring some window over the limit. At most one transition is added per
+        frame, so the window ending k frames later holds at most k plus the
+        transitions already recorded inside it.
+
+        Without knowing the frames ahead this bound is tight: any ``limit + 1``
+        frames can hold ``limit + 1`` transitions. A PASS is therefore only
+        decided within the last ``limit`` frames.
+        """
+        if remaining > self.limit:
+            return True
+        recorded = list(self.flash_timestamps)
+        for k in range(1, remaining + 1):
+            kept = sum(1 for t in recorded if last_idx + k - t <= self.fps)
+            if kept + k > self.limit:
+                return True
+        return False
+
+    def process_frames(self, lums, start_idx: int = 0) -> "FlashAnalysis":
+        """
+        Batch form of ``process_frame`` for frames ``start_idx`` onwards.
+
+        Transitions, the per-frame count of transitions in the trailing
+        one-second window (from a cumulative sum) and the runs of frames over
+        the limit are computed with NumPy. The detector state is carried over,
+        so chunks and single frames can be mixed and give the same results as
+        calling ``process_frame`` on every frame.
+        """
+        if len(lums) == 0:
+            return FlashAnalysis(np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64))
+        return self.count_window(self.transitions(lums), start_idx)
+
+    def count_window(self, transitions, start_idx: int) -> "FlashAnalysis":
+        """Window counts and violations for the transitions of a chunk."""
+        n = len(transitions)
+        frames = np.arange(start_idx, start_idx + n)
+        # Transition flags for frames start_idx - fps .. start_idx + n - 1
+        fps = self.fps
+        flags = np.zeros(fps + n, dtype=np.int64)
+        for t in self.flash_timestamps:
+            if t >= start_idx - fps:
+                flags[t - start_idx + fps] = 1
+        flags[fps:] = transitions
+        cumulative = np.concatenate(([0], np.cumsum(flags)))
+        # Flashes in [i - fps, i] for every frame i of the chunk
+        counts = cumulative[fps + 1 :] - cumulative[:n]
+
+        flash_idx = np.flatnonzero(flags) + (start_idx - fps)
+        self.flash_timestamps = deque(
+            flash_idx[flash_idx >= start_idx + n - 1 - fps].tolist()
+        )
+
+        result = FlashAnalysis(transitions, counts)
+        over = counts > self.limit
+        if over.any():
+            edges = np.diff(np.concatenate(([0], over.astype(np.int8), [0])))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1) - 1
+            first = flash_idx[np.searchsorted(flash_idx, frames[starts] - fps)]
+            for s, e, f in zip(starts, ends, first):
+                result.violations.append((int(frames[s]), int(frames[e])))
+                result.events.append(self.make_event(int(counts[s]), int(f)))
+        return result
+
+
+@dataclass
+class FlashAnalysis:
+    """Result of ``FlashDetector.process_frames`` over a run of frames."""
+
+    transitions: Any  # bool array: a >10% change from the previous frame
+    counts: Any  # transitions in the 1-second window ending at each frame
+    # First and last frame of every run of frames over the limit
+    violations: List[Tuple[int, int]] = field(default_factory=list)
+    # The event process_frame returns at the first frame of each run
+    events: List[RiskEvent] = field(default_factory=list)
+
+
+# WCAG 2.1 red flash: a transition involves a saturated red when
+# R / (R + G + B) >= 0.8, and is large enough when (R - G - B) * 320 (negative
+# values clipped to 0) changes by more than 20. R, G, B are linear.
+RED_RATIO = 0.8
+RED_SCALE = 320.0
+RED_DELTA = 20.0
+
+
+class RedFlashDetector(FlashDetector):
+    """
+    Red flash detection (WCAG 2.1 red flash threshold) over the mean linear
+    RGB of each frame. The window and limit are those of FlashDetector; only
+    what counts as a transition differs, and violations are reported as
+    ``DynamicRedFlash``.
+    """
+
+    def __init__(self, fps=60, limit=6):
+        super().__init__(fps=fps, limit=limit)
+        self.last_red = 0.0
+        self.last_ratio = 0.0
+
+    def transition(self, rgb) -> bool:
+        r, g, b = (float(c) for c in rgb)
+        total = r + g + b
+        ratio = r / total if total > 0 else 0.0
+        red = max(r - g - b, 0.0) * RED_SCALE
+        saturated = max(ratio, self.last_ratio) >= RED_RATIO
+        is_flash = saturated and abs(red - self.last_red) > RED_DELTA
+        self.last_red, self.last_ratio = red, ratio
+        return is_flash
+
+    def transitions(self, rgb):
+        rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+        total = rgb.sum(axis=1)
+        ratio = np.divide(rgb[:, 0], total, out=np.zeros(len(rgb)), where=total > 0)
+        red = np.maximum(rgb[:, 0] - rgb[:, 1] - rgb[:, 2], 0.0) * RED_SCALE
+        last_ratio = np.concatenate(([self.last_ratio], ratio[:-1]))
+        last_red = np.concatenate(([self.last_red], red[:-1]))
+        self.last_red, self.last_ratio = float(red[-1]), float(ratio[-1])
+        saturated = np.maximum(ratio, last_ratio) >= RED_RATIO
+        return saturated & (np.abs(red - last_red) > RED_DELTA)
+
+    def make_event(self, rate: int, first_flash_idx: int) -> RiskEvent:
+        first_flash_time = first_flash_idx / self.fps
+        rule = REGISTRY.rules["DynamicRedFlash"]
+        return RiskEvent(
+            rule_id=rule.id,
+            risk_level=rule.level,
+            score=rule.base_score,
+            context=(
+                f"Measured {rate} red flashes/sec (Limit {self.limit})"
+                f" starting at {first_flash_time:.2f}s"
+            ),
+            line=0,
+            variables=["screen_red"],
+            source_type="Dynamic",
+            timecode=first_flash_time,
+        )
+
+
+def srgb_to_linear(rgb):
+    """Linearizes sRGB values in 0..1 (WCAG 2.1 relative luminance formula)."""
+    rgb = np.asarray(rgb, dtype=np.float32)
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+LUMINANCE_WEIGHTS = (0.2126, 0.7152, 0.0722)
+
+
+def relative_luminance(rgb, linear: bool = False):
+    """WCAG 2.1 relative luminance of sRGB values in 0..1 (last axis RGB)."""
+    if not linear:
+        rgb = srgb_to_linear(rgb)
+    return rgb @ np.array(LUMINANCE_WEIGHTS, dtype=np.float32)
+
+
+def block_mean(image, factor: int):
+    """Downsamples a 2D array by averaging ``factor`` x ``factor`` blocks."""
+    if factor <= 1:
+        return image
+    h = image.shape[0] // factor * factor
+    w = image.shape[1] // factor * factor
+    blocks = image[:h, :w].reshape(h // factor, factor, w // factor, factor)
+    return blocks.mean(axis=(1, 3))
+
+
+class SpatialFlashDetector:
+    """
+    General flash detection over RGB frames (WCAG 2.1 "combined area of
+    flashes occurring concurrently occupies more than 25% of any 10 degree
+    visual field").
+
+    Each frame is converted to relative luminance (optionally downsampled by
+    ``downsample``). A pixel makes a transition when its luminance changes by
+    more than FLASH_DELTA and the darker of the two values is below 0.80.
+    The frame is split into ``grid`` x ``grid`` tiles; a 10 degree field
+    (a third of the screen in each direction, WCAG's 341 x 256 at
+    1024 x 768) is a square of ``grid // 3`` tiles, tried at every tile
+    offset. A field makes a transition when more than ``area`` of its pixels
+    do. Every field keeps a ring buffer of its transitions over the last
+    second, so memory does not grow with the render length, and more than
+    ``limit`` transitions in any field is a violation (as in FlashDetector).
+    """
+
+    def __init__(self, fps=60, limit=6, grid=6, area=0.25, downsample=1):
+        if np is None:
+            raise ImportError("Spatial flash analysis needs NumPy (vizscan[fast])")
+        self.fps = fps
+        self.limit = limit
+        self.grid = grid
+        self.field = max(1, grid // 3)
+        self.area = area
+        self.downsample = downsample
+        fields = grid - self.field + 1
+        self.ring = np.zeros((fps + 1, fields, fields), dtype=bool)
+        self.counts = np.zeros((fields, fields), dtype=np.int64)
+        self.last_lum = None
+        self.mean_rgb = None
+
+    def field_transitions(self, mask):
+        """Per field: whether more than ``area`` of its pixels transition."""
+        g, k = self.grid, self.field
+        th, tw = mask.shape[0] // g, mask.shape[1] // g
+        tiles = mask[: th * g, : tw * g].reshape(g, th, g, tw).sum(axis=(1, 3))
+        # Sum of k x k tiles at every offset, from a 2D cumulative sum
+        c = np.zeros((g + 1, g + 1), dtype=np.int64)
+        c[1:, 1:] = tiles.cumsum(0).cumsum(1)
+        fields = c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]
+        return fields > self.area * (k * th) * (k * tw)
+
+    def process_frame(self, frame_idx: int, rgb) -> Optional[RiskEvent]:
+        linear = srgb_to_linear(rgb)
+        # Kept for the red flash check, which runs on the same frame
+        self.mean_rgb = linear.reshape(-1, 3).mean(axis=0)
+        lum = block_mean(relative_luminance(linear, linear=True), self.downsample)
+        if self.last_lum is None:
+            self.last_lum = np.zeros_like(lum)  # As FlashDetector.last_lum
+        darker = np.minimum(lum, self.last_lum)
+        mask = (np.abs(lum - self.last_lum) > FLASH_DELTA) & (darker < 0.80)
+        self.last_lum = lum
+
+        # Frames [frame_idx - fps, frame_idx] share the window
+        slot = frame_idx % (self.fps + 1)
+        flags = self.field_transitions(mask)
+        self.counts -= self.ring[slot]
+        self.ring[slot] = flags
+        self.counts += flags
+
+        rate = int(self.counts.max())
+        if rate <= self.limit:
+            return None
+        row, col = np.unravel_index(int(self.counts.argmax()), self.counts.shape)
+        # Oldest transition of that field still in the window
+        ages = [
+            (slot - s) % (self.fps + 1) for s in np.flatnonzero(self.ring[:, row, col])
+        ]
+        first_flash_time = (frame_idx - max(ages)) / self.fps
+        return RiskEvent(
+            rule_id="DynamicStrobe",
+            risk_level=RiskLevel.CRITICAL,
+            score=100,
+            context=(
+                f"Measured {rate} flashes/sec (Limit {self.limit}) over >"
+                f"{self.area:.0%} of the 10-degree field at tile ({row}, {col}) "
+                f"starting at {first_flash_time:.2f}s"
+            ),
+            line=0,
+            variables=["screen_region"],
+            source_type="Dynamic",
+            timecode=first_flash_time,
+        )
+
+
+# ITU-R BT.1702 / Ofcom regular patterns: more than 5 light-dark pairs of
+# stripes are harmful when the pattern moves, oscillates or reverses, more
+# than 8 when it is stationary. Pairs are counted per screen height.
+PATTERN_PAIRS = 5
+PATTERN_PAIRS_STATIONARY = 8
+
+
+@dataclass
+class PatternMeasure:
+    """Dominant spatial frequency band of one luminance frame."""
+
+    pairs: int  # Light-dark pairs per screen height
+    share: float  # Share of the frame's contrast energy in the band
+    contrast: float  # Peak-to-peak luminance of the band
+    dark: float  # Luminance of the dark stripes
+    moving: bool  # Whether the band changed since the last analyzed frame
+
+
+class PatternDetector:
+    """
+    Regular spatial pattern detection (stripes, grids, concentric rings) over
+    luminance frames, with a 2D FFT.
+
+    The spectrum of the frame (mean removed) is binned by radial frequency,
+    in light-dark pairs per screen height so stripes of any orientation and
+    rings fall in one band. Bands finer than 4 pixels per pair are ignored.
+    A frame holds a regular pattern when one band (with its two neighbours,
+    for leakage) carries at least ``share`` of the contrast energy. Its
+    peak-to-peak contrast is that of a square wave with the band's energy;
+    the pattern is high contrast when, as for a flash, the
+    contrast is over FLASH_DELTA and the dark stripes are below 0.80. The
+    band is moving when more than ``motion`` of its energy changed since the
+    previous analyzed frame (drift, oscillation or contrast reversal).
+
+    Only every ``interval``-th frame is analyzed (by default 6 per second),
+    which is enough to see a pattern on screen and whether it moves, and keeps
+    the FFT cost a small fraction of the render.
+    """
+
+    def __init__(
+        self,
+        fps=60,
+        interval=None,
+        share=0.5,
+        motion=0.25,
+        pairs=PATTERN_PAIRS,
+        stationary_pairs=PATTERN_PAIRS_STATIONARY,
+    ):
+        self.fps = fps
+        self.interval = interval or max(1, fps // 6)
+        self.share = share
+        self.motion = motion
+        self.pairs = pairs
+        self.stationary_pairs = stationary_pairs
+        self.last_spectrum = None
+        self.frames_analyzed = 0
+        self._bins = {}
+
+    def due(self, frame_idx: int) -> bool:
+        return frame_idx % self.interval == 0
+
+    def radial_bins(self, shape):
+        """Radial frequency bin (pairs per screen height) of every FFT bin."""
+        if shape not in self._bins:
+            height, width = shape
+            ky = np.fft.fftfreq(height) * height
+            # Cycles per width, rescaled to the height
+            kx = np.fft.fftfreq(width) * height
+            radius = np.hypot(ky[:, None], kx[None, :])
+            self._bins[shape] = np.rint(radius).astype(np.int64).ravel()
+        return self._bins[shape]
+
+    def measure(self, lum) -> Optional[PatternMeasure]:
+        lum = np.asarray(lum, dtype=np.float64)
+        spectrum = np.fft.fft2(lum - lum.mean())
+        last, self.last_spectrum = self.last_spectrum, spectrum
+        self.frames_analyzed += 1
+        power = np.abs(spectrum) ** 2
+        total = power.sum()
+        if total <= 0:
+            return None
+        bins = self.radial_bins(lum.shape)
+        profile = np.bincount(bins, weights=power.ravel())
+        if len(profile) < 2:
+            return None
+        # Stripes narrower than 2 pixels cannot be told from aliasing
+        profile = profile[: lum.shape[0] // 4 + 1]
+        band = int(profile[1:].argmax()) + 1
+        in_band = np.abs(bins - band) <= 1
+        band_power = float(profile[max(band - 1, 0) : band + 2].sum())
+        # Parseval: the band's luminance variance, that of a square wave of
+        # peak-to-peak ``contrast``
+        variance = band_power / lum.size**2
+        contrast = 2 * math.sqrt(variance)
+        moving = False
+        if last is not None and last.shape == spectrum.shape:
+            change = (np.abs(spectrum - last) ** 2).ravel()[in_band].sum()
+            moving = bool(change > self.motion * band_power)
+        return PatternMeasure(
+            pairs=band,
+            share=band_power / float(total),
+            contrast=contrast,
+            dark=float(lum.mean()) - contrast / 2,
+            moving=moving,
+        )
+
+    def is_harmful(self, m: PatternMeasure) -> bool:
+        limit = self.pairs if m.moving else self.stationary_pairs
+        return (
+            m.share >= self.share
+            and m.contrast > FLASH_DELTA
+            and m.dark < 0.80
+            and m.pairs > limit
+        )
+
+    def process_frame(self, frame_idx: int, lum) -> Optional[RiskEvent]:
+        """Checks ``lum`` (a 2D luminance frame) if ``frame_idx`` is due."""
+        if not self.due(frame_idx):
+            return None
+        m = self.measure(lum)
+        if m is None or not self.is_harmful(m):
+            return None
+        limit = self.pairs if m.moving else self.stationary_pairs
+        timecode = frame_idx / self.fps
+        rule = REGISTRY.rules["DynamicPattern"]
+        return RiskEvent(
+            rule_id=rule.id,
+            risk_level=rule.level,
+            score=rule.base_score,
+            context=(
+                f"{'Moving' if m.moving else 'Stationary'} pattern of {m.pairs} "
+                f"light-dark pairs per screen height (Limit {limit}), contrast "
+                f"{m.contrast:.2f}, at {timecode:.2f}s"
+            ),
+            line=0,
+            variables=["screen_pattern"],
+            source_type="Dynamic",
+            timecode=timecode,
+        )
+
+
+class LuminanceStats:
+    """Running ``scan_dynamic`` render stats, updated one array at a time."""
+
+    def __init__(self):
+        self.total_lum = 0.0
+        self.min_lum = 1.0
+        self.max_lum = 0.0
+        self.dark_frames = 0
+        self.light_frames = 0
+        self.total_frames = 0
+
+    def add(self, lums) -> "LuminanceStats":
+        lums = np.asarray(lums, dtype=np.float64)
+        if len(lums) == 0:
+            return self
+        # cumsum adds left to right like the scalar loop (np.sum is pairwise)
+        self.total_lum = float(np.cumsum(np.concatenate(([self.total_lum], lums)))[-1])
+        self.min_lum = min(self.min_lum, float(lums.min()))
+        self.max_lum = max(self.max_lum, float(lums.max()))
+        self.dark_frames += int(np.count_nonzero(lums < 0.1))
+        self.light_frames += int(np.count_nonzero(lums > 0.9))
+        self.total_frames += len(lums)
+        return self
+
+    def as_dict(self) -> Dict:
+        n = self.total_frames
+        return {
+            "avg_lum": self.total_lum / n if n > 0 else 0.0,
+            "min_lum": self.min_lum,
+            "max_lum": self.max_lum,
+            "dark_ratio": self.dark_frames / n if n > 0 else 0.0,
+            "light_ratio": self.light_frames / n if n > 0 else 0.0,
+        }
+
+
+def luminance_stats(lums) -> Dict:
+    """The ``scan_dynamic`` render stats of a luminance array, vectorized."""
+    return LuminanceStats().add(lums).as_dict()
+
+
+# Frames rendered per render_frames call
+RENDER_CHUNK = 1024
+
+_render_buffer = None
+
+
+_rgb_buffer = None
+
+
+def render_buffer(size: int = RENDER_CHUNK):
+    """Process-wide float32 frame buffer, reused by every scan_dynamic call."""
+    global _render_buffer
+    if _render_buffer is None or len(_render_buffer) < size:
+        _render_buffer = np.empty(size, dtype=np.float32)
+    return _render_buffer
+
+
+def rgb_buffer(size: int = RENDER_CHUNK):
+    """Process-wide (size, 3) float32 buffer for the mean RGB of each frame."""
+    global _rgb_buffer
+    if _rgb_buffer is None or len(_rgb_buffer) < size:
+        _rgb_buffer = np.empty((size, 3), dtype=np.float32)
+    return _rgb_buffer
+
+
+class AdaptiveSampler:
+    """
+    Coarse-to-fine frame schedule for random-access renderers.
+
+    1. Every ``stride``-th frame is rendered, plus a probe of ``stride + 1``
+       consecutive frames at the start of every one-second window.
+    2. The luminance bandwidth between neighbouring samples is estimated from
+       their difference. A window is busy when the implied per-frame change
+       comes within ``margin`` of the flash threshold, or when the difference
+       is large enough to hide a single step over the threshold. Busy windows
+       may hold transitions, and so count towards the flash limit. They are
+       rendered at the full rate together with the windows on either side,
+       which sliding windows overlap.
+    3. The remaining frames are interpolated from the samples, so no
+       transition is invented between them, and the whole trace goes through
+       the flash detector as usual.
+
+    Windows are settled in time order, one window ahead of the samples they
+    need, so a caller can stop once its verdict is decided.
+
+    When ``sample`` is given an ``rgb`` array, the mean linear RGB of every
+    frame is filled in the same way, and a window is also busy when the red
+    component (see RedFlashDetector) moves by a similar share of its own
+    threshold, so dark red flicker is refined too.
+
+    Any luminance level held for more than ``stride`` frames is hit by a
+    coarse sample, so square-wave flashes at or below the 3Hz limit (such as
+    the 2.9Hz edge case) are always resolved exactly. Faster flicker is
+    seen by the probes when it is sustained. Brief spikes that fall between
+    samples and never into a probe are the price of skipping frames; use full
+    sampling when that matters.
+    """
+
+    def __init__(self, fps: int, stride: int = 4, margin: float = 0.5):
+        self.fps = fps
+        self.stride = stride
+        self.slope_limit = FLASH_DELTA * margin
+        self.frames_rendered = 0
+
+    def sample(self, renderer: IRenderer, total_frames: int, rgb=None, decided=None):
+        """
+        Returns the (partly interpolated) luminance of every frame, filling
+        ``rgb`` (a (total_frames, 3) array) when given.
+
+        Frames are settled one window at a time, in order. When given,
+        ``decided(lums, start, end)`` is called as the frames ``start:end``
+        become final; if it returns True, sampling stops and only the final
+        frames are returned.
+        """
+        fps, stride = self.fps, self.stride
+        rendered = np.zeros(total_frames, dtype=bool)
+        lums = np.zeros(total_frames, dtype=np.float32)
+        self.frames_rendered = 0
+        if total_frames <= 0:
+            return lums
+
+        def render(frames):
+            frames = frames[~rendered[frames]]
+            if len(frames):
+                out = np.empty(len(frames), dtype=np.float32)
+                if rgb is None:
+                    renderer.render_at(frames, out)
+                else:
+                    out_rgb = np.empty((len(frames), 3), dtype=np.float32)
+                    renderer.render_at(frames, out, out_rgb)
+                    rgb[frames] = out_rgb
+                lums[frames] = out
+                rendered[frames] = True
+                self.frames_rendered += len(frames)
+
+        # Coarse samples and probes, in time order
+        windows = (total_frames + fps - 1) // fps
+        probes = (np.arange(windows)[:, None] * fps + np.arange(stride + 1)).ravel()
+        samples = np.unique(
+            np.concatenate(
+                (
+                    np.arange(0, total_frames, stride),
+                    [total_frames - 1],
+                    probes[probes < total_frames],
+                )
+            )
+        )
+        flagged = np.zeros(windows + 1, dtype=bool)
+        examined = 0  # Gaps between samples[:examined] are flagged already
+        for w in range(windows):
+            # Window w is refined when it or a neighbour is busy, so sample
+            # up to the first frame past window w + 1
+            ready = min(np.searchsorted(samples, (w + 2) * fps) + 1, len(samples))
+            render(samples[examined:ready])
+            if ready - examined > 0:
+                known = samples[max(examined - 1, 0) : ready]
+                busy = self.busy_gaps(known, lums, rgb)
+                flagged[known[:-1][busy] // fps] = True
+                flagged[known[1:][busy] // fps] = True
+                examined = ready
+
+            start, end = w * fps, min((w + 1) * fps, total_frames)
+            if flagged[max(w - 1, 0) : w + 2].any():
+                render(np.arange(start, end))
+            else:
+                # Interpolate between the samples in (and just past) window w
+                frames = np.arange(start, min(end + 1, total_frames))
+                known = frames[rendered[frames]]
+                gaps = frames[~rendered[frames]]
+                lums[gaps] = np.interp(gaps, known, lums[known])
+                if rgb is not None:
+                    for c in range(3):
+                        rgb[gaps, c] = np.interp(gaps, known, rgb[known, c])
+            if decided is not None and decided(lums, start, end):
+                return lums[:end]
+        return lums
+
+    def busy_gaps(self, known, lums, rgb=None):
+        """
+        Flags the gaps between neighbouring ``known`` samples whose change
+        may hide a transition (see the class docstring).
+        """
+        jumps = np.abs(np.diff(lums[known]))
+        gaps = np.diff(known)
+        busy = (jumps / gaps > self.slope_limit) | (jumps > FLASH_DELTA)
+        if rgb is not None:
+            red = np.maximum(rgb[known, 0] - rgb[known, 1] - rgb[known, 2], 0.0)
+            red_jumps = np.abs(np.diff(red * RED_SCALE))
+            busy |= red_jumps / gaps > RED_DELTA * self.slope_limit / FLASH_DELTA
+            busy |= red_jumps > RED_DELTA
+        return busy
+
+
+DYNAMIC_MODES = ("full", "fail-fast")
+SAMPLING_MODES = ("full", "adaptive")
+FLASH_ANALYSES = ("mean", "spatial")
+# (width, height) of the RGB frames rendered for spatial analysis
+DEFAULT_FRAMEBUFFER = (64, 48)
+
 
 def scan_dynamic(
-    filepath: str, duration_sec: int, fps: int
+    filepath: str,
+    duration_sec: int,
+    fps: int,
+    buffer=None,
+    mode: str = "full",
+    sampling: str = "full",
+    analysis: str = "mean",
+    framebuffer: Tuple[int, int] = DEFAULT_FRAMEBUFFER,
+    renderer: str = "mock",
 ) -> Tuple[List[RiskEvent], Dict]:
     """
-    Runs the dynamic rendering pass.
+    Runs the dynamic rendering pass. With NumPy, frames are rendered
+    ``len(buffer)`` at a time into ``buffer`` (a float32 array; by default the
+    shared ``render_buffer()``).
+
+    In ``fail-fast`` mode rendering stops once the verdict is decided: at the
+    first violation (FAIL), or when the frames left are too few to push any
+    window over the limit (PASS, at most ``limit`` frames before the end).
+    The stats then cover the rendered frames only and are marked ``partial``.
+
+    With ``adaptive`` sampling and a random-access renderer, frames are
+    scheduled by AdaptiveSampler instead; the stats then include interpolated
+    frames and report ``frames_rendered``. In ``fail-fast`` mode sampling
+    stops after the second that holds the first violation. Other renderers
+    render every frame, as with ``full`` sampling.
+
+    With ``spatial`` analysis, each frame is rendered as a ``framebuffer``
+    (width, height) RGB image and checked by SpatialFlashDetector, and every
+    10th frame (at 60fps) by PatternDetector; the stats are taken over the
+    mean relative luminance of each frame.
+
+    With NumPy, the mean linear RGB of every frame is rendered in the same
+    pass and checked by RedFlashDetector. The first violation of each check
+    is reported (DynamicStrobe, then DynamicRedFlash, then DynamicPattern).
+
+    ``renderer`` picks the engine: ``mock`` (MockProjectM, whose output
+    depends on the file name) or ``software`` (SoftwareRenderer, which
+    evaluates the preset's per-frame equations).
     """
     # 1. Setup
-    renderer = MockProjectM()  # Swap for real libprojectm wrapper in prod
+    renderer = make_renderer(renderer, fps)
     detector = FlashDetector(fps=fps)
+    red = RedFlashDetector(fps=fps, limit=detector.limit)
     renderer.load_preset(filepath)
 
+    total_frames = duration_sec * fps
+    fail_fast = mode == "fail-fast"
+
+    if analysis == "spatial":
+        if np is None:
+            raise ImportError("Spatial flash analysis needs NumPy (vizscan[fast])")
+        if total_frames <= 0:
+            return [], LuminanceStats().as_dict()
+        width, height = framebuffer
+        frame = np.zeros((height, width, 3), dtype=np.float32)
+        means = np.empty(min(RENDER_CHUNK, total_frames), dtype=np.float32)
+        spatial = SpatialFlashDetector(fps=fps, limit=detector.limit)
+        pattern = PatternDetector(fps=fps)
+        stats = LuminanceStats()
+        found = {}
+        rendered = 0
+        for i in range(total_frames):
+            risk = spatial.process_frame(i, renderer.render_rgb(frame))
+            red_risk = red.process_frame(i, spatial.mean_rgb)
+            pattern_risk = pattern.process_frame(i, spatial.last_lum)
+            means[i % len(means)] = spatial.last_lum.mean()
+            rendered += 1
+            if rendered % len(means) == 0:
+                stats.add(means)
+            for e in (risk, red_risk, pattern_risk):
+                if e:
+                    found.setdefault(e.rule_id, e)
+            if fail_fast and found:
+                break
+        stats.add(means[: rendered % len(means)])
+        result = stats.as_dict()
+        if rendered < total_frames:
+            result.update(partial=True, frames_rendered=rendered)
+        return list(found.values()), result
+
+    if np is not None and sampling == "adaptive" and renderer.random_access:
+        sampler = AdaptiveSampler(fps)
+        rgb = np.empty((total_frames, 3), dtype=np.float32)
+        events, red_events = [], []
+
+        def decided(lums, start, end):
+            nonlocal events, red_events
+            # Only the first violation is reported, as in the streaming loop
+            events = (
+                events or detector.process_frames(lums[start:end], start).events[:1]
+            )
+            red_events = (
+                red_events or red.process_frames(rgb[start:end], start).events[:1]
+            )
+            return fail_fast and bool(events or red_events)
+
+        lums = sampler.sample(renderer, total_frames, rgb, decided)
+        result = luminance_stats(lums)
+        result["frames_rendered"] = sampler.frames_rendered
+        if len(lums) < total_frames:
+            result["partial"] = True
+        return events + red_events, result
+
+    if np is not None:
+        # 2. Render and analyze in chunks through one reusable buffer
+        buffer = render_buffer() if buffer is None else buffer
+        rgb = rgb_buffer(len(buffer))
+        # Fail-fast checks the verdict after every second of frames
+        step = min(len(buffer), fps) if fail_fast else len(buffer)
+        stats = LuminanceStats()
+        events, red_events = [], []
+        start = 0
+        while start < total_frames:
+            remaining = total_frames - start
+            if fail_fast and not (
+                detector.can_exceed(start - 1, remaining)
+                or red.can_exceed(start - 1, remaining)
+            ):
+                break
+            n = min(step, remaining)
+            if fail_fast and remaining > detector.limit:
+                # Stop short of the tail that can_exceed may rule out
+                n = min(n, remaining - detector.limit)
+            n = renderer.render_frames(n, buffer, rgb)
+            chunk = buffer[:n]
+            stats.add(chunk)
+            # Only the first violation is reported, as in the streaming loop
+            events = events or detector.process_frames(chunk, start).events[:1]
+            red_events = red_events or red.process_frames(rgb[:n], start).events[:1]
+            start += n
+            if fail_fast and (events or red_events):
+                break
+        result = stats.as_dict()
+        if start < total_frames:
+            result.update(partial=True, frames_rendered=start)
+        return events + red_events, result
+
     events = []
     failed = False
 
@@ -136,13 +1143,15 @@ def scan_dynamic(
     max_lum = 0.0
     dark_frames = 0
     light_frames = 0
-
-    total_frames = duration_sec * fps
+    rendered = 0
 
     # 2. Render Loop
     for i in range(total_frames):
+        if fail_fast and not detector.can_exceed(i - 1, total_frames - i):
+            break
         renderer.update_audio()
         lum = renderer.render_frame()
+        rendered += 1
 
         # Stats Update
         total_lum += lum
@@ -157,17 +1166,19 @@ def scan_dynamic(
 
         if risk and not failed:
             events.append(risk)
-            failed = True  # Stop adding events after first failure, but finish stats?
-            # Optimization: break early if we want speed over full stats
-            # break # Don't break if we want stats
+            failed = True
+            if fail_fast:
+                break  # The verdict is FAIL; the stats stay partial
 
     stats = {
-        "avg_lum": total_lum / total_frames if total_frames > 0 else 0.0,
+        "avg_lum": total_lum / rendered if rendered > 0 else 0.0,
         "min_lum": min_lum,
         "max_lum": max_lum,
-        "dark_ratio": dark_frames / total_frames if total_frames > 0 else 0.0,
-        "light_ratio": light_frames / total_frames if total_frames > 0 else 0.0,
+        "dark_ratio": dark_frames / rendered if rendered > 0 else 0.0,
+        "light_ratio": light_frames / rendered if rendered > 0 else 0.0,
     }
+    if rendered < total_frames:
+        stats.update(partial=True, frames_rendered=rendered)
 
     return events, stats
 
@@ -176,9 +1187,9 @@ def run_hybrid_scan(filepath: str, args) -> HybridReport:
     report = HybridReport(filepath=filepath)
 
     # --- PHASE 1: STATIC ANALYSIS ---
-    events, _, quality = scan_file_full(filepath)
-    report.static_events = events
-    report.quality_report = quality
+    static = scan_file_static(filepath, bounds=args.enable_dynamic)
+    report.static_events = static.events
+    report.quality_report = static.quality
 
     # Check if we should ABORT dynamic scan
     # Policy: If Static Analysis finds a BAN-level threat (e.g. hard strobe logic),
@@ -190,9 +1201,31 @@ def run_hybrid_scan(filepath: str, args) -> HybridReport:
             should_render = False
             break
 
+    # Policy: If the colors and alphas provably never move by more than the
+    # flash threshold between two frames, and nothing else that reaches the
+    # screen (motion, sizes, feedback) moves at all, no frame pair can flash;
+    # skip the render. Only colors and alphas are in luminance units.
+    if should_render and static.luminance is not None and not static.events:
+        change = static.luminance.max_change(args.fps)
+        if math.isfinite(change):
+            report.max_lum_change = change
+        still = static.motion is None or static.motion.max_change(args.fps) == 0
+        if change < FLASH_DELTA and still:
+            report.certified = True
+            should_render = False
+
     # --- PHASE 2: DYNAMIC ANALYSIS ---
     if should_render and args.enable_dynamic:
-        events, stats = scan_dynamic(filepath, args.duration, args.fps)
+        events, stats = scan_dynamic(
+            filepath,
+            args.duration,
+            args.fps,
+            mode=getattr(args, "dynamic_mode", "full"),
+            sampling=getattr(args, "sampling", "full"),
+            analysis=getattr(args, "flash_analysis", "mean"),
+            framebuffer=getattr(args, "framebuffer", DEFAULT_FRAMEBUFFER),
+            renderer=getattr(args, "renderer", "mock"),
+        )
         report.dynamic_events = events
         report.render_stats = stats
         if report.dynamic_events:
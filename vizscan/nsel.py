@@ -0,0 +1,631 @@
+"""
+vizscan.nsel
+
+NumPy evaluator for MilkDrop's per-frame equation language (NSEL).
+
+Expressions are evaluated on NumPy arrays, so when ``time`` and ``frame`` are
+vectors one pass over the parsed code computes every frame at once; the same
+code also runs on scalars, one frame at a time. Semantics follow NSEL:
+unassigned variables read 0, division and modulo by zero give 0, ``%``
+works on integers and comparisons return 1.0 or 0.0.
+
+``MeshProgram`` runs ``per_pixel`` code the same way over every vertex of
+the warp mesh and turns the motion variables into displacement fields.
+
+Needs the optional ``fast`` extra (NumPy).
+"""
+
+import hashlib
+import inspect
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .preset import FRAME_VARIABLES, HEADER_KEYS, LOOP_SECTIONS, Preset
+from .static import (
+    INTERNER,
+    MOTION_VARS,
+    Q_VARS,
+    Assignment,
+    BinaryOp,
+    Block,
+    FunctionCall,
+    Identifier,
+    Literal,
+    MilkLexer,
+    MilkParser,
+    Program,
+    _assignments,
+    carried_variables,
+)
+
+
+class NSELError(ValueError):
+    """Code the evaluator cannot run (GLSL constructs, unknown functions)."""
+
+
+def nsel_div(a, b):
+    safe = np.where(b != 0, b, 1.0)
+    return np.where(b != 0, np.divide(a, safe), 0.0)
+
+
+def nsel_mod(a, b):
+    a, b = np.trunc(a), np.trunc(b)
+    safe = np.where(b != 0, b, 1.0)
+    return np.where(b != 0, np.mod(a, safe), 0.0)
+
+
+def _bool(x):
+    return np.asarray(x != 0, dtype=np.float64)
+
+
+VECTOR_OPS: Dict[str, Callable] = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": nsel_div,
+    "%": nsel_mod,
+    "^": np.power,
+}
+VECTOR_FUNCS: Dict[str, Callable] = {
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "asin": np.arcsin,
+    "acos": np.arccos,
+    "atan": np.arctan,
+    "atan2": np.arctan2,
+    "abs": np.abs,
+    "sqrt": lambda x: np.sqrt(np.abs(x)),
+    "invsqrt": lambda x: nsel_div(1.0, np.sqrt(np.abs(x))),
+    "sqr": np.square,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "pow": np.power,
+    "min": np.minimum,
+    "max": np.maximum,
+    "sigmoid": lambda x, k: 1.0 / (1.0 + np.exp(-x * k)),
+    "above": lambda a, b: _bool(a > b),
+    "below": lambda a, b: _bool(a < b),
+    "equal": lambda a, b: _bool(a == b),
+    "bnot": lambda x: _bool(x == 0),
+    "band": lambda a, b: _bool((a != 0) & (b != 0)),
+    "bor": lambda a, b: _bool((a != 0) | (b != 0)),
+    "if": lambda c, a, b: np.where(c != 0, a, b),
+    "sign": np.sign,
+    "int": np.trunc,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "fract": lambda x: x - np.floor(x),
+    "step": lambda edge, x: _bool(x >= edge),
+}
+
+
+# Argument count of every function (NumPy ufuncs report theirs as ``nin``)
+FUNC_ARITY: Dict[str, int] = {
+    name: getattr(func, "nin", None) or len(inspect.signature(func).parameters)
+    for name, func in VECTOR_FUNCS.items()
+}
+FUNC_ARITY["rand"] = 1
+
+
+def nsel_rand(n, frame, site: int):
+    """
+    ``rand(n)``: an integer in [0, n), from a hash of the frame number and
+    the call site, so runs are repeatable and frames can be evaluated in any
+    order or all at once.
+    """
+    h = (np.asarray(frame, dtype=np.uint64) * 2654435761 + site * 40503) % 2**32
+    h = (h ^ (h >> np.uint64(15))) * np.uint64(2246822519) % 2**32
+    return np.floor(h / 2**32 * np.maximum(np.trunc(n), 0))
+
+
+class Evaluator:
+    """
+    Tree-walking interpreter over the parsed AST. ``env`` maps variable names
+    to floats or arrays; assignments write to it.
+    """
+
+    def __init__(self, env: Optional[Dict] = None):
+        self.env = {} if env is None else env
+        self.sites: Dict[int, int] = {}
+        # Line of the statement being run (expression nodes are shared)
+        self.line = 0
+        self.dispatch = {
+            Literal: self.eval_literal,
+            Identifier: self.eval_identifier,
+            BinaryOp: self.eval_binary,
+            FunctionCall: self.eval_call,
+        }
+
+    def run(self, node):
+        kind = type(node)
+        if kind is Program or kind is Block:
+            for stmt in node.statements:
+                self.run(stmt)
+        elif kind is Assignment and not node.is_decl:
+            self.line = node.line
+            self.env[node.target] = self.eval(node.expr)
+        else:
+            raise NSELError(f"line {node.line}: {kind.__name__} is not NSEL")
+
+    def eval(self, node):
+        handler = self.dispatch.get(type(node))
+        if handler is None:
+            raise NSELError(f"line {self.line}: {type(node).__name__} is not NSEL")
+        return handler(node)
+
+    def eval_literal(self, node):
+        return node.value
+
+    def eval_identifier(self, node):
+        return self.env.get(node.name, 0.0)
+
+    def eval_binary(self, node):
+        return VECTOR_OPS[node.op](self.eval(node.left), self.eval(node.right))
+
+    def eval_call(self, node):
+        if FUNC_ARITY.get(node.name) != len(node.args):
+            raise NSELError(f"line {self.line}: unsupported call to '{node.name}'")
+        args = [self.eval(arg) for arg in node.args]
+        if node.name == "rand":
+            site = self.sites.setdefault(id(node), len(self.sites))
+            return nsel_rand(args[0], self.env.get("frame", 0.0), site)
+        return VECTOR_FUNCS[node.name](*args)
+
+
+# Read-only inputs besides time and frame; audio levels average 1.0
+INPUTS: Dict[str, float] = {
+    "fps": 60.0,
+    "progress": 0.0,
+    "bass": 1.0,
+    "mid": 1.0,
+    "treb": 1.0,
+    "bass_att": 1.0,
+    "mid_att": 1.0,
+    "treb_att": 1.0,
+    "meshx": 48.0,
+    "meshy": 36.0,
+    "aspectx": 1.0,
+    "aspecty": 1.0,
+    "pixelsx": 1024.0,
+    "pixelsy": 768.0,
+}
+AUDIO_INPUTS = ("bass", "mid", "treb", "bass_att", "mid_att", "treb_att")
+
+
+def parse_code(code: str) -> Program:
+    return MilkParser(MilkLexer(code).tokenize_stream()).parse()
+
+
+def unsupported(node) -> Optional[str]:
+    """Why the evaluator cannot run ``node``, or None if it can."""
+    kind = type(node)
+    if kind is Program or kind is Block:
+        for stmt in node.statements:
+            reason = unsupported(stmt)
+            if reason:
+                return reason
+        return None
+    if kind is Assignment:
+        if node.is_decl:
+            return "declaration"
+        return unsupported(node.expr)
+    if kind is Literal or kind is Identifier:
+        return None
+    if kind is BinaryOp:
+        return unsupported(node.left) or unsupported(node.right)
+    if kind is FunctionCall:
+        arity = FUNC_ARITY.get(node.name)
+        if arity is None:
+            return f"function '{node.name}'"
+        if arity != len(node.args):
+            return f"{len(node.args)} arguments to '{node.name}'"
+        for arg in node.args:
+            reason = unsupported(arg)
+            if reason:
+                return reason
+        return None
+    return kind.__name__
+
+
+def split_supported(program: Program):
+    """
+    Splits ``program`` into the statements the evaluator can run and
+    (line, reason) pairs for the others, such as shader code in a legacy
+    single-section preset.
+    """
+    kept: List = []
+    skipped: List = []
+    for stmt in program.statements:
+        reason = unsupported(stmt)
+        if reason is None:
+            kept.append(stmt)
+        else:
+            skipped.append((stmt.line, reason))
+    return Program(program.line, kept), skipped
+
+
+@dataclass
+class CompiledProgram:
+    """
+    NSEL code compiled to one Python function, ``run(env)``, that reads the
+    variables it needs from ``env`` and writes back the ones it assigns.
+    """
+
+    run: Callable[[Dict], None]
+    program: Program  # The statements that were compiled
+    source: str
+    skipped: List[Tuple[int, str]] = field(default_factory=list)
+
+
+# Generated code calls NSEL operators and functions through these names
+COMPILED_OPS = {"/": "_div", "%": "_mod", "^": "_pow"}
+COMPILE_NAMESPACE = {
+    "_div": nsel_div,
+    "_mod": nsel_mod,
+    "_pow": np.power,
+    "_rand": nsel_rand,
+    **{f"_f_{name}": func for name, func in VECTOR_FUNCS.items()},
+}
+
+
+class NSELCompiler:
+    """
+    Compiles NSEL statements into the source of a Python function.
+
+    Every variable is resolved to a local slot (``v0``, ``v1``, ...): those
+    the code reads before assigning are loaded from ``env`` once on entry, and
+    the assigned ones are stored back on exit, so the body runs on fast
+    locals instead of dictionary lookups and AST dispatch. Subexpressions
+    without variables (or ``rand``) are folded to constants at compile time.
+    The same function runs on scalars or on arrays of frames.
+    """
+
+    def __init__(self):
+        self.slots: Dict[str, str] = {}
+        self.sites: Dict[int, int] = {}  # Numbered as the Evaluator does
+
+    def slot(self, name: str) -> str:
+        if name not in self.slots:
+            self.slots[name] = f"v{len(self.slots)}"
+        return self.slots[name]
+
+    def constant(self, node) -> Optional[float]:
+        """Compile-time value of a variable-free subexpression."""
+        if free_variables(node) or _calls_rand(node):
+            return None
+        with np.errstate(all="ignore"):
+            value = float(Evaluator().eval(node))
+        return value if np.isfinite(value) else None
+
+    def expr(self, node) -> str:
+        kind = type(node)
+        if kind is not Literal and kind is not Identifier:
+            value = self.constant(node)
+            if value is not None:
+                return repr(value)
+        if kind is Literal:
+            return repr(float(node.value))
+        if kind is Identifier:
+            return self.slot(node.name)
+        if kind is BinaryOp:
+            left, right = self.expr(node.left), self.expr(node.right)
+            func = COMPILED_OPS.get(node.op)
+            if func is None:
+                return f"({left} {node.op} {right})"
+            return f"{func}({left}, {right})"
+        args = [self.expr(arg) for arg in node.args]
+        if node.name == "rand":
+            site = self.sites.setdefault(id(node), len(self.sites))
+            return f"_rand({args[0]}, {self.slot('frame')}, {site})"
+        return f"_f_{node.name}({', '.join(args)})"
+
+    def compile(self, program: Program) -> str:
+        body = []
+        assigned = set()
+        exposed = set()
+        for stmt in _assignments(program):
+            exposed.update(n for n in free_variables(stmt.expr) if n not in assigned)
+            if _calls_rand(stmt.expr) and "frame" not in assigned:
+                exposed.add("frame")
+            body.append(f"    {self.slot(stmt.target)} = {self.expr(stmt.expr)}")
+            assigned.add(stmt.target)
+        lines = ["def run(env):", "    get = env.get"]
+        lines += [f"    {self.slot(n)} = get({n!r}, 0.0)" for n in sorted(exposed)]
+        lines += body
+        lines += [f"    env[{n!r}] = {self.slots[n]}" for n in sorted(assigned)]
+        if len(lines) == 2:
+            lines.append("    pass")
+        return "\n".join(lines) + "\n"
+
+
+def free_variables(node) -> Tuple[str, ...]:
+    """Names an expression reads (from the interner when it knows the node)."""
+    known = INTERNER.free_vars.get(id(node))
+    if known is not None:
+        return known
+    kind = type(node)
+    if kind is Identifier:
+        return (node.name,)
+    if kind is BinaryOp:
+        return tuple(
+            sorted(set(free_variables(node.left) + free_variables(node.right)))
+        )
+    if kind is FunctionCall:
+        return tuple(sorted({n for arg in node.args for n in free_variables(arg)}))
+    return ()
+
+
+def _calls_rand(node) -> bool:
+    kind = type(node)
+    if kind is FunctionCall:
+        return node.name == "rand" or any(_calls_rand(a) for a in node.args)
+    if kind is BinaryOp:
+        return _calls_rand(node.left) or _calls_rand(node.right)
+    return False
+
+
+def compile_program(program: Program) -> CompiledProgram:
+    """Compiles the statements of ``program`` that the evaluator supports."""
+    kept, skipped = split_supported(program)
+    source = NSELCompiler().compile(kept)
+    namespace = dict(COMPILE_NAMESPACE)
+    exec(compile(source, "<nsel>", "exec"), namespace)  # nosec B102
+    return CompiledProgram(namespace["run"], kept, source, skipped)
+
+
+# Compiled code by SHA-256 of its text, shared by every preset in the process
+_COMPILED: Dict[str, CompiledProgram] = {}
+COMPILE_CACHE_SIZE = 1024
+
+
+def compile_code(code: str) -> CompiledProgram:
+    """Parses and compiles NSEL code, reusing the result for identical code."""
+    digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    compiled = _COMPILED.get(digest)
+    if compiled is None:
+        if len(_COMPILED) >= COMPILE_CACHE_SIZE:
+            _COMPILED.clear()
+        compiled = _COMPILED[digest] = compile_program(parse_code(code))
+    return compiled
+
+
+class FrameProgram:
+    """
+    The per-frame equations of a preset: ``per_frame_init`` run once, then
+    ``per_frame`` for every frame.
+
+    Before each frame the FRAME_VARIABLES are restored from the header and
+    q1..q32 to their values after the init code; other variables keep their
+    value from the previous frame. When the per-frame code reads none of
+    those (``carried`` is empty), frames are independent and ``run``
+    evaluates a whole range of frames in one vectorized pass; otherwise it
+    steps through them in order, carrying the state between calls.
+
+    Both sections run as compiled code (``compile_code``). Statements the
+    evaluator cannot run (GLSL, unsupported functions) are left out and
+    listed in ``skipped``.
+    """
+
+    def __init__(self, preset: Preset, fps: float = 60.0, audio: float = 1.0):
+        self.fps = float(fps)
+        self.init: Optional[CompiledProgram] = None
+        self.per_frame: Optional[CompiledProgram] = None
+        self.skipped: List = []
+        for section in preset.sections:
+            if section.kind != "CPU":
+                continue
+            if section.name != "per_frame_init" and section.name not in LOOP_SECTIONS:
+                continue
+            compiled = compile_code(section.code)
+            self.skipped.extend(
+                (section.source_line(ln), r) for ln, r in compiled.skipped
+            )
+            if section.name == "per_frame_init":
+                self.init = compiled
+            else:
+                self.per_frame = compiled
+
+        self.defaults = dict(FRAME_VARIABLES)
+        for key, value in preset.params.items():
+            name = HEADER_KEYS.get(key, key)
+            if name in FRAME_VARIABLES:
+                self.defaults[name] = value
+        self.inputs = dict(INPUTS, fps=self.fps)
+        for name in AUDIO_INPUTS:
+            self.inputs[name] = audio
+
+        # Runs the init code once; its variables seed the first frame
+        env = dict(self.defaults, **self.inputs, time=0.0, frame=0.0)
+        if self.init is not None:
+            with np.errstate(all="ignore"):
+                self.init.run(env)
+        self.restored = {q: env.get(q, 0.0) for q in Q_VARS}
+        self.state = {
+            k: v
+            for k, v in env.items()
+            if k not in FRAME_VARIABLES and k not in self.inputs
+        }
+        self.state.update(self.restored)
+        self.carried = []
+        if self.per_frame is not None:
+            self.carried = carried_variables(self.per_frame.program)
+        # Restored before every frame
+        self.reset = dict(self.defaults, **self.restored, **self.inputs)
+
+    def frame_env(self, frames) -> Dict:
+        env = dict(self.state)
+        env.update(self.reset)
+        env["frame"] = frames
+        env["time"] = frames / self.fps
+        return env
+
+    def run(self, frames) -> Dict:
+        """
+        Evaluates the per-frame code for the ascending frame numbers
+        ``frames``; returns every variable as a float or an array with one
+        value per frame.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        if self.per_frame is None:
+            return self.frame_env(frames)
+        with np.errstate(all="ignore"):
+            if not self.carried:
+                env = self.frame_env(frames)
+                self.per_frame.run(env)
+                return env
+            return self._run_stepwise(frames)
+
+    def _run_stepwise(self, frames) -> Dict:
+        columns: Dict[str, np.ndarray] = {}
+        run = self.per_frame.run
+        for i, frame in enumerate(frames.tolist()):
+            env = self.frame_env(frame)
+            run(env)
+            for name in self.carried:
+                self.state[name] = env[name]
+            for name, value in env.items():
+                if name not in columns:
+                    columns[name] = np.zeros(len(frames))
+                columns[name][i] = value
+        return columns
+
+
+# Per-pixel outputs that move the warp mesh; each vertex starts from the
+# per-frame value
+MESH_VARIABLES = tuple(sorted(MOTION_VARS | {"zoomexp"}))
+# Warp animation parameters, set only in the preset header
+WARP_PARAMS = {"fWarpAnimSpeed": 1.0, "fWarpScale": 1.0}
+WARP_AMPLITUDE = 0.0035
+
+
+class MeshProgram:
+    """
+    The ``per_pixel`` equations of a preset, evaluated on MilkDrop's warp
+    mesh of ``meshx`` x ``meshy`` cells.
+
+    Each vertex gets ``x`` and ``y`` (0..1 from the left and top edges),
+    ``rad`` (0 at the center, 1 in the corners) and ``ang`` (radians
+    counterclockwise from the right, 0..2pi), along with the per-frame
+    values of the MESH_VARIABLES, q1..q32, ``time``, ``frame`` and the audio
+    inputs. The compiled code runs once per frame with the vertex inputs as
+    (meshy + 1, meshx + 1) arrays, so there is no loop over vertices.
+
+    ``displacement`` applies MilkDrop's warp (zoom with ``zoomexp``, stretch
+    about ``cx``/``cy``, the animated ``warp`` ripple, rotation, then
+    ``dx``/``dy``) and returns where each vertex samples the previous frame
+    from, relative to its own position, in texture units.
+    """
+
+    def __init__(
+        self,
+        preset: Preset,
+        fps: float = 60.0,
+        audio: float = 1.0,
+        meshx: int = 48,
+        meshy: int = 36,
+    ):
+        self.frames = FrameProgram(preset, fps=fps, audio=audio)
+        self.per_pixel: Optional[CompiledProgram] = None
+        self.skipped: List = []
+        for section in preset.sections:
+            if section.kind == "CPU" and section.name == "per_pixel":
+                self.per_pixel = compile_code(section.code)
+                self.skipped.extend(
+                    (section.source_line(ln), r) for ln, r in self.per_pixel.skipped
+                )
+        params = dict(WARP_PARAMS)
+        params.update((k, v) for k, v in preset.params.items() if k in WARP_PARAMS)
+        self.warp_speed = params["fWarpAnimSpeed"]
+        self.warp_scale = params["fWarpScale"]
+
+        # Vertex positions in clip space (-1..1, y up) and the per-pixel inputs
+        fx, fy = np.meshgrid(
+            np.linspace(-1, 1, meshx + 1), np.linspace(1, -1, meshy + 1)
+        )
+        self.shape = fx.shape
+        self.clip = (fx, fy)
+        self.vertex = {
+            "x": fx * 0.5 + 0.5,
+            "y": fy * -0.5 + 0.5,
+            "rad": np.hypot(fx, fy) / np.sqrt(2),
+            "ang": np.arctan2(fy, fx) % (2 * np.pi),
+        }
+        self.inputs = dict(self.frames.inputs, meshx=float(meshx), meshy=float(meshy))
+
+    def pixel_env(self, frame_env: Dict) -> Dict:
+        """Per-pixel inputs for one frame of ``FrameProgram`` output."""
+        env = dict(self.inputs)
+        for name in MESH_VARIABLES + Q_VARS + ("time", "frame"):
+            env[name] = frame_env.get(name, FRAME_VARIABLES.get(name, 0.0))
+        env.update(self.vertex)
+        return env
+
+    def displacement(self, frame_env: Dict) -> np.ndarray:
+        """
+        Runs the per-pixel code for one frame and returns its (meshy + 1,
+        meshx + 1, 2) field of (u, v) sampling offsets.
+        """
+        env = self.pixel_env(frame_env)
+        with np.errstate(all="ignore"):
+            if self.per_pixel is not None:
+                self.per_pixel.run(env)
+            return self._warp(env, frame_env.get("time", 0.0))
+
+    def _warp(self, env: Dict, time) -> np.ndarray:
+        fx, fy = self.clip
+        get = env.get
+        zoom = np.power(
+            get("zoom"), np.power(get("zoomexp"), self.vertex["rad"] * 2 - 1)
+        )
+        u = fx * get("aspectx") * 0.5 / zoom + 0.5
+        v = -fy * get("aspecty") * 0.5 / zoom + 0.5
+        cx, cy = get("cx"), get("cy")
+        u = (u - cx) / get("sx") + cx
+        v = (v - cy) / get("sy") + cy
+
+        t = time * self.warp_speed
+        scale = 1.0 / self.warp_scale
+        f0 = 11.68 + 4.0 * np.cos(t * 1.413 + 10)
+        f1 = 8.77 + 3.0 * np.cos(t * 1.113 + 7)
+        f2 = 10.54 + 3.0 * np.cos(t * 1.233 + 3)
+        f3 = 11.49 + 4.0 * np.cos(t * 0.933 + 5)
+        warp = get("warp") * WARP_AMPLITUDE
+        u = u + warp * np.sin(t * 0.333 + scale * (fx * f0 - fy * f3))
+        v = v + warp * np.cos(t * 0.375 - scale * (fx * f2 + fy * f1))
+        u = u + warp * np.cos(t * 0.753 - scale * (fx * f1 - fy * f2))
+        v = v + warp * np.sin(t * 0.825 + scale * (fx * f0 + fy * f3))
+
+        rot = get("rot")
+        cos_rot, sin_rot = np.cos(rot), np.sin(rot)
+        u, v = (
+            (u - cx) * cos_rot - (v - cy) * sin_rot + cx - get("dx"),
+            (u - cx) * sin_rot + (v - cy) * cos_rot + cy - get("dy"),
+        )
+        return np.stack(
+            (
+                np.broadcast_to(u - self.vertex["x"], self.shape),
+                np.broadcast_to(v - self.vertex["y"], self.shape),
+            ),
+            axis=-1,
+        )
+
+    def fields(self, frames, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Displacement fields for the ascending frame numbers ``frames``, as a
+        (len(frames), meshy + 1, meshx + 1, 2) float32 array; ``out`` can be
+        a reusable buffer of at least that many frames.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        env = self.frames.run(frames)
+        if out is None:
+            out = np.empty((len(frames),) + self.shape + (2,), dtype=np.float32)
+        columns = {k: v for k, v in env.items() if np.ndim(v)}
+        for i in range(len(frames)):
+            frame_env = dict(env)
+            frame_env.update((k, v[i]) for k, v in columns.items())
+            out[i] = self.displacement(frame_env)
+        return out
@@ -0,0 +1,267 @@
+"""
+vizscan.preset
+
+Structured loader for the MilkDrop ``.milk`` INI layout.
+
+A MilkDrop preset is mostly numeric header parameters (``fDecay=0.98``,
+``nVideoEchoOrientation=0``, ...). The executable parts are spread over
+numbered keys, one source line per key::
+
+    [preset00]
+    fDecay=0.980000
+    per_frame_init_1=q1 = 0;
+    per_frame_1=wave_r = 0.5 + 0.5*sin(time);
+    per_pixel_1=zoom = 1 + 0.1*rad;
+    wave_0_per_point1=r = sample;
+    shape_0_per_frame1=ang = time;
+    warp_1=`shader_body {
+    warp_2=`    ret = texture2D(sampler_main, uv).xyz;
+    warp_3=`}
+
+The loader reassembles each numbered series into one code section and records
+the original file line of every section line, so only equation and shader code
+reaches the lexer and events can still be reported against the file.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+CODE_KEY = re.compile(
+    r"^(?P<name>per_frame_init|per_frame|per_pixel"
+    r"|(?:wave|shape)_\d+_(?:init|per_frame|per_point))_?(?P<index>\d+)$"
+)
+SECTION_HEADER = re.compile(r"^\s*\[[^\]]+\]\s*$")
+
+# Shader bodies come in two encodings, matched by one alternation so a single
+# sweep over the file finds every shader of every type:
+#   quoted (hand-written):  warp_shader = "shader_body { ... }";
+#   MilkDrop 2 (INI):       warp_1=`shader_body {
+SHADER_PATTERN = re.compile(
+    r'(?P<qtype>[A-Za-z][A-Za-z0-9]*)_shader\s*=\s*"(?P<body>.*?)";'
+    r"|^[ \t]*(?P<ltype>[A-Za-z][A-Za-z0-9]*)_(?P<index>\d+)[ \t]*="
+    r"(?P<tick>`?)(?P<text>[^\r\n]*)",
+    re.DOTALL | re.MULTILINE,
+)
+
+# Numbered shader types that MilkDrop 2 writes; other types need the backtick.
+GPU_SECTIONS = {"warp", "comp"}
+
+# MilkDrop evaluation order; custom wave/shape code runs after the main loop.
+SECTION_ORDER = {"per_frame_init": 0, "per_frame": 1, "per_pixel": 2}
+
+# Sections whose q1..q32 values are passed on to the shaders ('' is a
+# whole-file legacy preset).
+Q_SOURCE_SECTIONS = {"", "per_frame_init", "per_frame"}
+
+# Sections MilkDrop re-runs every frame with the previous frame's variables.
+LOOP_SECTIONS = {"", "per_frame"}
+
+# Per-frame variables MilkDrop restores from the preset header before every
+# frame, with MilkDrop's defaults for presets that do not set them.
+FRAME_VARIABLES: Dict[str, float] = {
+    "decay": 0.98,
+    "gamma": 2.0,
+    "echo_zoom": 2.0,
+    "echo_alpha": 0.0,
+    "wave_mode": 0.0,
+    "wave_a": 0.8,
+    "wave_r": 1.0,
+    "wave_g": 1.0,
+    "wave_b": 1.0,
+    "wave_x": 0.5,
+    "wave_y": 0.5,
+    "ob_size": 0.01,
+    "ob_r": 0.0,
+    "ob_g": 0.0,
+    "ob_b": 0.0,
+    "ob_a": 0.0,
+    "ib_size": 0.01,
+    "ib_r": 0.25,
+    "ib_g": 0.25,
+    "ib_b": 0.25,
+    "ib_a": 0.0,
+    "zoom": 1.0,
+    "zoomexp": 1.0,
+    "rot": 0.0,
+    "warp": 1.0,
+    "cx": 0.5,
+    "cy": 0.5,
+    "dx": 0.0,
+    "dy": 0.0,
+    "sx": 1.0,
+    "sy": 1.0,
+}
+# INI header keys that differ from the variable they set
+HEADER_KEYS = {
+    "fDecay": "decay",
+    "fGammaAdj": "gamma",
+    "fVideoEchoZoom": "echo_zoom",
+    "fVideoEchoAlpha": "echo_alpha",
+    "nWaveMode": "wave_mode",
+    "fWaveAlpha": "wave_a",
+    "fZoomExponent": "zoomexp",
+}
+
+
+@dataclass
+class PresetSection:
+    name: str  # e.g. 'per_frame', 'wave_0_per_point', 'warp'
+    kind: str  # 'CPU' or 'GPU'
+    code: str
+    line_map: List[int] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        """Analyzer context string, e.g. 'CPU:per_frame' or 'GPU:warp'."""
+        return f"{self.kind}:{self.name}" if self.name else self.kind
+
+    def source_line(self, line: int) -> int:
+        """Maps a 1-based line within ``code`` back to the preset file."""
+        if 0 < line <= len(self.line_map):
+            return self.line_map[line - 1]
+        return line
+
+
+@dataclass
+class Preset:
+    sections: List[PresetSection] = field(default_factory=list)
+    params: Dict[str, float] = field(default_factory=dict)
+    is_ini: bool = False
+
+    def section(self, name: str) -> Optional[PresetSection]:
+        for s in self.sections:
+            if s.name == name:
+                return s
+        return None
+
+
+def _section_sort_key(section: PresetSection):
+    return (SECTION_ORDER.get(section.name, len(SECTION_ORDER)), section.name)
+
+
+def _decode_quoted(name: str, body: str, first_line: int) -> PresetSection:
+    lines: List[str] = []
+    line_map: List[int] = []
+    for offset, raw in enumerate(body.split("\n")):
+        # Escaped newlines split a file line into several shader lines
+        for part in raw.replace('\\"', '"').split("\\n"):
+            lines.append(part)
+            line_map.append(first_line + offset)
+    return PresetSection(name, "GPU", "\n".join(lines), line_map)
+
+
+def extract_shader_sections(code: str) -> List[PresetSection]:
+    """
+    Collects every shader body in one pass over ``code``, in order of first
+    appearance, with each shader line mapped to its line in the file.
+    """
+    quoted: Dict[str, PresetSection] = {}
+    numbered: Dict[str, List[Tuple[int, int, str]]] = {}
+    order: List[str] = []
+
+    line = 1
+    pos = 0
+    for m in SHADER_PATTERN.finditer(code):
+        line += code.count("\n", pos, m.start())
+        pos = m.start()
+        s_type = m.group("qtype")
+        if s_type:
+            if s_type not in quoted and s_type not in numbered:
+                quoted[s_type] = _decode_quoted(s_type, m.group("body"), line)
+                order.append(s_type)
+            continue
+        s_type = m.group("ltype")
+        if not m.group("tick") and s_type not in GPU_SECTIONS:
+            continue
+        if s_type in quoted:
+            continue
+        if s_type not in numbered:
+            numbered[s_type] = []
+            order.append(s_type)
+        numbered[s_type].append((int(m.group("index")), line, m.group("text")))
+
+    sections = []
+    for s_type in order:
+        if s_type in quoted:
+            sections.append(quoted[s_type])
+            continue
+        lines = sorted(numbered[s_type], key=lambda item: item[0])
+        sections.append(
+            PresetSection(
+                name=s_type,
+                kind="GPU",
+                code="\n".join(text for _, _, text in lines),
+                line_map=[line_no for _, line_no, _ in lines],
+            )
+        )
+    return sections
+
+
+def parse_ini(code: str) -> Optional[Preset]:
+    """
+    Parses the equation sections and header parameters of the INI layout.
+    Returns None when ``code`` is not an INI preset (no ``[presetNN]`` header
+    and no numbered equation keys). Shaders are handled separately by
+    ``extract_shader_sections``.
+    """
+    is_ini = False
+    params: Dict[str, float] = {}
+    series: Dict[str, List] = {}
+
+    for line_no, raw in enumerate(code.splitlines(), 1):
+        line = raw.strip()
+        if not line:
+            continue
+        if line[0] == "[" and SECTION_HEADER.match(line):
+            is_ini = True
+            continue
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        key = key.strip()
+        m = CODE_KEY.match(key)
+        if m:
+            is_ini = True
+            name = m.group("name")
+            series.setdefault(name, []).append((int(m.group("index")), line_no, value))
+            continue
+        if not key.isidentifier():
+            continue
+        try:
+            params[key] = float(value)
+        except ValueError:
+            pass
+
+    if not is_ini:
+        return None
+
+    sections = []
+    for name, lines in series.items():
+        lines.sort(key=lambda item: item[0])
+        sections.append(
+            PresetSection(
+                name=name,
+                kind="CPU",
+                code="\n".join(value for _, _, value in lines),
+                line_map=[line_no for _, line_no, _ in lines],
+            )
+        )
+    sections.sort(key=_section_sort_key)
+    return Preset(sections=sections, params=params, is_ini=True)
+
+
+def load_preset(code: str) -> Preset:
+    """
+    Splits a preset into analyzable code sections.
+
+    MilkDrop INI presets yield one section per equation series, with header
+    parameters collected separately. Anything else (hand-written snippets,
+    the test corpus) is analyzed as a single CPU section. Shader sections
+    follow the CPU sections in both cases.
+    """
+    preset = parse_ini(code)
+    if preset is None:
+        preset = Preset(sections=[PresetSection("", "CPU", code)])
+    preset.sections.extend(extract_shader_sections(code))
+    return preset
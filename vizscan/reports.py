@@ -13,6 +13,10 @@ class HybridReport:
     final_disposition: str = "PASS"  # PASS, WARN, FAIL
     render_stats: Dict = field(default_factory=dict)
     quality_report: Optional[QualityReport] = None
+    duplicate_of: Optional[str] = None  # Representative file when deduplicated
+    # Static proof that no two frames differ enough to flash (render skipped)
+    certified: bool = False
+    max_lum_change: Optional[float] = None  # Per-frame bound at the scan fps
 
 
 def generate_earl(reports: List[HybridReport]) -> Dict:
@@ -50,6 +54,9 @@ def generate_earl(reports: List[HybridReport]) -> Dict:
         }
         if errors:
             result["pes:errors"] = errors
+        if r.max_lum_change is not None:
+            result["pes:maxLuminanceChange"] = r.max_lum_change
+            result["pes:staticallyCertified"] = r.certified
 
         assertion = {
             "@type": "earl:Assertion",
@@ -57,6 +64,8 @@ def generate_earl(reports: List[HybridReport]) -> Dict:
             "earl:subject": {"@id": f"file://{r.filepath}"},
             "earl:result": result,
         }
+        if r.duplicate_of:
+            assertion["pes:duplicateOf"] = {"@id": f"file://{r.duplicate_of}"}
         graph.append(assertion)
 
     return {
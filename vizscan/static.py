@@ -1,9 +1,23 @@
 import os
 import re
 import enum
+import json
+import math
+import hashlib
 import argparse
-from dataclasses import dataclass, field
-from typing import List, Dict, Tuple, Optional
+import operator
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, FrozenSet, List, Dict, Tuple, Optional
+
+from .preset import (
+    FRAME_VARIABLES,
+    LOOP_SECTIONS,
+    Q_SOURCE_SECTIONS,
+    extract_shader_sections,
+    load_preset,
+)
 
 # --- UI HANDLING ---
 try:
@@ -48,6 +62,59 @@ class Reason:
     url: str
 
 
+@dataclass(frozen=True)
+class RuleMatcher:
+    """
+    Declares where a rule can fire, so analyzers only evaluate it there.
+
+    node:      'Assignment', 'FunctionCall' or 'BinaryOp', or 'FrameLoop' for
+               rules checked on each variable of the cross-frame analysis.
+    functions: FunctionCall names the rule applies to (empty = any call).
+    ops:       operator of a BinaryOp, or of an Assignment's right-hand
+               BinaryOp (empty = any).
+    targets:   Assignment target variables (None = any target).
+    triggers:  Source words/operators at least one of which must appear for
+               the rule to fire, when the check needs more than the node
+               keys above (e.g. a 'tan' that may reach the target through
+               variables). Declared triggers are assumed to carry over into
+               later CPU sections; derived ones must appear in the section.
+    check:     check(analyzer, node, state) -> context string if the rule
+               fires, else None. ``state`` is the TaintState of the first
+               argument (FunctionCall), the assigned expression (Assignment)
+               or the operation result (BinaryOp). FrameLoop checks get the
+               variable's last Assignment and its LoopBehavior.
+    """
+
+    node: str
+    check: Callable
+    functions: FrozenSet[str] = frozenset()
+    ops: FrozenSet[str] = frozenset()
+    targets: Optional[FrozenSet[str]] = None
+    triggers: Optional[FrozenSet[str]] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "functions", frozenset(self.functions))
+        object.__setattr__(self, "ops", frozenset(self.ops))
+        if self.targets is not None:
+            object.__setattr__(self, "targets", frozenset(self.targets))
+        if self.triggers is not None:
+            object.__setattr__(self, "triggers", frozenset(self.triggers))
+
+    def node_triggers(self) -> Optional[FrozenSet[str]]:
+        """Source text the matched node itself must contain (None = unknown)."""
+        if self.node == "FunctionCall":
+            return self.functions or None
+        if self.node == "BinaryOp":
+            return self.ops or None
+        if self.node == "Assignment":
+            return self.ops or self.targets or None
+        if self.node == "FrameLoop":
+            # Loop rules also fire on state carried between frames, which
+            # TriggerPrefilter.may_carry finds without a trigger
+            return frozenset({"frame"}) | self.functions | self.ops
+        return None
+
+
 @dataclass
 class RuleDefinition:
     id: str
@@ -56,16 +123,32 @@ class RuleDefinition:
     base_score: int
     level: RiskLevel
     reasons: List[Reason] = field(default_factory=list)
+    matcher: Optional[RuleMatcher] = None
 
 
 class SafetyRegistry:
     def __init__(self):
         self.rules = {}
+        self.version = 0  # Bumped on every change; invalidates derived tables
+        self._index = None
 
-    def register(self, r_id, name, desc, score, level, reasons=None):
+    def register(self, r_id, name, desc, score, level, reasons=None, matcher=None):
         if reasons is None:
             reasons = []
-        self.rules[r_id] = RuleDefinition(r_id, name, desc, score, level, reasons)
+        self.rules[r_id] = RuleDefinition(
+            r_id, name, desc, score, level, reasons, matcher
+        )
+        self.version += 1
+
+    def unregister(self, r_id):
+        if self.rules.pop(r_id, None) is not None:
+            self.version += 1
+
+    def index(self) -> "RuleIndex":
+        """Matcher index for the current rule set, rebuilt when rules change."""
+        if self._index is None or self._index.version != self.version:
+            self._index = RuleIndex(self)
+        return self._index
 
     def create_event(self, rule_id, context, line, vars, src_type="CPU"):
         if rule_id not in self.rules:
@@ -73,6 +156,11 @@ class SafetyRegistry:
         r = self.rules[rule_id]
         return RiskEvent(rule_id, r.level, r.base_score, context, line, vars, src_type)
 
+    def fingerprint(self) -> str:
+        """Stable digest of the registered rules, for cache invalidation."""
+        payload = json.dumps(self.export_ontology(), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
     def export_ontology(self):
         return [
             {
@@ -89,6 +177,205 @@ class SafetyRegistry:
         ]
 
 
+class RuleIndex:
+    """
+    Rules with matchers, keyed by the node property each one cares about
+    (function name, operator, assignment target). Analyzers look a node's
+    keys up here instead of testing every rule against every node.
+    """
+
+    def __init__(self, registry: SafetyRegistry):
+        self.version = registry.version
+        self.order: Dict[str, int] = {}
+        self.calls: Dict[str, List[RuleDefinition]] = {}
+        self.calls_any: List[RuleDefinition] = []
+        self.binops: Dict[str, List[RuleDefinition]] = {}
+        self.binops_any: List[RuleDefinition] = []
+        self.assign_ops: Dict[str, List[RuleDefinition]] = {}
+        self.assign_targets: Dict[str, List[RuleDefinition]] = {}
+        self.assign_any: List[RuleDefinition] = []
+        self.loops: List[RuleDefinition] = []
+
+        for position, rule in enumerate(registry.rules.values()):
+            m = rule.matcher
+            if m is None:
+                continue
+            self.order[rule.id] = position
+            if m.node == "FunctionCall":
+                self._add(self.calls, self.calls_any, m.functions, rule)
+            elif m.node == "BinaryOp":
+                self._add(self.binops, self.binops_any, m.ops, rule)
+            elif m.node == "Assignment":
+                if m.ops:
+                    # Target restrictions are re-checked in assignment_rules
+                    self._add(self.assign_ops, None, m.ops, rule)
+                elif m.targets is not None:
+                    self._add(self.assign_targets, None, m.targets, rule)
+                else:
+                    self.assign_any.append(rule)
+            elif m.node == "FrameLoop":
+                self.loops.append(rule)
+
+    @staticmethod
+    def _add(table, any_list, keys, rule):
+        if not keys:
+            any_list.append(rule)
+        for key in keys:
+            table.setdefault(key, []).append(rule)
+
+    def _merge(self, *groups):
+        rules = [r for group in groups for r in group]
+        if len(rules) > 1:
+            rules.sort(key=lambda r: self.order[r.id])
+        return rules
+
+    def call_rules(self, name: str):
+        rules = self.calls.get(name, ())
+        return self._merge(rules, self.calls_any) if self.calls_any else rules
+
+    def binop_rules(self, op: str):
+        rules = self.binops.get(op, ())
+        return self._merge(rules, self.binops_any) if self.binops_any else rules
+
+    def assignment_rules(self, target: str, op: Optional[str]):
+        by_op = [
+            r
+            for r in self.assign_ops.get(op, ())
+            if r.matcher.targets is None or target in r.matcher.targets
+        ]
+        by_target = self.assign_targets.get(target, ())
+        if not by_op and not self.assign_any:
+            return by_target
+        return self._merge(by_op, by_target, self.assign_any)
+
+
+# Variables whose values drive on-screen color / geometry
+COLOR_VARS = {
+    "ob_r",
+    "ob_g",
+    "ob_b",
+    "wave_r",
+    "wave_g",
+    "wave_b",
+    "gl_FragColor",
+    "ret",
+}
+MOTION_VARS = {"rot", "zoom", "warp", "cx", "cy", "dx", "dy", "sx", "sy"}
+# Other per-frame variables that change what reaches the screen: alphas and
+# sizes of the borders, waveform and motion vectors, feedback and echo
+LUMINANCE_VARS = {
+    "ob_a",
+    "ob_size",
+    "ib_r",
+    "ib_g",
+    "ib_b",
+    "ib_a",
+    "ib_size",
+    "mv_r",
+    "mv_g",
+    "mv_b",
+    "mv_a",
+    "mv_x",
+    "mv_y",
+    "mv_l",
+    "wave_a",
+    "wave_mode",
+    "decay",
+    "gamma",
+    "echo_zoom",
+    "echo_alpha",
+    "echo_orient",
+    "zoomexp",
+}
+# Colors of custom waves and shapes (wave_N_* and shape_N_* sections)
+CUSTOM_COLOR_VARS = {
+    "r",
+    "g",
+    "b",
+    "a",
+    "r2",
+    "g2",
+    "b2",
+    "a2",
+    "border_r",
+    "border_g",
+    "border_b",
+    "border_a",
+}
+
+# MilkDrop's nominal frame rate, used to turn per-frame changes into Hz
+NOMINAL_FPS = 60
+# 3 flashes (6 opposing transitions) per second (WCAG 2.1, ITU-R BT.1702)
+MAX_TRANSITIONS_PER_SEC = 6
+
+
+# --- Built-in rule matchers ---
+
+
+def _check_inverter_strobe(analyzer, node, state):
+    # Inverter Strobe: x = 1 - x
+    # Creates a guaranteed 30Hz strobe (at 60fps).
+    # Cite ITU-R BT.1702 regarding rapid alternating light/dark frames
+    # exceeding the safe flash threshold.
+    right = node.expr.right
+    if type(right) is Identifier and right.name == node.target:
+        return f"{node.target} = 1 - {node.target}"
+    return None
+
+
+def _check_frame_modulo(analyzer, node, state):
+    # Frame Modulo
+    # Creates rapid flickering.
+    # Cite ITU-R BT.1702 and WCAG 2.1 General Flash Threshold (exceeds 3Hz).
+    # Matched on the operation itself, so 'ob_r = 0.5 + frame % 2' fires too.
+    # The divisor is a literal, so the result only depends on time (or frame)
+    # through the left operand; 'i % 2' on a plain value is index arithmetic.
+    right = node.right
+    if type(right) is Literal and right.value < 4 and state.is_time_dep:
+        return f"Modulo {right.value}"
+    return None
+
+
+def _check_high_freq_osc(analyzer, node, state):
+    # HighFreqOsc: 18 rad/s is ~2.86 Hz, approaching the 3Hz limit.
+    # Cite WCAG 2.1 General Flash Threshold and ITU-R BT.1702.
+    if state.freq > 18.0:
+        return f"{node.name}(freq={state.freq:.1f})"
+    return None
+
+
+def _check_tan_target(analyzer, node, state):
+    # Tan Color: Tangent functions approach infinity, causing sudden, extreme
+    # high-contrast whiteouts.
+    # Cite ITU-R BT.1702 regarding high-contrast luminance transitions and WCAG 2.1.
+    # Tan Motion: Causes extreme, sudden spatial jumps.
+    # Cite ITU-R BT.1702 regarding provocative spatial patterns and disorientation.
+    if state.source == "tan":
+        return f"Tan -> {node.target}"
+    return None
+
+
+def _check_step_function(analyzer, node, state):
+    # StepFunction: Creates instant on/off hard edges in time, leading to
+    # infinite-contrast flashes.
+    # Cite ITU-R BT.1702 regarding high-contrast luminance transitions.
+    if state.is_time_dep:
+        return f"{node.name}() on time"
+    return None
+
+
+def _check_frame_toggle(analysis, node, behavior):
+    # Frame Toggle: a variable cycling through values every few frames
+    # (x = 1 - x, x = bnot(x), c = c + 1; x = c % 2, ...).
+    # Cite ITU-R BT.1702 and WCAG 2.1 General Flash Threshold (exceeds 3Hz).
+    if behavior.transitions_per_sec > MAX_TRANSITIONS_PER_SEC:
+        return (
+            f"{node.target} cycles every {behavior.period} frames "
+            f"({behavior.transitions_per_sec:.0f} changes/s at {NOMINAL_FPS}fps)"
+        )
+    return None
+
+
 REGISTRY = SafetyRegistry()
 REGISTRY.register(
     "InverterStrobe",
@@ -98,10 +385,14 @@ REGISTRY.register(
     RiskLevel.BAN,
     reasons=[
         Reason(
-            name="ITU-R BT.1702 (rapid alternating light/dark frames exceeding safe flash threshold)",
+            name=(
+                "ITU-R BT.1702 (rapid alternating light/dark frames exceeding"
+                " safe flash threshold)"
+            ),
             url="https://www.itu.int/rec/R-REC-BT.1702/en",
         )
     ],
+    matcher=RuleMatcher("Assignment", _check_inverter_strobe, ops={"-"}),
 )
 REGISTRY.register(
     "FrameModulo",
@@ -116,6 +407,7 @@ REGISTRY.register(
             url="https://www.w3.org/TR/WCAG21/#three-flashes-or-below-threshold",
         ),
     ],
+    matcher=RuleMatcher("BinaryOp", _check_frame_modulo, ops={"%"}),
 )
 REGISTRY.register(
     "HighFreqOsc",
@@ -130,6 +422,7 @@ REGISTRY.register(
             url="https://www.w3.org/TR/WCAG21/#three-flashes-or-below-threshold",
         ),
     ],
+    matcher=RuleMatcher("FunctionCall", _check_high_freq_osc, functions={"sin", "cos"}),
 )
 REGISTRY.register(
     "TanColor",
@@ -143,6 +436,9 @@ REGISTRY.register(
             url="https://www.itu.int/rec/R-REC-BT.1702/en",
         )
     ],
+    matcher=RuleMatcher(
+        "Assignment", _check_tan_target, targets=COLOR_VARS, triggers={"tan"}
+    ),
 )
 REGISTRY.register(
     "TanMotion",
@@ -156,6 +452,9 @@ REGISTRY.register(
             url="https://www.itu.int/rec/R-REC-BT.1702/en",
         )
     ],
+    matcher=RuleMatcher(
+        "Assignment", _check_tan_target, targets=MOTION_VARS, triggers={"tan"}
+    ),
 )
 REGISTRY.register(
     "StepFunction",
@@ -169,6 +468,54 @@ REGISTRY.register(
             url="https://www.itu.int/rec/R-REC-BT.1702/en",
         )
     ],
+    matcher=RuleMatcher(
+        "FunctionCall",
+        _check_step_function,
+        functions={"step", "fract", "ceil", "floor"},
+    ),
+)
+REGISTRY.register(
+    "FrameToggle",
+    "Frame Toggle",
+    "Per-frame state cycling faster than 3Hz",
+    100,
+    RiskLevel.CRITICAL,
+    reasons=[
+        Reason(name="ITU-R BT.1702", url="https://www.itu.int/rec/R-REC-BT.1702/en"),
+        Reason(
+            name="WCAG 2.1 General Flash Threshold (>3Hz)",
+            url="https://www.w3.org/TR/WCAG21/#three-flashes-or-below-threshold",
+        ),
+    ],
+    # Any carried variable can cycle ('t = a; a = b; b = t;'), so the
+    # prefilter keeps every loop section that carries state or reads frame
+    matcher=RuleMatcher("FrameLoop", _check_frame_toggle),
+)
+# Raised by the dynamic phase (vizscan.dynamic.RedFlashDetector)
+REGISTRY.register(
+    "DynamicRedFlash",
+    "Red Flash",
+    "Saturated red flashing more than 3 times per second",
+    100,
+    RiskLevel.CRITICAL,
+    reasons=[
+        Reason(
+            name="WCAG 2.1 Red Flash Threshold",
+            url="https://www.w3.org/TR/WCAG21/#dfn-red-flash-threshold",
+        ),
+        Reason(name="ITU-R BT.1702", url="https://www.itu.int/rec/R-REC-BT.1702/en"),
+    ],
+)
+
+REGISTRY.register(
+    "DynamicPattern",
+    "Harmful Pattern",
+    "High-contrast regular pattern (stripes, grids, rings) with too many pairs",
+    100,
+    RiskLevel.CRITICAL,
+    reasons=[
+        Reason(name="ITU-R BT.1702", url="https://www.itu.int/rec/R-REC-BT.1702/en"),
+    ],
 )
 
 # ==========================================
@@ -227,14 +574,109 @@ class MemberAccess(Node):
     member: str  # For GLSL swizzling (col.rgb)
 
 
+@dataclass(frozen=True, slots=True)
+class FunctionDef(Node):
+    name: str  # GLSL helper, e.g. 'float3 pulse(float t) { ... }'
+    params: List[str]
+    body: Block
+
+
+@dataclass(frozen=True, slots=True)
+class Return(Node):
+    expr: Optional[Node]
+
+
+class NodeInterner:
+    """
+    Hash-conses expression nodes: structurally identical subtrees share one
+    canonical instance, regardless of which line or file they came from.
+
+    Children are interned before their parents, so a node's identity key only
+    needs the ids of its (canonical) children and is O(1) to build. A shared
+    node has no single source line, so interned nodes carry line 0; analyzers
+    report expression events at the line of the enclosing statement.
+    """
+
+    def __init__(self, maxsize=262144):
+        self.maxsize = maxsize
+        self.table: "OrderedDict[tuple, Node]" = OrderedDict()
+        # id(canonical node) -> sorted names of the identifiers it reads
+        self.free_vars: Dict[int, Tuple[str, ...]] = {}
+        # id(canonical node) -> names of the functions it calls (if any)
+        self.calls: Dict[int, FrozenSet[str]] = {}
+
+    def intern(self, cls, *fields):
+        key = (cls,) + tuple(_intern_key(f) for f in fields)
+        node = self.table.get(key)
+        if node is not None:
+            self.table.move_to_end(key)
+            return node
+        node = cls(0, *fields)
+        self.table[key] = node
+        self.free_vars[id(node)] = self._collect_free_vars(node)
+        calls = self._collect_calls(node)
+        if calls:
+            self.calls[id(node)] = calls
+        if len(self.table) > self.maxsize:
+            _, old = self.table.popitem(last=False)
+            self.free_vars.pop(id(old), None)
+            self.calls.pop(id(old), None)
+        return node
+
+    def _collect_calls(self, node) -> FrozenSet[str]:
+        if isinstance(node, BinaryOp):
+            return self.calls.get(id(node.left), frozenset()) | self.calls.get(
+                id(node.right), frozenset()
+            )
+        if isinstance(node, FunctionCall):
+            names = {node.name}
+            for arg in node.args:
+                names.update(self.calls.get(id(arg), ()))
+            return frozenset(names)
+        if isinstance(node, MemberAccess):
+            return self.calls.get(id(node.expr), frozenset())
+        return frozenset()
+
+    def _collect_free_vars(self, node) -> Tuple[str, ...]:
+        known = self.free_vars.get(id(node))
+        if known is not None:
+            return known
+        if isinstance(node, Identifier):
+            return (node.name,)
+        if isinstance(node, BinaryOp):
+            children = [node.left, node.right]
+        elif isinstance(node, FunctionCall):
+            children = node.args
+        elif isinstance(node, MemberAccess):
+            children = [node.expr]
+        else:
+            return ()
+        names = set()
+        for child in children:
+            names.update(self._collect_free_vars(child))
+        return tuple(sorted(names))
+
+
+def _intern_key(value):
+    if isinstance(value, Node):
+        return id(value)
+    if isinstance(value, list):
+        return tuple(_intern_key(v) for v in value)
+    return value
+
+
+INTERNER = NodeInterner()
+
+
 # ==========================================
 # 3. LEXER (Updated for C-Style Syntax)
 # ==========================================
 
 TOKEN_TYPES = [
     ("COMMENT", r"//.*|/\*[\s\S]*?\*/"),
-    ("NUMBER", r"\d+(\.\d*)?"),
-    ("TYPE", r"\b(float|int|vec2|vec3|vec4|float2|float3|float4)\b"),  # GLSL/HLSL Types
+    ("NUMBER", r"\d+(?:\.\d*)?"),
+    # GLSL/HLSL Types
+    ("TYPE", r"\b(?:void|float|int|vec2|vec3|vec4|float2|float3|float4)\b"),
     ("ID", r"[a-zA-Z_][a-zA-Z0-9_]*"),
     ("ASSIGN", r"="),
     ("OP", r"[+\-*/%^]"),
@@ -258,6 +700,83 @@ class Token:
     line: int
 
 
+# Small-integer token type codes (index into TOKEN_TYPES)
+TOKEN_NAMES = [name for name, _ in TOKEN_TYPES]
+TOKEN_CODES = {name: code for code, name in enumerate(TOKEN_NAMES)}
+T_EOF = -1
+T_NUMBER = TOKEN_CODES["NUMBER"]
+T_TYPE = TOKEN_CODES["TYPE"]
+T_ID = TOKEN_CODES["ID"]
+T_ASSIGN = TOKEN_CODES["ASSIGN"]
+T_OP = TOKEN_CODES["OP"]
+T_LPAREN = TOKEN_CODES["LPAREN"]
+T_RPAREN = TOKEN_CODES["RPAREN"]
+T_LBRACE = TOKEN_CODES["LBRACE"]
+T_RBRACE = TOKEN_CODES["RBRACE"]
+T_DOT = TOKEN_CODES["DOT"]
+T_COMMA = TOKEN_CODES["COMMA"]
+T_SEMICOLON = TOKEN_CODES["SEMICOLON"]
+T_SKIP = TOKEN_CODES["SKIP"]
+T_COMMENT = TOKEN_CODES["COMMENT"]
+T_NEWLINE = TOKEN_CODES["NEWLINE"]
+
+# All token patterns joined into one alternation. Alternatives are tried in
+# TOKEN_TYPES order at each position, exactly like trying each pattern in turn,
+# but the regex engine does it in a single compiled pass. The patterns have no
+# capturing groups of their own, so match.lastindex - 1 is the token code.
+MASTER_PATTERN = re.compile(
+    "|".join(f"(?P<{name}>{regex})" for name, regex in TOKEN_TYPES)
+)
+
+
+class TokenStream:
+    """
+    Compact columnar token storage.
+
+    Each token is a type code plus start/end offsets into ``source`` and a
+    line number, held in parallel ``array`` columns instead of one object per
+    token. Text is only sliced out when asked for. Indexing or iterating
+    yields ``Token`` views for callers that want the object API.
+    """
+
+    __slots__ = ("source", "types", "starts", "ends", "lines")
+
+    def __init__(self, source: str = ""):
+        self.source = source
+        self.types = array("b")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.lines = array("i")
+
+    @classmethod
+    def from_tokens(cls, tokens: List[Token]) -> "TokenStream":
+        stream = cls()
+        parts = []
+        offset = 0
+        for t in tokens:
+            parts.append(t.value)
+            stream.types.append(TOKEN_CODES[t.type])
+            stream.starts.append(offset)
+            offset += len(t.value)
+            stream.ends.append(offset)
+            stream.lines.append(t.line)
+        stream.source = "".join(parts)
+        return stream
+
+    def __len__(self):
+        return len(self.types)
+
+    def text(self, i: int) -> str:
+        return self.source[self.starts[i] : self.ends[i]]
+
+    def __getitem__(self, i: int) -> Token:
+        return Token(TOKEN_NAMES[self.types[i]], self.text(i), self.lines[i])
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
+
 class MilkLexer:
     def __init__(self, code):
         self.code = code
@@ -265,23 +784,28 @@ class MilkLexer:
         self.tokens = []
         self.pos = 0
 
+    def tokenize_stream(self) -> TokenStream:
+        stream = TokenStream(self.code)
+        add_type = stream.types.append
+        add_start = stream.starts.append
+        add_end = stream.ends.append
+        add_line = stream.lines.append
+        line_num = self.line_num
+        for match in MASTER_PATTERN.finditer(self.code):
+            code = match.lastindex - 1
+            if code == T_NEWLINE:
+                line_num += 1
+            elif code != T_SKIP and code != T_COMMENT:
+                add_type(code)
+                add_start(match.start())
+                add_end(match.end())
+                add_line(line_num)
+        self.line_num = line_num
+        self.pos = len(self.code)
+        return stream
+
     def tokenize(self):
-        pos = 0
-        while pos < len(self.code):
-            match = None
-            for token_type, regex in TOKEN_TYPES:
-                pattern = re.compile(regex)
-                match = pattern.match(self.code, pos)
-                if match:
-                    text = match.group(0)
-                    if token_type == "NEWLINE":
-                        self.line_num += 1
-                    elif token_type != "SKIP" and token_type != "COMMENT":
-                        self.tokens.append(Token(token_type, text, self.line_num))
-                    pos = match.end()
-                    break
-            if not match:  # pragma: no cover
-                pos += 1  # Skip mismatch
+        self.tokens.extend(self.tokenize_stream())
         return self.tokens
 
 
@@ -289,14 +813,33 @@ class MilkLexer:
 # 4. PARSER
 # ==========================================
 
+BINARY_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2, "%": 2, "^": 3}
+
 
 class MilkParser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, interner: Optional[NodeInterner] = None):
+        if not isinstance(tokens, TokenStream):
+            tokens = TokenStream.from_tokens(tokens)
         self.tokens = tokens
+        self.types = tokens.types
+        self.lines = tokens.lines
+        self.count = len(tokens)
         self.pos = 0
+        self.interner = INTERNER if interner is None else interner
+
+    def kind(self) -> int:
+        """Type code of the current token, or T_EOF."""
+        return self.types[self.pos] if self.pos < self.count else T_EOF
+
+    def accept(self, code: int) -> bool:
+        """Advances past the current token if it has type ``code``."""
+        if self.pos < self.count and self.types[self.pos] == code:
+            self.pos += 1
+            return True
+        return False
 
     def consume(self, expected_type=None):
-        if self.pos < len(self.tokens):
+        if self.pos < self.count:
             token = self.tokens[self.pos]
             if expected_type and token.type != expected_type:  # pragma: no cover
                 return None  # pragma: no cover
@@ -305,11 +848,11 @@ class MilkParser:
         return None
 
     def peek(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        return self.tokens[self.pos] if self.pos < self.count else None
 
     def parse(self):
         statements = []
-        while self.pos < len(self.tokens):
+        while self.pos < self.count:
             stmt = self.parse_statement()
             if stmt:
                 statements.append(stmt)
@@ -318,124 +861,159 @@ class MilkParser:
         return Program(line=1, statements=statements)
 
     def parse_statement(self):
-        token = self.peek()
-        if not token:
+        kind = self.kind()
+        if kind == T_EOF:
             return None
 
-        if token.type == "LBRACE":
+        if kind == T_LBRACE:
             return self.parse_block()
 
-        if token.type == "TYPE":
+        line = self.lines[self.pos]
+        if kind == T_TYPE:
             # float x = ...;
-            self.consume()  # type
-            target = self.consume("ID")
-            if not target:
+            self.pos += 1  # type
+            if self.kind() != T_ID:
                 return None
+            target = self.tokens.text(self.pos)
+            self.pos += 1
+            if self.kind() == T_LPAREN:
+                return self.parse_function(line, target)
 
-            expr = Literal(token.line, 0)
-            peek_token = self.peek()
-            if peek_token and peek_token.type == "ASSIGN":
-                self.consume("ASSIGN")
+            expr = self.interner.intern(Literal, 0)
+            if self.accept(T_ASSIGN):
                 expr = self.parse_expression()
 
-            self.consume("SEMICOLON")
-            return Assignment(token.line, target.value, expr, is_decl=True)
+            self.accept(T_SEMICOLON)
+            return Assignment(line, target, expr, is_decl=True)
 
-        if token.type == "ID":
+        if kind == T_ID:
             # x = ...;
-            target = self.consume("ID")
-            peek_token = self.peek()
-            if target and peek_token and peek_token.type == "ASSIGN":
-                self.consume("ASSIGN")
+            target = self.tokens.text(self.pos)
+            self.pos += 1
+            if target == "return":
+                expr = None
+                if self.kind() != T_SEMICOLON:
+                    expr = self.parse_expression()
+                self.accept(T_SEMICOLON)
+                return Return(line, expr)
+            if self.accept(T_ASSIGN):
                 expr = self.parse_expression()
-                self.consume("SEMICOLON")
-                return Assignment(token.line, target.value, expr)
+                self.accept(T_SEMICOLON)
+                return Assignment(line, target, expr)
             # Function call as statement? or just expression
             # For now assume assignment is main statement type
 
         return None
 
+    def parse_function(self, line, name):
+        # 'float3 pulse(in float t, float k) { ... }': the last identifier of
+        # each comma-separated parameter is its name (qualifiers come first)
+        self.pos += 1  # (
+        params = []
+        param = None
+        while True:
+            kind = self.kind()
+            if kind == T_EOF or kind == T_RPAREN or kind == T_COMMA:
+                if param is not None:
+                    params.append(param)
+                param = None
+                if kind != T_COMMA:
+                    break
+            elif kind == T_ID:
+                param = self.tokens.text(self.pos)
+            self.pos += 1
+        self.accept(T_RPAREN)
+        if self.kind() != T_LBRACE:
+            self.accept(T_SEMICOLON)  # Prototype
+            return Block(line, [])
+        return FunctionDef(line, name, params, self.parse_block())
+
     def parse_block(self):
-        token = self.consume("LBRACE")
-        if not token:
+        if self.kind() != T_LBRACE:
             return None
+        line = self.lines[self.pos]
+        self.pos += 1
         stmts = []
         while True:
-            peek_token = self.peek()
-            if not peek_token or peek_token.type == "RBRACE":  # pragma: no cover
+            kind = self.kind()
+            if kind == T_EOF or kind == T_RBRACE:  # pragma: no cover
                 break  # pragma: no cover
             s = self.parse_statement()
             if s:
                 stmts.append(s)
             else:
                 self.pos += 1
-        self.consume("RBRACE")
-        return Block(token.line, stmts)
+        self.accept(T_RBRACE)
+        return Block(line, stmts)
 
-    def parse_expression(self):
+    def parse_expression(self, min_precedence=1):
         left = self.parse_term()
-        while True:
-            peek_token = self.peek()
-            if not peek_token or peek_token.type != "OP":
+        # Precedence climbing: '*' binds tighter than '+', '^' is right-assoc
+        while self.kind() == T_OP:
+            op = self.tokens.text(self.pos)
+            precedence = BINARY_PRECEDENCE[op]
+            if precedence < min_precedence:
                 break
-            op_token = self.consume("OP")
-            op = op_token.value if op_token else ""
-            right = self.parse_term()
-            left = BinaryOp(left.line, left, op, right)
+            self.pos += 1
+            right = self.parse_expression(precedence if op == "^" else precedence + 1)
+            left = self.interner.intern(BinaryOp, left, op, right)
         return left
 
     def parse_term(self):
-        token = self.peek()
-        if not token:
-            return Literal(0, 0)
-
-        if token.type == "NUMBER":
-            num_token = self.consume()
-            val = float(num_token.value) if num_token else 0.0
-            return Literal(token.line, val)
-
-        if token.type == "ID":
-            id_token = self.consume()
-            name = id_token.value if id_token else ""
-            peek_token = self.peek()
-            if peek_token and peek_token.type == "LPAREN":
+        kind = self.kind()
+        if kind == T_EOF:
+            return self.interner.intern(Literal, 0)
+
+        if kind == T_NUMBER:
+            val = float(self.tokens.text(self.pos))
+            self.pos += 1
+            return self.interner.intern(Literal, val)
+
+        if kind == T_ID:
+            name = self.tokens.text(self.pos)
+            self.pos += 1
+            if self.accept(T_LPAREN):
                 # Function Call or Constructor
-                self.consume("LPAREN")
                 args = self.parse_arg_list()
-                self.consume("RPAREN")
-                return FunctionCall(token.line, name, args)
+                self.accept(T_RPAREN)
+                return self.interner.intern(FunctionCall, name, args)
 
             # Swizzling check
-            node = Identifier(token.line, name)
-            while True:
-                peek_token = self.peek()
-                if not peek_token or peek_token.type != "DOT":
-                    break
-                self.consume("DOT")
-                member = self.consume("ID")
-                if member:
-                    node = MemberAccess(token.line, node, member.value)
+            node = self.interner.intern(Identifier, name)
+            while self.accept(T_DOT):
+                if self.kind() == T_ID:
+                    member = self.tokens.text(self.pos)
+                    self.pos += 1
+                    node = self.interner.intern(MemberAccess, node, member)
             return node
 
-        if token.type == "LPAREN":
-            self.consume()
+        if kind == T_LPAREN:
+            self.pos += 1
             expr = self.parse_expression()
-            self.consume("RPAREN")
+            self.accept(T_RPAREN)
             return expr
 
-        self.consume()
-        return Literal(token.line, 0)
+        if kind == T_OP and self.tokens.text(self.pos) in ("-", "+"):
+            # Unary sign; '-x' becomes '-1 * x' so it is never read as '0 - x'
+            negate = self.tokens.text(self.pos) == "-"
+            self.pos += 1
+            operand = self.parse_term()
+            if not negate:
+                return operand
+            if type(operand) is Literal:
+                return self.interner.intern(Literal, -operand.value)
+            minus_one = self.interner.intern(Literal, -1.0)
+            return self.interner.intern(BinaryOp, minus_one, "*", operand)
+
+        self.pos += 1
+        return self.interner.intern(Literal, 0)
 
     def parse_arg_list(self):
         args = []
-        peek_token = self.peek()
-        if peek_token and peek_token.type != "RPAREN":
+        kind = self.kind()
+        if kind != T_EOF and kind != T_RPAREN:
             args.append(self.parse_expression())
-            while True:
-                peek_token = self.peek()
-                if not peek_token or peek_token.type != "COMMA":
-                    break
-                self.consume("COMMA")
+            while self.accept(T_COMMA):
                 args.append(self.parse_expression())
         return args
 
@@ -445,180 +1023,616 @@ class MilkParser:
 # ==========================================
 
 
-@dataclass
+@dataclass(frozen=True)
 class TaintState:
     is_time_dep: bool = False
     freq: float = 0.0
     hard_edge: bool = False
     source: str = ""
+    value: Optional[float] = None  # Known constant value, if any
+
+
+class TaintMemo:
+    """
+    Process-wide LRU memo of expression taint results.
+
+    Keys are (canonical node id, taints of the identifiers the subtree reads);
+    values hold the resulting TaintState and the events emitted while
+    computing it, with lines stored relative to the subtree root so they can
+    be replayed at any occurrence. The table is cleared whenever REGISTRY
+    changes.
+    """
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.registry_version = REGISTRY.version
+
+    def get(self, key):
+        if self.registry_version != REGISTRY.version:
+            self.clear()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.registry_version = REGISTRY.version
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+TAINT_MEMO = TaintMemo()
+
+# Shared immutable states for the common cases; visitors return these instead
+# of allocating a fresh TaintState per literal/identifier.
+UNTAINTED = TaintState()
+TIME_TAINT = TaintState(is_time_dep=True, freq=1.0)
+FRAME_TAINT = TaintState(is_time_dep=True, freq=float(NOMINAL_FPS), hard_edge=True)
+TAN_TAINT = TaintState(is_time_dep=True, hard_edge=True, source="tan")
+HARD_EDGE_TAINTS = {
+    name: TaintState(is_time_dep=True, hard_edge=True, source=name)
+    for name in ("step", "fract", "ceil", "floor")
+}
+
+
+def _nsel_div(a, b):
+    return a / b if b else 0.0  # NSEL defines x/0 as 0
+
+
+def _nsel_mod(a, b):
+    return float(int(a) % int(b)) if int(b) else 0.0
+
+
+# Constant folding tables; a fold that raises leaves the value unknown.
+FOLD_OPS: Dict[str, Callable] = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": _nsel_div,
+    "%": _nsel_mod,
+    "^": math.pow,
+}
+FOLD_FUNCS: Dict[str, Callable] = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "abs": abs,
+    "sqrt": math.sqrt,
+    "sqr": lambda x: x * x,
+    "exp": math.exp,
+    "log": math.log,
+    "pow": math.pow,
+    "min": min,
+    "max": max,
+    # NSEL comparisons and logic (1.0 = true)
+    "above": lambda a, b: float(a > b),
+    "below": lambda a, b: float(a < b),
+    "equal": lambda a, b: float(a == b),
+    "bnot": lambda x: float(x == 0),
+    "band": lambda a, b: float(bool(a) and bool(b)),
+    "bor": lambda a, b: float(bool(a) or bool(b)),
+    "if": lambda c, a, b: a if c else b,
+    "sign": lambda x: float((x > 0) - (x < 0)),
+    "int": lambda x: float(int(x)),
+    "floor": lambda x: float(math.floor(x)),
+    "ceil": lambda x: float(math.ceil(x)),
+    "fract": lambda x: x - math.floor(x),
+    "step": lambda edge, x: float(x >= edge),
+}
+
+
+_CONSTANT_TAINTS: Dict[float, TaintState] = {}
+
+
+def constant_taint(value) -> TaintState:
+    if value is None or not math.isfinite(value):
+        return UNTAINTED
+    state = _CONSTANT_TAINTS.get(value)
+    if state is None:
+        if len(_CONSTANT_TAINTS) >= 4096:
+            _CONSTANT_TAINTS.clear()
+        state = _CONSTANT_TAINTS[value] = TaintState(value=value)
+    return state
+
+
+def fold(func, *values) -> Optional[float]:
+    try:
+        return float(func(*values))
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+
+
+def join_taints(states) -> TaintState:
+    """Least upper bound of several states (e.g. the lanes of a vector)."""
+    states = list(states)
+    if not any(s.is_time_dep or s.hard_edge for s in states):
+        return UNTAINTED
+    sources = {s.source for s in states if s.is_time_dep}
+    return TaintState(
+        is_time_dep=any(s.is_time_dep for s in states),
+        freq=max(s.freq for s in states),
+        hard_edge=any(s.hard_edge for s in states),
+        source=sources.pop() if len(sources) == 1 else "",
+    )
+
+
+# MilkDrop's q1..q32 carry per-frame values into the shaders, which can also
+# read them four at a time as _qa (q1..q4) through _qh (q29..q32).
+Q_VARS = tuple(f"q{i}" for i in range(1, 33))
+Q_VECTORS = {f"_q{chr(ord('a') + i)}": Q_VARS[4 * i : 4 * i + 4] for i in range(8)}
 
 
 class SafetyAnalyzer:
-    COLOR_VARS = {
-        "ob_r",
-        "ob_g",
-        "ob_b",
-        "wave_r",
-        "wave_g",
-        "wave_b",
-        "gl_FragColor",
-        "ret",
-    }
-    MOTION_VARS = {"rot", "zoom", "warp", "cx", "cy", "dx", "dy", "sx", "sy"}
+    COLOR_VARS = COLOR_VARS
+    MOTION_VARS = MOTION_VARS
 
-    def __init__(self, context="CPU"):
+    def __init__(self, context="CPU", memo: Optional[TaintMemo] = None):
         self.events = []
         self.context = context
+        self.memo = TAINT_MEMO if memo is None else memo
+        self.rules = REGISTRY.index()
+        # Line of the statement being analyzed. Interned expressions are
+        # shared between occurrences, so their events are reported here.
+        self.line = 0
         self.symbols = {}
-        self.symbols["time"] = TaintState(is_time_dep=True, freq=1.0)
-        self.symbols["frame"] = TaintState(is_time_dep=True, hard_edge=True)
+        self.symbols["time"] = TIME_TAINT
+        self.symbols["frame"] = FRAME_TAINT
+        # User-defined (GLSL) functions: name -> (definition, scope it sees)
+        self.functions: Dict[str, Tuple[FunctionDef, Dict]] = {}
+        # (function name, definition id, argument taints) -> return taint
+        self.summaries: Dict[tuple, TaintState] = {}
+        self.returns: Optional[List[TaintState]] = None
+        # Set while FrameLoop replays one concrete frame at a time
+        self.single_frame = False
 
     def get_taint(self, name):
-        return self.symbols.get(name, TaintState())
+        return self.symbols.get(name, UNTAINTED)
+
+    def apply_rules(self, rules, node, state, line, variables):
+        for rule in rules:
+            context = rule.matcher.check(self, node, state)
+            if context is not None:
+                self.events.append(
+                    REGISTRY.create_event(
+                        rule.id, context, line, variables, self.context
+                    )
+                )
 
     def analyze(self, node):
-        if isinstance(node, Program) or isinstance(node, Block):
-            for stmt in node.statements:
-                self.analyze(stmt)
-        elif isinstance(node, Assignment):
-            self.visit_Assignment(node)
-        # Expressions are visited via assignments
+        AnalysisPipeline(self).run(node)
 
     def visit(self, node):
-        if isinstance(node, Literal):
-            return TaintState()
-        if isinstance(node, Identifier):
-            return self.get_taint(node.name)
-        if isinstance(node, BinaryOp):
-            left_node = self.visit(node.left)
-            right_node = self.visit(node.right)
+        kind = type(node)
+        if kind is BinaryOp or kind is FunctionCall:
+            free_vars = INTERNER.free_vars.get(id(node))
+            if free_vars is not None and not (
+                # The shared memo cannot know which helper a name refers to
+                self.functions
+                and not self.functions.keys().isdisjoint(
+                    INTERNER.calls.get(id(node), ())
+                )
+            ):
+                return self.visit_memoized(node, free_vars)
+        return self.visit_node(node)
+
+    def visit_memoized(self, node, free_vars):
+        key = (id(node), tuple(self.get_taint(name) for name in free_vars))
+        entry = self.memo.get(key)
+        if entry is not None:
+            _, state, events = entry
+            for rule_id, context, variables in events:
+                self.events.append(
+                    REGISTRY.create_event(
+                        rule_id, context, self.line, list(variables), self.context
+                    )
+                )
+            return state
 
-            freq = max(left_node.freq, right_node.freq)
+        start = len(self.events)
+        state = self.visit_node(node)
+        events = tuple(
+            (e.rule_id, e.context, tuple(e.variables)) for e in self.events[start:]
+        )
+        # The entry holds the node so its id cannot be reused while cached
+        self.memo.put(key, (node, state, events))
+        return state
+
+    def visit_node(self, node):
+        visitor = self.EXPR_VISITORS.get(type(node))
+        if visitor is None:
+            return UNTAINTED
+        return visitor(self, node)
+
+    def shader_inputs(self) -> Dict[str, TaintState]:
+        """q1..q32 (and their vector aliases) as the shaders will see them."""
+        inputs = {name: self.symbols[name] for name in Q_VARS if name in self.symbols}
+        for vector, names in Q_VECTORS.items():
+            lanes = [inputs.get(name, UNTAINTED) for name in names]
+            if any(lane is not UNTAINTED for lane in lanes):
+                inputs[vector] = join_taints(lanes)
+        return inputs
+
+    def visit_Literal(self, node):
+        return constant_taint(node.value)
+
+    def visit_Identifier(self, node):
+        return self.get_taint(node.name)
+
+    def visit_BinaryOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if left.value is not None and right.value is not None:
+            state = constant_taint(fold(FOLD_OPS[node.op], left.value, right.value))
+        elif not (left.is_time_dep or left.hard_edge) and not (
+            right.is_time_dep or right.hard_edge
+        ):
+            state = UNTAINTED
+        else:
+            # Frequencies scale with constant factors: time*k, k*time, time/k
+            freq = max(left.freq, right.freq)
             if node.op == "*":
-                # Check for time * constant
-                if left_node.is_time_dep and isinstance(node.right, Literal):
-                    freq = left_node.freq * node.right.value
-                elif right_node.is_time_dep and isinstance(node.left, Literal):
-                    freq = right_node.freq * node.left.value
-
-            return TaintState(
-                is_time_dep=left_node.is_time_dep or right_node.is_time_dep,
+                if left.is_time_dep and right.value is not None:
+                    freq = left.freq * abs(right.value)
+                elif right.is_time_dep and left.value is not None:
+                    freq = right.freq * abs(left.value)
+            elif node.op == "/" and left.is_time_dep and right.value:
+                freq = left.freq / abs(right.value)
+
+            state = TaintState(
+                is_time_dep=left.is_time_dep or right.is_time_dep,
                 freq=freq,
-                hard_edge=left_node.hard_edge or right_node.hard_edge,
+                hard_edge=left.hard_edge or right.hard_edge,
             )
-        if isinstance(node, FunctionCall):
-            args = [self.visit(a) for a in node.args]
-            primary = args[0] if args else TaintState()
-
-            if node.name in ["sin", "cos"]:
-                if primary.freq > 18.0:
-                    # HighFreqOsc: 18 rad/s is ~2.86 Hz, approaching the 3Hz limit.
-                    # Cite WCAG 2.1 General Flash Threshold and ITU-R BT.1702.
-                    self.events.append(
-                        REGISTRY.create_event(
-                            "HighFreqOsc",
-                            f"{node.name}(freq={primary.freq:.1f})",
-                            node.line,
-                            [node.name],
-                            self.context,
-                        )
-                    )
-                return TaintState(is_time_dep=True, freq=primary.freq)
 
-            if node.name == "tan":
-                return TaintState(is_time_dep=True, hard_edge=True, source="tan")
+        rules = self.rules.binop_rules(node.op)
+        if rules:
+            self.apply_rules(rules, node, state, self.line, [node.op])
+        return state
+
+    def visit_FunctionCall(self, node):
+        args = [self.visit(a) for a in node.args]
+        definition = self.functions.get(node.name)
+        if definition is not None:
+            return self.call_function(definition, args)
+        primary = args[0] if args else UNTAINTED
+
+        rules = self.rules.call_rules(node.name)
+        if rules:
+            self.apply_rules(rules, node, primary, self.line, [node.name])
+
+        func = FOLD_FUNCS.get(node.name)
+        if func is not None and args and all(a.value is not None for a in args):
+            return constant_taint(fold(func, *(a.value for a in args)))
+
+        if node.name in ["sin", "cos"]:
+            return TaintState(is_time_dep=True, freq=primary.freq)
+
+        if node.name == "tan":
+            return TAN_TAINT
+
+        if node.name in HARD_EDGE_TAINTS:
+            return HARD_EDGE_TAINTS[node.name]
+
+        if primary.value is not None:
+            # Not folded: the result is not the argument's value
+            return replace(primary, value=None)
+        return primary
+
+    def visit_MemberAccess(self, node):
+        return self.visit(node.expr)
+
+    # Type-keyed expression dispatch (replaces an isinstance ladder)
+    EXPR_VISITORS = {
+        Literal: visit_Literal,
+        Identifier: visit_Identifier,
+        BinaryOp: visit_BinaryOp,
+        FunctionCall: visit_FunctionCall,
+        MemberAccess: visit_MemberAccess,
+    }
 
-            if node.name in ["step", "fract", "ceil", "floor"]:
-                if primary.is_time_dep:
-                    # StepFunction: Creates instant on/off hard edges in time, leading to infinite-contrast flashes.
-                    # Cite ITU-R BT.1702 regarding high-contrast luminance transitions.
-                    self.events.append(
-                        REGISTRY.create_event(
-                            "StepFunction",
-                            f"{node.name}() on time",
-                            node.line,
-                            [node.name],
-                            self.context,
-                        )
-                    )
-                return TaintState(is_time_dep=True, hard_edge=True, source=node.name)
+    def call_function(self, definition, args: List[TaintState]) -> TaintState:
+        """
+        Applies the taint summary of a user-defined function. The body is
+        analyzed once per distinct tuple of argument taints; its events are
+        reported (at the body's lines) the first time, and later calls with the
+        same taints only reuse the return taint.
+        """
+        func, scope = definition
+        key = (func.name, id(func), tuple(args))
+        summary = self.summaries.get(key)
+        if summary is not None:
+            return summary
+        # Placeholder for (illegal) recursion
+        self.summaries[key] = args[0] if args else UNTAINTED
+
+        saved = self.symbols, self.line, self.returns
+        self.symbols = dict(scope)
+        self.symbols.update(zip(func.params, args))
+        self.returns = []
+        AnalysisPipeline(self).run(func.body)
+        returns = self.returns
+        self.symbols, self.line, self.returns = saved
+
+        if not returns:
+            summary = UNTAINTED
+        elif len(returns) == 1:
+            summary = returns[0]
+        else:
+            summary = join_taints(returns)
+        self.summaries[key] = summary
+        return summary
 
-            return primary
+    def visit_FunctionDef(self, node):
+        # GLSL helpers only see the globals declared before them
+        self.functions[node.name] = (node, dict(self.symbols))
 
-        if isinstance(node, MemberAccess):
-            return self.visit(node.expr)
-
-        return TaintState()
+    def visit_Return(self, node):
+        if node.expr is None or self.returns is None:
+            return
+        self.line = node.line
+        self.returns.append(self.visit(node.expr))
 
     def visit_Assignment(self, node):
+        self.line = node.line
         expr_state = self.visit(node.expr)
 
-        # Inverter Strobe: x = 1 - x
-        # Creates a guaranteed 30Hz strobe (at 60fps).
-        # Cite ITU-R BT.1702 regarding rapid alternating light/dark frames exceeding the safe flash threshold.
-        if isinstance(node.expr, BinaryOp) and node.expr.op == "-":
-            # Check if right side is the target variable
-            if (
-                isinstance(node.expr.right, Identifier)
-                and node.expr.right.name == node.target
-            ):
-                self.events.append(
-                    REGISTRY.create_event(
-                        "InverterStrobe",
-                        f"{node.target} = 1 - {node.target}",
-                        node.line,
-                        [node.target],
-                        self.context,
-                    )
-                )
+        # Rules are looked up by target and right-hand operator (see RuleIndex)
+        op = node.expr.op if type(node.expr) is BinaryOp else None
+        rules = self.rules.assignment_rules(node.target, op)
+        if rules:
+            self.apply_rules(rules, node, expr_state, node.line, [node.target])
+
+        if (
+            expr_state.value is not None
+            and not self.single_frame
+            and node.target in INTERNER.free_vars.get(id(node.expr), ())
+        ):
+            # 'k = k + 1' re-runs every frame, so k is not a constant
+            expr_state = replace(expr_state, value=None)
+        self.symbols[node.target] = expr_state
+        return expr_state
 
-        # Frame Modulo
-        # Creates rapid flickering.
-        # Cite ITU-R BT.1702 and WCAG 2.1 General Flash Threshold (exceeds 3Hz).
-        if isinstance(node.expr, BinaryOp) and node.expr.op == "%":
-            if isinstance(node.expr.right, Literal) and node.expr.right.value < 4:
-                self.events.append(
-                    REGISTRY.create_event(
-                        "FrameModulo",
-                        f"Modulo {node.expr.right.value}",
-                        node.line,
-                        [node.target],
-                        self.context,
-                    )
-                )
 
-        # Tan Color
-        # Tangent functions approach infinity, causing sudden, extreme high-contrast whiteouts.
-        # Cite ITU-R BT.1702 regarding high-contrast luminance transitions and WCAG 2.1.
-        if node.target in self.COLOR_VARS:
-            if expr_state.source == "tan":
-                self.events.append(
-                    REGISTRY.create_event(
-                        "TanColor",
-                        f"Tan -> {node.target}",
-                        node.line,
-                        [node.target],
-                        self.context,
+@dataclass(frozen=True)
+class LoopBehavior:
+    period: int  # Frames per cycle
+    transitions: int  # Value changes per cycle
+    values: Tuple[float, ...]  # One cycle
+
+    @property
+    def transitions_per_sec(self) -> float:
+        return self.transitions * NOMINAL_FPS / self.period
+
+
+def _statement_reads(node) -> Tuple[str, ...]:
+    free_vars = INTERNER.free_vars.get(id(node))
+    if free_vars is not None:
+        return free_vars
+    if type(node) is Identifier:
+        return (node.name,)
+    if type(node) is MemberAccess:
+        return _statement_reads(node.expr)
+    return ()
+
+
+def _assignments(node):
+    kind = type(node)
+    if kind is Program or kind is Block:
+        for stmt in node.statements:
+            yield from _assignments(stmt)
+    elif kind is Assignment:
+        yield node
+
+
+# MilkDrop restores the header variables and q1..q32 before every frame
+RESTORED_VARIABLES = frozenset(FRAME_VARIABLES).union(Q_VARS)
+
+
+def carried_variables(program) -> List[str]:
+    """
+    User variables that per-frame code reads before assigning them, and so
+    keeps from the previous frame. RESTORED_VARIABLES never carry.
+    """
+    assigned = set()
+    exposed = set()
+    for stmt in _assignments(program):
+        exposed.update(n for n in _statement_reads(stmt.expr) if n not in assigned)
+        assigned.add(stmt.target)
+    return sorted((exposed & assigned) - RESTORED_VARIABLES)
+
+
+def _find_period(values, max_period) -> Optional[int]:
+    """Smallest period that repeats at least twice over ``values``."""
+    for period in range(1, min(max_period, len(values) // 2) + 1):
+        if all(values[i] == values[i + period] for i in range(len(values) - period)):
+            return period
+    return None
+
+
+LOOP_OUTPUTS = COLOR_VARS | MOTION_VARS
+
+
+class FrameLoop:
+    """
+    Cross-frame dataflow over code that MilkDrop re-runs every frame.
+
+    A user variable read before it is assigned in the loop body carries its
+    value from the previous frame (see ``carried_variables``); the header
+    variables and q1..q32 are restored every frame and never carry. Starting
+    from the state left by the init code (unassigned variables are 0, as in
+    NSEL), the body is replayed concretely on constant states frame after
+    frame, with ``frame`` bound to the frame number when the body reads it.
+    Replay stops when the carried state repeats (an exact cycle) or after
+    MAX_FRAMES frames.
+
+    This concrete replay stands in for an abstract worklist fixpoint with
+    widening. It is exact for the constant-initialized state per-frame code
+    usually has, but it costs up to MAX_FRAMES passes over the section for
+    every section that carries state or reads ``frame``, and it misses cycles
+    that do not repeat within MAX_FRAMES frames (or MAX_PERIOD frames when
+    the code reads ``frame``). Those variables are only widened below, so the
+    other rules see them as time-dependent but FrameToggle does not fire.
+
+    Every assigned variable that settles into a periodic sequence of constants
+    gets a LoopBehavior, which is passed to the registered FrameLoop rules.
+    Carried variables that keep changing are widened for the real pass over
+    the section: cycles and constant-step counters become hard-edged like
+    ``frame``, anything else a generic time-dependent value.
+    """
+
+    MAX_FRAMES = 96
+    MAX_PERIOD = 24
+
+    def __init__(
+        self,
+        program,
+        symbols: Dict[str, TaintState],
+        params: Optional[Dict[str, float]] = None,
+    ):
+        self.program = program
+        self.symbols = symbols
+        self.params = params or {}
+        self.statements = list(_assignments(program))
+        self.carried = carried_variables(program)
+        self.reads_frame = any(
+            "frame" in _statement_reads(stmt.expr) for stmt in self.statements
+        )
+        self.behaviors: Dict[str, LoopBehavior] = {}
+        self.entry: Dict[str, TaintState] = {}
+
+    def initial_state(self, name: str) -> TaintState:
+        if name in self.symbols:
+            return self.symbols[name]
+        return constant_taint(self.params.get(name, 0.0))
+
+    def run(self):
+        """Fills ``behaviors`` and the widened ``entry`` states."""
+        if not self.carried and not self.reads_frame:
+            return self
+
+        scratch = SafetyAnalyzer(memo=TaintMemo(maxsize=1024))
+        scratch.single_frame = True
+        pipeline = AnalysisPipeline(scratch)
+        state = {name: self.initial_state(name) for name in self.carried}
+        targets = sorted({stmt.target for stmt in self.statements})
+        history: Dict[str, List[TaintState]] = {name: [] for name in targets}
+        seen: Dict[tuple, int] = {}
+        cycle_start = None
+
+        for n in range(self.MAX_FRAMES):
+            key = tuple(state[name] for name in self.carried)
+            if not self.reads_frame:
+                if key in seen:
+                    cycle_start = seen[key]
+                    break
+                seen[key] = n
+            scratch.symbols = dict(self.symbols)
+            scratch.symbols.update(state)
+            if self.reads_frame:
+                scratch.symbols["frame"] = constant_taint(float(n))
+            pipeline.run(self.program)
+            for name in targets:
+                history[name].append(scratch.symbols.get(name, UNTAINTED))
+            state = {name: scratch.symbols[name] for name in self.carried}
+
+        for name in targets:
+            values = [t.value for t in history[name]]
+            if cycle_start is not None:
+                cycle = values[cycle_start:]
+                if None in cycle:
+                    continue
+                period = _find_period(cycle + cycle, len(cycle))
+            else:
+                # Skip the transient; a cycle must repeat in the second half
+                cycle = values[len(values) // 2 :]
+                if None in cycle:
+                    continue
+                period = _find_period(cycle, self.MAX_PERIOD)
+            if period is None or period < 2:
+                continue
+            one = tuple(cycle[:period])
+            changes = sum(one[i] != one[(i + 1) % period] for i in range(period))
+            self.behaviors[name] = LoopBehavior(period, changes, one)
+
+        for name in self.carried:
+            states = history[name]
+            if all(s == states[-1] for s in states):
+                continue  # Never changes
+            values = [s.value for s in states]
+            if name in self.behaviors:
+                self.entry[name] = TaintState(is_time_dep=True, hard_edge=True)
+            elif len(values) > 2 and None not in values[-3:]:
+                step = values[-1] - values[-2]
+                if step and values[-2] - values[-3] == step:
+                    # Counter: advances by a fixed step each frame, like 'frame'
+                    self.entry[name] = TaintState(
+                        is_time_dep=True,
+                        freq=abs(step) * NOMINAL_FPS,
+                        hard_edge=True,
                     )
-                )
-
-        # Tan Motion
-        # Causes extreme, sudden spatial jumps.
-        # Cite ITU-R BT.1702 regarding provocative spatial patterns and disorientation.
-        if node.target in self.MOTION_VARS:
-            if expr_state.source == "tan":
-                self.events.append(
-                    REGISTRY.create_event(
-                        "TanMotion",
-                        f"Tan -> {node.target}",
-                        node.line,
-                        [node.target],
-                        self.context,
+                else:
+                    self.entry[name] = TaintState(is_time_dep=True)
+            else:
+                widened = join_taints(states)
+                if widened is UNTAINTED or widened.value is not None:
+                    continue
+                self.entry[name] = widened
+        return self
+
+    def report(self, analyzer: "SafetyAnalyzer", start: int = 0):
+        """
+        Checks the FrameLoop rules against the periodic variables, raising
+        one event per cycle. Events from ``start`` on are the ones raised by
+        the pass over this loop.
+        """
+        rules = analyzer.rules.loops
+        if not rules or not self.behaviors:
+            return
+        # Report what reaches the screen; helper state only if nothing does
+        names = [n for n in sorted(self.behaviors) if n in LOOP_OUTPUTS]
+        if not names:
+            names = [n for n in self.carried if n in self.behaviors]
+        # A cycle already flagged in this pass (e.g. by InverterStrobe)
+        flagged = {
+            self.behaviors[v].period
+            for e in analyzer.events[start:]
+            for v in e.variables
+            if v in self.behaviors
+        }
+        last = {stmt.target: stmt for stmt in self.statements}
+        for name in names:
+            behavior = self.behaviors[name]
+            if behavior.period in flagged:
+                continue
+            node = last[name]
+            for rule in rules:
+                context = rule.matcher.check(self, node, behavior)
+                if context is not None:
+                    analyzer.events.append(
+                        REGISTRY.create_event(
+                            rule.id, context, node.line, [name], analyzer.context
+                        )
                     )
-                )
-
-        self.symbols[node.target] = expr_state
-        return expr_state
+                    # Variables driven by the same cycle share its period
+                    flagged.add(behavior.period)
 
 
 # ==========================================
@@ -635,21 +1649,26 @@ class QualityReport:
 
 
 class QualityAnalyzer:
+    BACKGROUND_VARS = frozenset({"ob_r", "ob_g", "ob_b"})
+
     def __init__(self):
         self.bg_color: Dict[str, Optional[float]] = {"r": None, "g": None, "b": None}
         self.is_dynamic_bg = False
         self.assignments = {}
 
+    def load_params(self, params: Dict[str, float]):
+        # Numeric header values (e.g. 'ob_r=0.0') set the initial colors
+        for channel in ("r", "g", "b"):
+            value = params.get(f"ob_{channel}")
+            if value is not None:
+                self.bg_color[channel] = value
+
     def analyze(self, node):
-        if isinstance(node, Program) or isinstance(node, Block):
-            for stmt in node.statements:
-                self.analyze(stmt)
-        elif isinstance(node, Assignment):
-            self.visit_Assignment(node)
+        AnalysisPipeline(self).run(node)
 
     def visit_Assignment(self, node):
         # Track background color (ob_r, ob_g, ob_b)
-        if node.target in ["ob_r", "ob_g", "ob_b"]:
+        if node.target in self.BACKGROUND_VARS:
             if isinstance(node.expr, Literal):
                 self.bg_color[node.target[-1]] = node.expr.value
             else:
@@ -689,20 +1708,502 @@ class QualityAnalyzer:
 
 
 # ==========================================
-# 7. SCANNER ORCHESTRATION
+# 7. LUMINANCE BOUNDS
 # ==========================================
 
+INF = float("inf")
 
-def extract_shaders(milk_code: str) -> Dict[str, str]:
-    shaders = {}
-    for shader_type in ["warp", "comp"]:
-        pattern = re.compile(f'{shader_type}_shader\\s*=\\s*"(.*?)";', re.DOTALL)
-        match = pattern.search(milk_code)
-        if match:
-            shaders[shader_type] = (
-                match.group(1).replace('\\"', '"').replace("\\n", "\n")
+
+def _mul(a: float, b: float) -> float:
+    # 0 * inf is 0 here: a constant factor of zero removes any growth
+    return 0.0 if a == 0 or b == 0 else a * b
+
+
+@dataclass(frozen=True)
+class ValueBound:
+    """
+    Interval [lo, hi] of a value over the whole run, with Lipschitz bounds on
+    how fast it can change: ``rate`` per second of ``time`` and ``step`` per
+    ``frame``. Between two frames the value moves by at most
+    ``rate / fps + step``.
+    """
+
+    lo: float = -INF
+    hi: float = INF
+    rate: float = INF
+    step: float = INF
+
+    @property
+    def magnitude(self) -> float:
+        return max(abs(self.lo), abs(self.hi))
+
+    @property
+    def constant(self) -> Optional[float]:
+        if self.lo == self.hi and self.rate == 0 and self.step == 0:
+            return self.lo
+        return None
+
+    def max_change(self, fps: int) -> float:
+        return self.rate / fps + self.step
+
+    def hull(self, other: "ValueBound") -> "ValueBound":
+        return ValueBound(
+            min(self.lo, other.lo),
+            max(self.hi, other.hi),
+            max(self.rate, other.rate),
+            max(self.step, other.step),
+        )
+
+
+UNBOUNDED = ValueBound()
+
+
+def const_bound(value: Optional[float]) -> ValueBound:
+    if value is None or not math.isfinite(value):
+        return UNBOUNDED
+    return ValueBound(value, value, 0.0, 0.0)
+
+
+def _add_bounds(a: ValueBound, b: ValueBound) -> ValueBound:
+    return ValueBound(a.lo + b.lo, a.hi + b.hi, a.rate + b.rate, a.step + b.step)
+
+
+def _neg_bound(a: ValueBound) -> ValueBound:
+    return ValueBound(-a.hi, -a.lo, a.rate, a.step)
+
+
+def _mul_bounds(a: ValueBound, b: ValueBound) -> ValueBound:
+    corners = [_mul(x, y) for x in (a.lo, a.hi) for y in (b.lo, b.hi)]
+    # Product rule: |(ab)'| <= |a'| max|b| + max|a| |b'|
+    return ValueBound(
+        min(corners),
+        max(corners),
+        _mul(a.rate, b.magnitude) + _mul(a.magnitude, b.rate),
+        _mul(a.step, b.magnitude) + _mul(a.magnitude, b.step),
+    )
+
+
+def _reciprocal_bound(b: ValueBound) -> ValueBound:
+    if b.lo <= 0 <= b.hi:
+        return UNBOUNDED
+    least = min(abs(b.lo), abs(b.hi))
+    # |(1/b)'| = |b'| / b^2
+    return ValueBound(
+        1 / b.hi,
+        1 / b.lo,
+        _mul(b.rate, 1 / least**2),
+        _mul(b.step, 1 / least**2),
+    )
+
+
+def _abs_bound(a: ValueBound) -> ValueBound:
+    if a.lo >= 0:
+        return a
+    if a.hi <= 0:
+        return _neg_bound(a)
+    return ValueBound(0.0, a.magnitude, a.rate, a.step)
+
+
+def _periodic_bound(a: ValueBound) -> ValueBound:
+    # sin/cos are 1-Lipschitz and stay within [-1, 1]
+    return ValueBound(-1.0, 1.0, a.rate, a.step)
+
+
+def _sqr_bound(a: ValueBound) -> ValueBound:
+    m = a.magnitude
+    lo = 0.0 if a.lo <= 0 <= a.hi else min(a.lo**2, a.hi**2)
+    return ValueBound(lo, m * m, _mul(2 * m, a.rate), _mul(2 * m, a.step))
+
+
+def _min_bound(*args: ValueBound) -> ValueBound:
+    return ValueBound(
+        min(a.lo for a in args),
+        min(a.hi for a in args),
+        max(a.rate for a in args),
+        max(a.step for a in args),
+    )
+
+
+def _max_bound(*args: ValueBound) -> ValueBound:
+    return ValueBound(
+        max(a.lo for a in args),
+        max(a.hi for a in args),
+        max(a.rate for a in args),
+        max(a.step for a in args),
+    )
+
+
+def _hull_bound(*args: ValueBound) -> ValueBound:
+    result = args[0]
+    for a in args[1:]:
+        result = result.hull(a)
+    return result
+
+
+BOUND_FUNCS: Dict[str, Callable] = {
+    "sin": _periodic_bound,
+    "cos": _periodic_bound,
+    "abs": _abs_bound,
+    "sqr": _sqr_bound,
+    "min": _min_bound,
+    "max": _max_bound,
+    # Vector constructors: bound every lane
+    **{
+        name: _hull_bound
+        for name in ("vec2", "vec3", "vec4", "float2", "float3", "float4")
+    },
+}
+BOUND_FUNC_ARITY = {"sin": 1, "cos": 1, "abs": 1, "sqr": 1}
+
+# Inputs whose range and speed are known; anything else (audio levels,
+# textures, variables kept from the previous frame) is unbounded.
+BOUND_INPUTS = {
+    "time": ValueBound(0.0, INF, 1.0, 0.0),
+    "frame": ValueBound(0.0, INF, 0.0, 1.0),
+    # Per-pixel mesh coordinates do not change over time
+    "x": ValueBound(0.0, 1.0, 0.0, 0.0),
+    "y": ValueBound(0.0, 1.0, 0.0, 0.0),
+    "rad": ValueBound(0.0, math.sqrt(2), 0.0, 0.0),
+    "ang": ValueBound(-math.pi, math.pi, 0.0, 0.0),
+}
+
+
+class LuminanceBoundAnalyzer:
+    """
+    Abstract interpretation of everything that affects luminance as
+    functions of ``time`` and ``frame``.
+
+    Every assignment is evaluated in the ValueBound domain; header parameters
+    are constants. The outputs are the colors (``COLOR_VARS``), the other
+    visible state (``LUMINANCE_VARS``, ``MOTION_VARS``), the colors of custom
+    waves and shapes in their sections, and every ``per_pixel`` assignment.
+    The hull over all output assignments bounds how much the screen, and so
+    luminance, can move between two frames. Hard edges (step, fract, %,
+    tan ...), audio inputs and anything else not understood are unbounded,
+    so a finite result is a proof, not an estimate.
+    """
+
+    OUTPUTS = frozenset(COLOR_VARS | LUMINANCE_VARS | MOTION_VARS)
+    CUSTOM_OUTPUTS = OUTPUTS | CUSTOM_COLOR_VARS
+    # Outputs in luminance units (0..1 colors and alphas), whose change
+    # bounds the change they make on screen. The others (motion, sizes,
+    # feedback, gamma) move the image in ways a luminance bound cannot see.
+    LUMINANCE_OUTPUTS = frozenset(
+        COLOR_VARS
+        | CUSTOM_COLOR_VARS
+        | {"ob_a", "ib_r", "ib_g", "ib_b", "ib_a", "mv_r", "mv_g", "mv_b", "mv_a"}
+        | {"wave_a", "echo_alpha"}
+    )
+
+    def __init__(self, params: Optional[Dict[str, float]] = None):
+        self.params = params or {}
+        self.env: Dict[str, ValueBound] = {}
+        self.outputs: Dict[str, ValueBound] = {}
+        self.section = ""
+
+    @classmethod
+    def section_outputs(cls, name: str) -> Optional[FrozenSet[str]]:
+        """Output variables of section ``name``; None when all of them are."""
+        if name == "per_pixel":
+            return None
+        if name.startswith(("wave_", "shape_")):
+            return cls.CUSTOM_OUTPUTS
+        return cls.OUTPUTS
+
+    def enter_section(self, name: str):
+        # per_frame_init runs once; apart from q1..q32, which MilkDrop
+        # restores every frame, its variables may have changed by the time
+        # per_frame (or custom wave and shape code) reads them again.
+        self.section = name
+        if name == "per_frame" or name.startswith(("wave_", "shape_")):
+            self.env = {k: v for k, v in self.env.items() if k in Q_VARS}
+
+    def shader_inputs(self) -> Dict[str, ValueBound]:
+        inputs = {name: self.env[name] for name in Q_VARS if name in self.env}
+        for vector, names in Q_VECTORS.items():
+            if all(name in inputs for name in names):
+                inputs[vector] = _hull_bound(*(inputs[name] for name in names))
+        return inputs
+
+    def bound(self, node) -> ValueBound:
+        visitor = self.BOUND_VISITORS.get(type(node))
+        if visitor is None:
+            return UNBOUNDED
+        return visitor(self, node)
+
+    def bound_Literal(self, node):
+        return const_bound(node.value)
+
+    def bound_Identifier(self, node):
+        name = node.name
+        if name in self.env:
+            return self.env[name]
+        if name in BOUND_INPUTS:
+            return BOUND_INPUTS[name]
+        if name in self.params:
+            return const_bound(self.params[name])
+        return UNBOUNDED
+
+    def bound_MemberAccess(self, node):
+        return self.bound(node.expr)
+
+    def bound_BinaryOp(self, node):
+        a = self.bound(node.left)
+        b = self.bound(node.right)
+        if a.constant is not None and b.constant is not None:
+            return const_bound(fold(FOLD_OPS[node.op], a.constant, b.constant))
+        if node.op == "+":
+            return _add_bounds(a, b)
+        if node.op == "-":
+            return _add_bounds(a, _neg_bound(b))
+        if node.op == "*":
+            return _mul_bounds(a, b)
+        if node.op == "/":
+            return _mul_bounds(a, _reciprocal_bound(b))
+        return UNBOUNDED  # '%' and '^' can jump
+
+    def bound_FunctionCall(self, node):
+        if not node.args:
+            return UNBOUNDED
+        args = [self.bound(a) for a in node.args]
+        values = [a.constant for a in args]
+        func = FOLD_FUNCS.get(node.name)
+        if func is not None and None not in values:
+            return const_bound(fold(func, *values))
+        bound_func = BOUND_FUNCS.get(node.name)
+        arity = BOUND_FUNC_ARITY.get(node.name)
+        if bound_func is None or (arity is not None and len(args) != arity):
+            return UNBOUNDED
+        return bound_func(*args)
+
+    BOUND_VISITORS = {
+        Literal: bound_Literal,
+        Identifier: bound_Identifier,
+        MemberAccess: bound_MemberAccess,
+        BinaryOp: bound_BinaryOp,
+        FunctionCall: bound_FunctionCall,
+    }
+
+    def visit_Assignment(self, node):
+        value = self.bound(node.expr)
+        self.env[node.target] = value
+        outputs = self.section_outputs(self.section)
+        if outputs is None or node.target in outputs:
+            previous = self.outputs.get(node.target)
+            self.outputs[node.target] = (
+                value if previous is None else previous.hull(value)
             )
-    return shaders
+
+
+# ==========================================
+# 8. ANALYSIS PIPELINE
+# ==========================================
+
+STATEMENT_TYPES = (Assignment, FunctionDef, Return)
+
+
+class AnalysisPipeline:
+    """
+    Runs several analyzers over an AST in a single traversal.
+
+    Each analyzer registers by defining ``visit_<StatementType>`` methods
+    (e.g. ``visit_Assignment``). The pipeline builds a type-keyed dispatch
+    table once, then walks the tree and hands every statement to each
+    interested analyzer, so adding an analyzer adds no extra walk.
+    """
+
+    def __init__(self, *analyzers):
+        self.analyzers = analyzers
+        self.handlers: Dict[type, list] = {}
+        for node_type in STATEMENT_TYPES:
+            for analyzer in analyzers:
+                handler = getattr(analyzer, f"visit_{node_type.__name__}", None)
+                if handler is not None:
+                    self.handlers.setdefault(node_type, []).append(handler)
+
+    def run(self, node):
+        kind = type(node)
+        if kind is Program or kind is Block:
+            for stmt in node.statements:
+                self.run(stmt)
+            return
+        for handler in self.handlers.get(kind, ()):
+            handler(node)
+
+
+# ==========================================
+# 9. TRIGGER PREFILTER
+# ==========================================
+
+
+class TriggerPrefilter:
+    """
+    Skips sections that cannot raise any event.
+
+    Every rule needs some source text to fire: the function it matches
+    ('sin', 'fract', ...), the operator ('-', '%'), the assignment target, or
+    the triggers declared on its matcher. These are compiled, together with
+    the background variables the quality analyzer reads, into one pattern
+    that is run once over the raw preset. Sections without a match are
+    neither lexed nor parsed.
+
+    FrameLoop rules can fire on any per-frame section that carries a
+    variable from the previous frame, whatever its text, so with such a rule
+    registered those sections (``may_carry``) always count as able to fire.
+
+    CPU sections share a symbol table, so they are kept as a prefix: every
+    CPU section up to the last one that can fire is analyzed, and once a
+    declared (carried) trigger such as 'tan' has been seen all later CPU
+    sections count as able to fire. GPU sections are analyzed independently.
+    """
+
+    ASSIGNED = re.compile(r"\s*([A-Za-z_]\w*)\s*=(?!=)")
+    WORD = re.compile(r"\b[A-Za-z_]\w*\b")
+
+    def __init__(self, registry: SafetyRegistry):
+        self.registry = registry
+        self.version = None
+        self.pattern: Optional[re.Pattern] = None
+        self.loop_rules = False
+        self.files = 0
+        self.files_skipped = 0
+        self.sections = 0
+        self.sections_skipped = 0
+
+    @staticmethod
+    def _alternation(triggers):
+        parts = []
+        for t in sorted(triggers, key=lambda t: (-len(t), t)):
+            if t.isidentifier():
+                parts.append(rf"\b{t}\b")
+            elif t == "/":
+                parts.append(r"(?<![/*])/(?![/*])")  # Not a comment delimiter
+            else:
+                parts.append(re.escape(t))
+        return "|".join(parts)
+
+    def compile(self) -> Optional[re.Pattern]:
+        """Trigger pattern for the current rules, or None if a rule has none."""
+        if self.version == self.registry.version:
+            return self.pattern
+        local = set(QualityAnalyzer.BACKGROUND_VARS)
+        carried = set()
+        self.pattern = None
+        self.loop_rules = False
+        for rule in self.registry.rules.values():
+            m = rule.matcher
+            if m is None:
+                continue
+            self.loop_rules = self.loop_rules or m.node == "FrameLoop"
+            if m.triggers is not None:
+                carried |= m.triggers
+                continue
+            keys = m.node_triggers()
+            if keys is None:
+                # Could fire on any node: nothing can be skipped
+                self.version = self.registry.version
+                return None
+            local |= keys
+        groups = [f"(?P<local>{self._alternation(local)})"]
+        if carried:
+            groups.append(f"(?P<carried>{self._alternation(carried)})")
+        self.pattern = re.compile("|".join(groups))
+        self.version = self.registry.version
+        return self.pattern
+
+    def match_lines(self, code: str) -> Tuple[set, set]:
+        """File lines holding a local and a carried trigger, in one pass."""
+        local, carried = set(), set()
+        line = 1
+        pos = 0
+        for m in self.pattern.finditer(code):
+            line += code.count("\n", pos, m.start())
+            pos = m.start()
+            (local if m.lastgroup == "local" else carried).add(line)
+        return local, carried
+
+    @classmethod
+    def may_carry(cls, code: str) -> bool:
+        """
+        Whether loop code may read a variable before assigning it, and so
+        carry it from the previous frame (a superset of FrameLoop.carried).
+        """
+        assigned = set()
+        exposed = set()
+        for statement in code.split(";"):
+            m = cls.ASSIGNED.match(statement)
+            rhs = statement[m.end() :] if m else statement
+            exposed.update(w for w in cls.WORD.findall(rhs) if w not in assigned)
+            if m:
+                assigned.add(m.group(1))
+        return bool((exposed & assigned) - RESTORED_VARIABLES)
+
+    def select(self, code: str, sections) -> List[bool]:
+        """Flags, per section, whether it has to be analyzed."""
+        pattern = self.compile()
+        if pattern is None:
+            needed = [True] * len(sections)
+        else:
+            local, carried = self.match_lines(code)
+
+            def hit(section, lines):
+                if not section.line_map:  # whole-file section
+                    return bool(lines)
+                return any(n in lines for n in section.line_map)
+
+            needed = []
+            last_cpu = -1
+            carry = False
+            for i, section in enumerate(sections):
+                fires = hit(section, local) or hit(section, carried)
+                if self.loop_rules and section.name in LOOP_SECTIONS:
+                    fires = fires or self.may_carry(section.code)
+                if section.kind == "GPU":
+                    needed.append(fires)
+                    continue
+                carry = carry or hit(section, carried)
+                needed.append(False)
+                if fires or carry:
+                    last_cpu = i
+            if any(needed):
+                # Analyzed shaders read q1..q32 from the per-frame sections
+                for i, section in enumerate(sections):
+                    if section.kind != "GPU" and section.name in Q_SOURCE_SECTIONS:
+                        last_cpu = max(last_cpu, i)
+            for i in range(last_cpu + 1):
+                if sections[i].kind != "GPU":
+                    needed[i] = True
+
+        counted = [n for s, n in zip(sections, needed) if s.code.strip()]
+        self.files += 1
+        self.files_skipped += not any(counted)
+        self.sections += len(counted)
+        self.sections_skipped += counted.count(False)
+        return needed
+
+    def clear(self):
+        self.files = self.files_skipped = 0
+        self.sections = self.sections_skipped = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": self.files,
+            "files_skipped": self.files_skipped,
+            "sections": self.sections,
+            "sections_skipped": self.sections_skipped,
+        }
+
+
+PREFILTER = TriggerPrefilter(REGISTRY)
+
+
+# ==========================================
+# 10. SCANNER ORCHESTRATION
+# ==========================================
+
+
+def extract_shaders(milk_code: str) -> Dict[str, str]:
+    return {s.name: s.code for s in extract_shader_sections(milk_code)}
 
 
 def parse_metadata(code: str) -> Dict[str, int]:
@@ -726,45 +2227,152 @@ def parse_metadata(code: str) -> Dict[str, int]:
     return metadata
 
 
-def scan_file_full(
-    filepath: str,
-) -> Tuple[List[RiskEvent], Dict[str, int], QualityReport]:
-    all_events = []
+@dataclass
+class StaticScan:
+    events: List[RiskEvent] = field(default_factory=list)
+    metadata: Dict[str, int] = field(default_factory=dict)
+    quality: QualityReport = field(default_factory=QualityReport)
+    # Bound on the luminance outputs (LuminanceBoundAnalyzer.LUMINANCE_OUTPUTS);
+    # None when not requested, when none is assigned or the preset is not
+    # modeled (no INI header)
+    luminance: Optional[ValueBound] = None
+    # Bound on the other visible outputs (motion, sizes, feedback, gamma);
+    # None when none is assigned
+    motion: Optional[ValueBound] = None
+
+
+# Words that may assign an output, by LuminanceBoundAnalyzer.section_outputs
+OUTPUT_WORDS = {
+    outputs: re.compile(r"\b(?:" + "|".join(sorted(outputs)) + r")\b")
+    for outputs in (
+        LuminanceBoundAnalyzer.OUTPUTS,
+        LuminanceBoundAnalyzer.CUSTOM_OUTPUTS,
+    )
+}
+
+
+def _writes_output(section) -> bool:
+    """Whether code skipped by the prefilter may assign a bounded output."""
+    outputs = LuminanceBoundAnalyzer.section_outputs(section.name)
+    return outputs is None or bool(OUTPUT_WORDS[outputs].search(section.code))
+
+
+def scan_file_static(
+    filepath: str, prefilter: bool = True, bounds: bool = False
+) -> StaticScan:
+    """
+    Runs every static pass over one preset. With ``bounds`` the visible
+    outputs are also bounded (LuminanceBoundAnalyzer) in the same traversal.
+    """
+    result = StaticScan()
     try:
         with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
             full_code = f.read()
     except Exception:
-        return [], {}, QualityReport()
-
-    metadata = parse_metadata(full_code)
+        return result
 
-    # CPU Analysis
-    lexer = MilkLexer(full_code)
-    ast = MilkParser(lexer.tokenize()).parse()
+    result.metadata = parse_metadata(full_code)
+    preset = load_preset(full_code)
 
-    # Safety Analysis
+    # CPU sections share one symbol table so taint flows from per_frame_init
+    # through per_frame into per_pixel, as it does at runtime.
     cpu_ana = SafetyAnalyzer("CPU")
-    cpu_ana.analyze(ast)
-    all_events.extend(cpu_ana.events)
-
-    # Quality Analysis
     qual_ana = QualityAnalyzer()
-    qual_ana.analyze(ast)
-    quality_report = qual_ana.generate_report()
+    qual_ana.load_params(preset.params)
+    analyzers = [cpu_ana, qual_ana]
+    bound_ana = None
+    if bounds:
+        bound_ana = LuminanceBoundAnalyzer(preset.params)
+        analyzers.append(bound_ana)
+    cpu_pipeline = AnalysisPipeline(*analyzers)
+
+    needed = [True] * len(preset.sections)
+    if prefilter:
+        needed = PREFILTER.select(full_code, preset.sections)
+
+    # q1..q32 as left by per-frame code, read by every shader
+    shader_inputs: Dict[str, TaintState] = {}
+    shader_bounds: Dict[str, ValueBound] = {}
+    outputs: List[Tuple[str, ValueBound]] = []
+
+    for section, analyze in zip(preset.sections, needed):
+        if not section.code.strip():
+            continue
+        if not analyze and (bound_ana is None or not _writes_output(section)):
+            continue
+
+        lexer = MilkLexer(section.code)
+        ast = MilkParser(lexer.tokenize_stream()).parse()
 
-    # GPU Analysis
-    shaders = extract_shaders(full_code)
-    for s_type, s_code in shaders.items():
-        if not s_code.strip():
+        if not analyze:
+            # No rule can fire here, but the code may move the screen
+            if section.kind == "GPU":
+                gpu_bounds = LuminanceBoundAnalyzer(preset.params)
+                gpu_bounds.env.update(shader_bounds)
+                AnalysisPipeline(gpu_bounds).run(ast)
+                outputs.extend(gpu_bounds.outputs.items())
+            else:
+                bound_ana.enter_section(section.name)
+                AnalysisPipeline(bound_ana).run(ast)
+                if section.name in Q_SOURCE_SECTIONS:
+                    shader_bounds = bound_ana.shader_inputs()
             continue
 
-        lexer = MilkLexer(s_code)
-        ast = MilkParser(lexer.tokenize()).parse()
-        gpu_ana = SafetyAnalyzer(f"GPU:{s_type}")
-        gpu_ana.analyze(ast)
-        all_events.extend(gpu_ana.events)
+        if section.kind == "GPU":
+            # GPU Analysis
+            gpu_ana = SafetyAnalyzer(section.label)
+            gpu_ana.symbols.update(shader_inputs)
+            if bound_ana is None:
+                gpu_ana.analyze(ast)
+            else:
+                gpu_bounds = LuminanceBoundAnalyzer(preset.params)
+                gpu_bounds.env.update(shader_bounds)
+                AnalysisPipeline(gpu_ana, gpu_bounds).run(ast)
+                outputs.extend(gpu_bounds.outputs.items())
+            events = gpu_ana.events
+        else:
+            # Safety + Quality Analysis (one fused traversal)
+            cpu_ana.context = section.label
+            if bound_ana is not None:
+                bound_ana.enter_section(section.name)
+            start = len(cpu_ana.events)
+            loop = None
+            if section.name in LOOP_SECTIONS:
+                # Values carried from the previous frame, before the real pass
+                loop = FrameLoop(ast, cpu_ana.symbols, preset.params).run()
+                cpu_ana.symbols.update(loop.entry)
+            cpu_pipeline.run(ast)
+            if loop is not None:
+                loop.report(cpu_ana, start)
+            events = cpu_ana.events[start:]
+            if section.name in Q_SOURCE_SECTIONS:
+                shader_inputs = cpu_ana.shader_inputs()
+                if bound_ana is not None:
+                    shader_bounds = bound_ana.shader_inputs()
+
+        for e in events:
+            e.line = section.source_line(e.line)
+        result.events.extend(events)
+
+    result.quality = qual_ana.generate_report()
+    if bound_ana is not None and preset.is_ini:
+        outputs.extend(bound_ana.outputs.items())
+        luminance = LuminanceBoundAnalyzer.LUMINANCE_OUTPUTS
+        bright = [b for name, b in outputs if name in luminance]
+        moving = [b for name, b in outputs if name not in luminance]
+        # Nothing bounded proves nothing: the screen may still change
+        if bright:
+            result.luminance = _hull_bound(*bright)
+        if moving:
+            result.motion = _hull_bound(*moving)
+    return result
 
-    return all_events, metadata, quality_report
+
+def scan_file_full(
+    filepath: str, prefilter: bool = True
+) -> Tuple[List[RiskEvent], Dict[str, int], QualityReport]:
+    result = scan_file_static(filepath, prefilter)
+    return result.events, result.metadata, result.quality
 
 
 def main():